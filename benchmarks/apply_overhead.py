@@ -0,0 +1,54 @@
+"""Measure engine-side overhead of running an apply request
+
+Calls IPythonParallelKernel.do_apply directly on an engine
+with a prepared request for a trivial function,
+so the time reported is the per-task cost of unpacking the request,
+calling the function, and serializing the result,
+without any messaging.
+
+Usage:
+
+    python benchmarks/apply_overhead.py [--tasks N]
+"""
+
+import argparse
+
+import ipyparallel as ipp
+
+
+def time_do_apply(n):
+    """Time n calls of do_apply on this engine, in microseconds per call"""
+    import time
+
+    from IPython import get_ipython
+
+    from ipyparallel.serialize import pack_apply_message
+
+    def noop(i):
+        return i
+
+    kernel = get_ipython().kernel
+    bufs = pack_apply_message(noop, (1,), {})
+    tic = time.perf_counter()
+    for i in range(n):
+        reply_content, result_buf = kernel.do_apply({}, bufs, f"benchmark-{i}", {})
+    toc = time.perf_counter()
+    assert reply_content['status'] == 'ok'
+    return 1e6 * (toc - tic) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tasks', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with ipp.Cluster(n=1, log_level=30) as rc:
+        engine = rc[0]
+        # warm up
+        engine.apply_sync(time_do_apply, 100)
+        per_task = engine.apply_sync(time_do_apply, args.tasks)
+    print(f"do_apply: {per_task:.1f} us per task ({args.tasks} tasks)")
+
+
+if __name__ == '__main__':
+    main()
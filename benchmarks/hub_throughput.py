@@ -0,0 +1,87 @@
+"""Compare controller throughput with different Hub monitoring modes
+
+Starts a cluster for each mode, submits many small tasks,
+and reports tasks per second and Hub (controller process) CPU time per task.
+
+Usage:
+
+    python benchmarks/hub_throughput.py [-n engines] [--tasks N]
+"""
+
+import argparse
+import asyncio
+import time
+
+import ipyparallel as ipp
+
+modes = {
+    'dictdb': ['--dictdb'],
+    'nodb': ['--nodb'],
+    'lightweight': ['--nodb', '--lightweight'],
+    'metrics': ['--metrics'],
+}
+
+
+def noop(i):
+    return i
+
+
+def controller_cpu(cluster):
+    """CPU time (seconds) used by the controller process and its schedulers"""
+    process = cluster.controller.process
+    total = sum(process.cpu_times()[:2])
+    for child in process.children(recursive=True):
+        total += sum(child.cpu_times()[:2])
+    return total
+
+
+async def run_mode(name, controller_args, engines, tasks):
+    cluster = ipp.Cluster(
+        n=engines,
+        controller_args=controller_args,
+        log_level=30,
+    )
+    async with cluster as rc:
+        view = rc.load_balanced_view()
+        # warm up
+        view.map_sync(noop, range(engines * 10))
+
+        cpu_before = controller_cpu(cluster)
+        tic = time.perf_counter()
+        ars = [view.apply_async(noop, i) for i in range(tasks)]
+        for ar in ars:
+            ar.get()
+        toc = time.perf_counter()
+        cpu_after = controller_cpu(cluster)
+
+    elapsed = toc - tic
+    return {
+        'mode': name,
+        'tasks/s': tasks / elapsed,
+        'controller cpu/task (us)': 1e6 * (cpu_after - cpu_before) / tasks,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--engines', type=int, default=4)
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument('--modes', nargs='*', default=list(modes), choices=list(modes))
+    args = parser.parse_args()
+
+    results = []
+    for name in args.modes:
+        print(f"Running {args.tasks} tasks on {args.engines} engines with {name}")
+        results.append(await run_mode(name, modes[name], args.engines, args.tasks))
+
+    print()
+    print(f"{'mode':>12} {'tasks/s':>10} {'controller cpu/task (us)':>26}")
+    for result in results:
+        print(
+            f"{result['mode']:>12} {result['tasks/s']:>10.0f}"
+            f" {result['controller cpu/task (us)']:>26.0f}"
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
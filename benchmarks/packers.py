@@ -0,0 +1,131 @@
+"""Compare CPU cost of Session message packers
+
+First measures serializing and deserializing a typical apply_request
+in this process, then starts a cluster with each packer,
+submits many small tasks, and reports CPU time per task
+in the client, controller (Hub and schedulers), and engines.
+
+Usage:
+
+    python benchmarks/packers.py [-n engines] [--tasks N] [--packers json msgpack]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import psutil
+from jupyter_client.session import Session
+
+import ipyparallel as ipp
+from ipyparallel.serialize import packers
+
+
+def noop(i):
+    return i
+
+
+def process_cpu(process):
+    """CPU time (seconds) used by a process and its children"""
+    total = sum(process.cpu_times()[:2])
+    for child in process.children(recursive=True):
+        try:
+            total += sum(child.cpu_times()[:2])
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def message_roundtrip(name, n=10000):
+    """Time to serialize and deserialize an apply_request, in microseconds"""
+    packer, unpacker = packers.resolve_packer(name)
+    session = Session(packer=packer, unpacker=unpacker, key=b'benchmark')
+    metadata = dict(after=[], follow=[], timeout=None, targets=[], retries=0)
+    tic = time.perf_counter()
+    for i in range(n):
+        msg = session.msg('apply_request', content={}, metadata=metadata)
+        idents, msg_list = session.feed_identities(session.serialize(msg))
+        session.deserialize(msg_list)
+    toc = time.perf_counter()
+    return 1e6 * (toc - tic) / n
+
+
+async def run_packer(name, engines, tasks):
+    cluster = ipp.Cluster(
+        n=engines,
+        controller_args=['--nodb', f'--packer={name}'],
+        log_level=30,
+    )
+    async with cluster as rc:
+        view = rc.load_balanced_view()
+        # warm up
+        view.map_sync(noop, range(engines * 10))
+
+        me = psutil.Process()
+        controller = cluster.controller.process
+        controller_pids = {controller.pid} | {
+            p.pid for p in controller.children(recursive=True)
+        }
+        engine_procs = [
+            p for p in me.children(recursive=True) if p.pid not in controller_pids
+        ]
+
+        def measure():
+            return (
+                time.process_time(),
+                process_cpu(controller),
+                sum(process_cpu(p) for p in engine_procs),
+            )
+
+        before = measure()
+        tic = time.perf_counter()
+        view.apply_many(noop, [(i,) for i in range(tasks)]).get()
+        toc = time.perf_counter()
+        after = measure()
+
+    client_cpu, controller_cpu, engine_cpu = (
+        1e6 * (b - a) / tasks for a, b in zip(before, after)
+    )
+    return {
+        'packer': name,
+        'roundtrip (us)': message_roundtrip(name),
+        'tasks/s': tasks / (toc - tic),
+        'client (us)': client_cpu,
+        'controller (us)': controller_cpu,
+        'engines (us)': engine_cpu,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--engines', type=int, default=2)
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument(
+        '--packers',
+        nargs='*',
+        default=packers.available_packers(),
+        choices=packers.available_packers(),
+    )
+    args = parser.parse_args()
+    print(f"Running {args.tasks} tasks on {args.engines} engines (pid {os.getpid()})")
+
+    results = []
+    for name in args.packers:
+        print(f"packer: {name}")
+        results.append(await run_packer(name, args.engines, args.tasks))
+
+    columns = list(results[0])
+    print()
+    print(" ".join(f"{col:>16}" for col in columns))
+    for result in results:
+        print(
+            f"{result['packer']:>16} "
+            + " ".join(f"{result[col]:>16.0f}" for col in columns[1:])
+        )
+    print("\nroundtrip: serialize + deserialize one apply_request")
+    print("client, controller, engines: CPU time per task")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
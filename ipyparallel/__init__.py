@@ -12,6 +12,7 @@ from traitlets.config.configurable import MultipleInstanceError
 
 from ._version import __version__  # noqa
 from ._version import version_info  # noqa
+from .client.asyncclient import AsyncClient  # noqa
 from .client.asyncresult import *  # noqa
 from .client.client import Client  # noqa
 from .client.remotefunction import *  # noqa
@@ -0,0 +1,312 @@
+"""A Client for asyncio applications, without an IO thread"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import asyncio
+
+from tornado import ioloop
+from traitlets import validate
+
+from .client import Client
+from .futures import multi_future
+
+
+class AsyncClient(Client):
+    """A Client that runs on the caller's asyncio event loop
+
+    A regular :class:`Client` runs its zmq sockets in a background IO thread,
+    so every request crosses threads on the way out and every reply on the way back.
+    AsyncClient instead attaches its sockets to the asyncio loop
+    running in the current thread.
+    Requests are sent immediately and replies resolve Futures directly on that loop,
+    which lowers per-task latency in asyncio applications.
+
+    An AsyncClient must be created in a coroutine (or other code
+    running on the event loop), and it must only be used from that loop.
+
+    Results are retrieved with ``await``::
+
+        rc = AsyncClient(profile='default')
+        await rc.wait_for_engines(4)
+        result = await rc.apply(f, 5)
+        results = await rc.map(f, range(10))
+        ar = rc[:].apply_async(f, 5)
+        await rc.wait(ar)
+        results = await ar
+
+    Queries of the Hub and control requests return awaitables as well::
+
+        status = await rc.queue_status()
+        records = await rc.db_query({'engine_uuid': uuid})
+        await rc.abort(ar)
+
+    This covers :meth:`queue_status`, :meth:`result_status`, :meth:`resubmit`,
+    :meth:`purge_results` (and its hub and everything variants),
+    :meth:`hub_history`, :meth:`hub_metrics`, :meth:`db_query`,
+    :meth:`abort`, :meth:`send_signal` and :meth:`shutdown`.
+
+    Anything that waits for a reply without ``await``,
+    such as ``AsyncResult.get()`` or ``view.apply_sync()``,
+    would block the event loop that delivers the reply, and is not supported.
+    Views created by AsyncClient never block by default.
+
+    .. versionadded:: 9.1
+    """
+
+    def __init__(self, *args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            raise RuntimeError(
+                "AsyncClient must be created with a running asyncio event loop"
+            ) from None
+        super().__init__(*args, **kwargs)
+
+    @validate("block")
+    def _validate_block(self, proposal):
+        if proposal.value:
+            raise ValueError("AsyncClient cannot block, use `await` instead")
+        return proposal.value
+
+    # IO on the running loop
+
+    def _make_io_loop(self):
+        """Use the running asyncio loop"""
+        return ioloop.IOLoop.current()
+
+    def _start_io_thread(self):
+        """Attach my streams to the running loop, instead of starting a thread"""
+        self._io_loop = self._make_io_loop()
+        self._setup_streams()
+
+    def _stop_io_thread(self):
+        """Detach my streams from the loop
+
+        The loop itself belongs to the caller, and keeps running.
+        """
+        for name in (
+            '_query_stream',
+            '_control_stream',
+            '_mux_stream',
+            '_task_stream',
+            '_iopub_stream',
+            '_notification_stream',
+            '_broadcast_stream',
+        ):
+            stream = getattr(self, name, None)
+            if stream is not None and not stream.closed():
+                stream.close()
+        for stream in self._data_streams.values():
+            stream.close()
+
+    def _call_in_io_loop(self, callback):
+        """We are already in the IO loop, call immediately"""
+        callback()
+
+    def _wrap_future(self, future):
+        """Wrap one of my Futures in an asyncio Future
+
+        My Futures are resolved on the running loop,
+        so results are relayed directly
+        rather than via :func:`asyncio.wrap_future`'s threadsafe hop.
+        """
+        loop = asyncio.get_running_loop()
+        async_future = loop.create_future()
+
+        def relay(f):
+            if async_future.cancelled():
+                return
+            exc = f.exception()
+            if exc is not None:
+                async_future.set_exception(exc)
+            else:
+                async_future.set_result(f.result())
+
+        future.add_done_callback(relay)
+        return async_future
+
+    def _send_recv(self, *args, **kwargs):
+        """Blocking for a reply would deadlock the loop that delivers it"""
+        msg_type = args[1] if len(args) > 1 else kwargs.get('msg_type')
+        raise RuntimeError(
+            f"AsyncClient cannot wait synchronously for {msg_type} replies"
+        )
+
+    async def _run_query(self, query):
+        """Run a query generator, awaiting each reply"""
+        try:
+            request = next(query)
+            while True:
+                socket, msg_type, content = request
+                reply = await self._wrap_future(
+                    self._send(socket, msg_type, content=content)
+                )
+                request = query.send(reply)
+        except StopIteration as e:
+            return e.value
+
+    async def _send_control_request(self, targets, msg_type, content, block):
+        """Send a request on the control channel, and await the replies
+
+        `block` is ignored, the replies are always awaited.
+        """
+        target_identities = self._build_targets(targets)[0]
+        futures = [
+            self._send(self._control_stream, msg_type, content=content, ident=ident)
+            for ident in target_identities
+        ]
+        for future in futures:
+            msg = await self._wrap_future(future)
+            if msg['content']['status'] != 'ok':
+                raise self._unwrap_exception(msg['content'])
+
+    # awaitable API
+
+    async def wait(self, jobs=None, timeout=-1):
+        """Wait for one or more `jobs`, for up to `timeout` seconds.
+
+        Awaitable version of :meth:`Client.wait`.
+
+        Parameters
+        ----------
+        jobs : int, str, or list of ints and/or strs, or one or more AsyncResult objects
+            ints are indices to self.history
+            strs are msg_ids
+            default: wait on all outstanding messages
+        timeout : float
+            a time in seconds, after which to give up.
+            default is -1, which means no timeout
+
+        Returns
+        -------
+        True : when all msg_ids are done
+        False : timeout reached, some msg_ids still outstanding
+        """
+        futures = self._futures_for_jobs(jobs)
+        if not futures:
+            return True
+        if timeout is not None and timeout < 0:
+            timeout = None
+        future = self._wrap_future(multi_future(futures))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def wait_for_engines(self, n=None, *, timeout=-1, interactive=False):
+        """Wait for `n` engines to become available.
+
+        Awaitable version of :meth:`Client.wait_for_engines`.
+        Raises TimeoutError if `timeout` is reached before `n` engines are ready.
+        """
+        future = super().wait_for_engines(
+            n, timeout=timeout, block=False, interactive=interactive
+        )
+        await self._wrap_future(future)
+
+    _default_view = None
+
+    @property
+    def default_view(self):
+        """The LoadBalancedView used by :meth:`apply` and :meth:`map`"""
+        if self._default_view is None:
+            self._default_view = self.load_balanced_view()
+        return self._default_view
+
+    async def apply(self, f, *args, **kwargs):
+        """Call ``f(*args, **kwargs)`` on an engine, and return the result
+
+        Tasks are load-balanced across all engines.
+        Use a view's ``apply_async`` and ``await`` the result
+        for more control over where tasks run.
+        """
+        return await self.default_view.apply_async(f, *args, **kwargs)
+
+    async def map(self, f, *sequences, **kwargs):
+        """Load-balanced, parallel version of ``list(map(f, *sequences))``
+
+        Keyword arguments are passed to :meth:`LoadBalancedView.map`.
+        """
+        kwargs['block'] = False
+        return await self.default_view.map(f, *sequences, **kwargs)
+
+    async def resubmit(self, indices_or_msg_ids=None, metadata=None, block=None):
+        """Resubmit one or more tasks.
+
+        Awaitable version of :meth:`Client.resubmit`.
+        Returns an AsyncHubResult for the new tasks.
+        """
+        if block:
+            raise ValueError("AsyncClient cannot block, use `await` instead")
+        if indices_or_msg_ids is None:
+            indices_or_msg_ids = -1
+        return await self._run_query(self._resubmit(indices_or_msg_ids))
+
+    async def purge_results(self, jobs=[], targets=[]):
+        """Clears the cached results from both the hub and the local client
+
+        Awaitable version of :meth:`Client.purge_results`.
+        """
+        self.purge_local_results(jobs=jobs, targets=targets)
+        await self.purge_hub_results(jobs=jobs, targets=targets)
+
+    async def purge_everything(self):
+        """Clears all content from previous Tasks from both the hub and the local client
+
+        Awaitable version of :meth:`Client.purge_everything`.
+        """
+        await self.purge_results("all")
+        self.history.clear()
+        self.session.digest_history.clear()
+
+    async def shutdown(self, targets='all', restart=False, hub=False, block=None):
+        """Terminates one or more engine processes, optionally including the hub.
+
+        Awaitable version of :meth:`Client.shutdown`.
+        """
+        from ipyparallel.error import NoEnginesRegistered
+
+        if restart:
+            raise NotImplementedError("Engine restart is not yet implemented")
+        if block:
+            raise ValueError("AsyncClient cannot block, use `await` instead")
+
+        if hub:
+            targets = 'all'
+        try:
+            targets = self._build_targets(targets)[0]
+        except NoEnginesRegistered:
+            targets = []
+
+        futures = [
+            self._send(
+                self._control_stream,
+                'shutdown_request',
+                content={'restart': restart},
+                ident=t,
+            )
+            for t in targets
+        ]
+        error = False
+        for f in futures:
+            msg = await self._wrap_future(f)
+            if msg['content']['status'] != 'ok':
+                error = self._unwrap_exception(msg['content'])
+
+        if hub:
+            # don't trigger close on shutdown notification
+            self._notification_handlers['shutdown_notification'] = lambda msg: None
+            msg = await self._wrap_future(
+                self._send(self._query_stream, 'shutdown_request')
+            )
+            if msg['content']['status'] != 'ok':
+                error = self._unwrap_exception(msg['content'])
+            if not error:
+                self.close()
+
+        if error:
+            raise error
+
+
+__all__ = ['AsyncClient']
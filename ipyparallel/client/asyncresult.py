@@ -2,7 +2,6 @@
 
 # Copyright (c) IPython Development Team.
 # Distributed under the terms of the Modified BSD License.
-import concurrent.futures
 import sys
 import threading
 import time
@@ -20,7 +19,7 @@ from IPython import get_ipython
 from IPython.display import display, display_pretty, publish_display_data
 
 from ipyparallel import error
-from ipyparallel.util import _parse_date, compare_datetimes, progress, utcnow
+from ipyparallel.util import compare_datetimes, progress, utcnow
 
 from .futures import MessageFuture, multi_future
 
@@ -103,6 +102,15 @@ class AsyncResult(Future):
         self._output_event = Event()
         self._sent_event = Event()
         self._success = None
+        # incremental completion tracking, updated by _child_done
+        self._completion = threading.Condition()
+        self._completed = []
+        self._n_failed = 0
+        self._progress = 0
+        # done/pending split results for wait(return_when), updated from _completed
+        self._split_done = set()
+        self._split_pending = None
+        self._n_split = 0
         if self._children:
             self._metadata = [f.output.metadata for f in self._children]
         else:
@@ -127,6 +135,8 @@ class AsyncResult(Future):
                     raise KeyError(f"No Future or result for msg_id: {msg_id}")
                 self._children.append(future)
 
+        for index, child in enumerate(self._children):
+            child.add_done_callback(partial(self._child_done, index))
         self._result_future = multi_future(self._children)
 
         self._sent_future = multi_future([f.tracker for f in self._children])
@@ -140,6 +150,62 @@ class AsyncResult(Future):
         self._output_future.add_done_callback(self._resolve_output)
         self.add_done_callback(self._finalize_result)
 
+    def _child_done(self, index, child):
+        """Callback when one of my messages is done
+
+        Records progress and the order of completion as each message finishes,
+        so that progress and partial waits don't need to check every message.
+        """
+        try:
+            failed = isinstance(child.result(), Exception)
+        except BaseException:
+            failed = True
+        with self._completion:
+            self._progress += self._chunk_sizes.get(child.msg_id, 1)
+            self._completed.append(index)
+            if failed:
+                self._n_failed += 1
+            self._completion.notify_all()
+
+    def _wait_for_completion(self, return_when, timeout=None):
+        """Wait for FIRST_COMPLETED, FIRST_EXCEPTION, or ALL_COMPLETED
+
+        Returns whether the condition was met.
+        """
+        n = len(self._children)
+        if return_when not in {FIRST_COMPLETED, FIRST_EXCEPTION, ALL_COMPLETED}:
+            raise ValueError(f"Unrecognized return_when={return_when!r}")
+
+        def condition():
+            if return_when == FIRST_COMPLETED:
+                return bool(self._completed)
+            elif return_when == FIRST_EXCEPTION and self._n_failed:
+                return True
+            return len(self._completed) == n
+
+        with self._completion:
+            return self._completion.wait_for(condition, timeout)
+
+    def _split_completed(self):
+        """Split results into (done, pending) sets
+
+        Only messages completed since the last call are moved from pending to done.
+        """
+        splits = self.split()
+        with self._completion:
+            if self._split_pending is None:
+                self._split_pending = set(splits)
+            newly_done = [splits[i] for i in self._completed[self._n_split :]]
+            self._n_split += len(newly_done)
+            self._split_done.update(newly_done)
+            self._split_pending.difference_update(newly_done)
+            done = set(self._split_done)
+            pending = set(self._split_pending)
+        for ar in newly_done:
+            # the split result resolves right after its message
+            ar.wait()
+        return done, pending
+
     def _iopub_streaming_output_callback(self, eid, msg_future, msg):
         """Callback for iopub messages registered during AsyncResult.stream_output()"""
         msg_type = msg['header']['msg_type']
@@ -463,9 +529,8 @@ class AsyncResult(Future):
         timeout (int):
             The timeout in seconds. `-1` or None indicate an infinite timeout.
         return_when (enum):
-            None, ALL_COMPLETED, FIRST_COMPLETED, or FIRST_EXCEPTION.
-            Passed to :py:func:`concurrent.futures.wait`.
-            If specified and not-None,
+            None, ALL_COMPLETED, FIRST_COMPLETED, or FIRST_EXCEPTION,
+            with the same meaning as for :py:func:`concurrent.futures.wait`.
 
         Returns:
             ready (bool):
@@ -481,6 +546,10 @@ class AsyncResult(Future):
 
         .. versionchanged:: 8.0
             Added `return_when`.
+
+        .. versionchanged:: 9.1
+            Completion is tracked as each message finishes,
+            so waiting with `return_when` no longer checks every message on each call.
         """
         if timeout and timeout < 0:
             timeout = None
@@ -491,10 +560,8 @@ class AsyncResult(Future):
             self.wait_for_output(0)
             return self._ready
         else:
-            futures = self.split()
-            done, pending = concurrent.futures.wait(
-                futures, timeout=timeout, return_when=return_when
-            )
+            self._wait_for_completion(return_when, timeout)
+            done, pending = self._split_completed()
             if done:
                 self.wait_for_output(0)
 
@@ -528,12 +595,13 @@ class AsyncResult(Future):
                     raise r
             else:
                 results = self._collect_exceptions(results)
+            result = self._reconstruct_result(results)
         except Exception as e:
             self._success = False
             self.set_exception(e)
         else:
             self._success = True
-            self.set_result(self._reconstruct_result(results))
+            self.set_result(result)
 
     def _collect_exceptions(self, results):
         """Wrap Exceptions in a CompositeError
@@ -546,7 +614,7 @@ class AsyncResult(Future):
             return error.collect_exceptions(results, self._fname)
 
     def _finalize_result(self, f):
-        if self.owner:
+        if self.owner and not self._client.results.maxsize:
             [self._client.results.pop(mid, None) for mid in self.msg_ids]
         self._ready = True
         self._ready_event.set()
@@ -592,28 +660,19 @@ class AsyncResult(Future):
         """result property wrapper for `get(timeout=-1)`."""
         return self.get()
 
-    _DATE_FIELDS = [
-        "submitted",
-        "started",
-        "completed",
-        "received",
-    ]
+    def __await__(self):
+        """Wait for the result in a coroutine
 
-    def _parse_metadata_dates(self):
-        """Ensure metadata date fields are parsed on access
+        ``await ar`` is equivalent to ``ar.get()``,
+        without blocking the event loop.
 
-        Rather than parsing timestamps from str->dt on receipt,
-        parse on access for compatibility.
+        .. versionadded:: 9.1
         """
-        for md in self._metadata:
-            for key in self._DATE_FIELDS:
-                if isinstance(md.get(key, None), str):
-                    md[key] = _parse_date(md[key])
+        return self._client._wrap_future(self).__await__()
 
     @property
     def metadata(self):
         """property for accessing execution metadata."""
-        self._parse_metadata_dates()
         if self._single_result:
             return self._metadata[0]
         else:
@@ -695,7 +754,6 @@ class AsyncResult(Future):
             # metadata proxy *does not* require that results are done
             self.wait(0)
             self.wait_for_output(0)
-            self._parse_metadata_dates()
             values = [md[key] for md in self._metadata]
             if self._single_result:
                 return values[0]
@@ -794,10 +852,7 @@ class AsyncResult(Future):
 
         Fractional progress would be given by 1.0 * ar.progress / len(ar)
         """
-        self.wait(0)
-        finished_msg_ids = set(self.msg_ids).intersection(self._client.outstanding)
-        finished_count = self._count_chunks(*finished_msg_ids)
-        return len(self) - finished_count
+        return self._progress
 
     @property
     def elapsed(self):
@@ -806,7 +861,6 @@ class AsyncResult(Future):
             return self.wall_time
 
         now = submitted = utcnow()
-        self._parse_metadata_dates()
         for md in self._metadata:
             stamp = md["submitted"]
             if stamp and stamp < submitted:
@@ -821,7 +875,6 @@ class AsyncResult(Future):
         Computed as the sum of (completed-started) of each task
         """
         t = 0
-        self._parse_metadata_dates()
         for md in self._metadata:
             t += compare_datetimes(md['completed'], md['started']).total_seconds()
         return t
@@ -868,18 +921,11 @@ class AsyncResult(Future):
         while not finished and (
             timeout is None or time.perf_counter() - tic <= timeout
         ):
-            wait_result = self.wait(interval, return_when=return_when)
-            progress_bar.update(self.progress - progress_bar.n)
             if return_when is None:
-                finished = wait_result
+                finished = self.wait(interval)
             else:
-                done, pending = wait_result
-                if return_when == FIRST_COMPLETED:
-                    finished = bool(done)
-                elif return_when == FIRST_EXCEPTION:
-                    finished = (not pending) or any(not ar._success for ar in done)
-                else:
-                    raise ValueError(f"Unrecognized return_when={return_when!r}")
+                finished = self._wait_for_completion(return_when, interval)
+            progress_bar.update(self.progress - progress_bar.n)
 
         progress_bar.update(self.progress - progress_bar.n)
         progress_bar.close()
@@ -1061,8 +1107,23 @@ class AsyncMapResult(AsyncResult):
 
     If ordered=False, then the first results to arrive will come first, otherwise
     results will be yielded in the order they were submitted.
+
+    If `out` is given, array results are written into a single output array
+    as each one arrives, instead of being concatenated at the end.
+    `out` may be a numpy array, or True to allocate one
+    with the dtype and shape of the first result.
+    `lengths` gives the length of the output of each message,
+    and is required with `out`.
+
+    .. versionchanged:: 9.1
+        Added `out` and `lengths`.
     """
 
+    _out = None
+    _out_offsets = None
+    _out_error = None
+    _consumed = False
+
     def __init__(
         self,
         client,
@@ -1072,9 +1133,23 @@ class AsyncMapResult(AsyncResult):
         ordered=True,
         return_exceptions=False,
         chunk_sizes=None,
+        out=None,
+        lengths=None,
     ):
         self._mapObject = mapObject
         self.ordered = ordered
+        if out is not None:
+            if lengths is None:
+                raise ValueError("lengths are required to write results into out")
+            offsets = [0]
+            for length in lengths:
+                offsets.append(offsets[-1] + length)
+            if out is not True and len(out) != offsets[-1]:
+                raise ValueError(
+                    f"out has length {len(out)}, but results have length {offsets[-1]}"
+                )
+            self._out = out
+            self._out_offsets = offsets
         AsyncResult.__init__(
             self,
             client,
@@ -1085,8 +1160,53 @@ class AsyncMapResult(AsyncResult):
         )
         self._single_result = False
 
+    def _child_done(self, index, child):
+        if self._out_offsets is not None:
+            self._write_out(index, child)
+        super()._child_done(index, child)
+
+    def _write_out(self, index, child):
+        """Copy a result into `out` as soon as it arrives
+
+        Array results held by the message are replaced with a view of `out`,
+        so only one copy of each chunk is kept.
+        """
+        import numpy
+
+        try:
+            chunk = child.result()
+        except BaseException:
+            return
+        if isinstance(chunk, Exception):
+            return
+        is_array = isinstance(chunk, numpy.ndarray)
+        if not is_array:
+            # list of results from map
+            chunk = numpy.asarray(chunk)
+        lo, hi = self._out_offsets[index : index + 2]
+        with self._completion:
+            if self._out_error is not None:
+                return
+            if self._out is True:
+                shape = (self._out_offsets[-1],) + chunk.shape[1:]
+                self._out = numpy.empty(shape, dtype=chunk.dtype)
+            try:
+                if chunk.shape[:1] != (hi - lo,):
+                    raise ValueError(f"expected length {hi - lo}, got {len(chunk)}")
+                numpy.copyto(self._out[lo:hi], chunk, casting='same_kind')
+            except Exception as e:
+                self._out_error = ValueError(
+                    f"Result {index} with shape {chunk.shape} and dtype {chunk.dtype}"
+                    f" does not fit in out[{lo}:{hi}]: {e}"
+                )
+                return
+        if is_array:
+            child.replace_result(self._out[lo:hi])
+
     def _reconstruct_result(self, res):
         """Perform the gather on the actual results."""
+        if self._consumed:
+            raise RuntimeError("Results have been released by AsyncMapResult.consume()")
         if self._return_exceptions:
             if any(isinstance(r, Exception) for r in res):
                 # running with _return_exceptions,
@@ -1099,6 +1219,11 @@ class AsyncMapResult(AsyncResult):
                     else:
                         flattened.extend(r)
                 return flattened
+        if self._out_offsets is not None:
+            if self._out_error is not None:
+                raise self._out_error
+            # already assembled by _write_out
+            return self._out
         return self._mapObject.joinPartitions(res)
 
     # asynchronous iterator:
@@ -1106,6 +1231,30 @@ class AsyncMapResult(AsyncResult):
         it = self._ordered_iter if self.ordered else self._unordered_iter
         yield from it()
 
+    def consume(self):
+        """Iterate through results as they arrive, releasing them along the way
+
+        Like iterating through the AsyncMapResult,
+        but the results of each message are released once they have been yielded,
+        and are not reassembled into a single result at the end,
+        so memory use is bounded by the results that have not been consumed yet.
+        After calling consume, the results are no longer available via `get()`.
+
+        .. versionadded:: 9.1
+        """
+        if self.done():
+            # already assembled, nothing to save
+            yield from self
+            return
+        self._consumed = True
+        children = self._ordered_children if self.ordered else self._unordered_children
+        for child in children():
+            yield from self._yield_child_results(child)
+            child.replace_result(None)
+        self._raw_results = None
+        if self._result_future.done():
+            self._result_future.replace_result(None)
+
     def _yield_child_results(self, child):
         """Yield results from a child
 
@@ -1117,6 +1266,22 @@ class AsyncMapResult(AsyncResult):
         self._collect_exceptions(rlist)
         yield from rlist
 
+    def _ordered_children(self):
+        """Yield my children as they finish, in submission order"""
+        evt = Event()
+        for child in self._children:
+            self._wait_for_child(child, evt=evt)
+            yield child
+
+    def _unordered_children(self):
+        """Yield my children as they finish, in the order they finish"""
+        # follow the order of completion recorded by _child_done
+        for i in range(len(self._children)):
+            with self._completion:
+                self._completion.wait_for(lambda: len(self._completed) > i)
+                child = self._children[self._completed[i]]
+            yield child
+
     # asynchronous ordered iterator:
     def _ordered_iter(self):
         """iterator for results *as they arrive*, preserving submission order."""
@@ -1124,9 +1289,7 @@ class AsyncMapResult(AsyncResult):
             rlist = self.get(0)
         except TimeoutError:
             # wait for each result individually
-            evt = Event()
-            for child in self._children:
-                self._wait_for_child(child, evt=evt)
+            for child in self._ordered_children():
                 yield from self._yield_child_results(child)
         else:
             # already done
@@ -1138,13 +1301,8 @@ class AsyncMapResult(AsyncResult):
         try:
             rlist = self.get(0)
         except TimeoutError:
-            pending = self._children
-            while pending:
-                done, pending = concurrent.futures.wait(
-                    pending, return_when=FIRST_COMPLETED
-                )
-                for child in done:
-                    yield from self._yield_child_results(child)
+            for child in self._unordered_children():
+                yield from self._yield_child_results(child)
         else:
             # already done
             yield from rlist
@@ -1161,6 +1319,15 @@ class AsyncHubResult(AsyncResult):
         """disable Future-based resolution of Hub results"""
         pass
 
+    @property
+    def progress(self):
+        """the number of tasks which have been completed at this point."""
+        self.wait(0)
+        if self._ready:
+            return len(self)
+        pending_msg_ids = set(self.msg_ids).intersection(self._client.outstanding)
+        return len(self) - self._count_chunks(*pending_msg_ids)
+
     def wait(self, timeout=-1, return_when=None):
         """wait for result to complete."""
         start = time.perf_counter()
@@ -1203,8 +1370,9 @@ class AsyncHubResult(AsyncResult):
                 self.set_exception(e)
             finally:
                 if self.owner:
-                    [self._client.metadata.pop(mid) for mid in self.msg_ids]
-                    [self._client.results.pop(mid) for mid in self.msg_ids]
+                    [self._client.metadata.pop(mid, None) for mid in self.msg_ids]
+                    if not self._client.results.maxsize:
+                        [self._client.results.pop(mid, None) for mid in self.msg_ids]
 
         return self._ready
 
@@ -15,7 +15,7 @@ from concurrent.futures import Future
 from functools import partial
 from getpass import getpass
 from pprint import pprint
-from threading import Event, current_thread
+from threading import Event, Lock, current_thread
 
 import jupyter_client.session
 import zmq
@@ -35,8 +35,10 @@ from traitlets import (
     Bool,
     Bytes,
     Dict,
+    Float,
     HasTraits,
     Instance,
+    Integer,
     List,
     Set,
     Unicode,
@@ -47,12 +49,13 @@ from zmq.eventloop.zmqstream import ZMQStream
 
 import ipyparallel as ipp
 from ipyparallel import error, serialize, util
-from ipyparallel.serialize import PrePickled, Reference
+from ipyparallel.serialize import PrePickled, Reference, sharedmem
 from ipyparallel.util import _OutputProducingThread as Thread
 from ipyparallel.util import _TermColors
 
 from .asyncresult import AsyncHubResult, AsyncResult
 from .futures import MessageFuture, multi_future
+from .store import MsgHistory, ResultStore
 from .view import BroadcastView, DirectView, LoadBalancedView
 
 pjoin = os.path.join
@@ -198,45 +201,75 @@ class Metadata(dict):
 
     These objects have a strict set of keys - errors will raise if you try
     to add new keys.
+
+    To keep metadata for a task with no output small,
+    the `outputs` list and `data` dict are stored as None
+    until they are first accessed,
+    and timestamps (submitted, started, completed, received) may be stored
+    as ISO8601 strings, which are parsed to datetimes on first access.
+    Access via keys, attributes, `get`, `items`, `values` and `copy`
+    always sees the containers and datetimes,
+    but plain dict access (e.g. ``dict(md)``) sees the stored values.
     """
 
+    __slots__ = ()
+
+    _defaults = {
+        'msg_id': None,
+        'submitted': None,
+        'started': None,
+        'completed': None,
+        'received': None,
+        'engine_uuid': None,
+        'engine_id': None,
+        'follow': None,
+        'after': None,
+        'status': None,
+        'is_broadcast': False,
+        'is_coalescing': False,
+        'execute_input': None,
+        'execute_result': None,
+        'error': None,
+        'stdout': '',
+        'stderr': '',
+        'outputs': None,
+        'data': None,
+    }
+    # containers allocated on first access
+    _factories = {
+        'outputs': list,
+        'data': dict,
+    }
+    _dates = frozenset({'submitted', 'started', 'completed', 'received'})
+
     def __init__(self, *args, **kwargs):
-        dict.__init__(self)
-        md = {
-            'msg_id': None,
-            'submitted': None,
-            'started': None,
-            'completed': None,
-            'received': None,
-            'engine_uuid': None,
-            'engine_id': None,
-            'follow': None,
-            'after': None,
-            'status': None,
-            'execute_input': None,
-            'execute_result': None,
-            'error': None,
-            'stdout': '',
-            'stderr': '',
-            'outputs': [],
-            'data': {},
-        }
-        self.update(md)
-        self.update(dict(*args, **kwargs))
+        dict.__init__(self, self._defaults)
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if value is None and key in self._factories:
+            value = self._factories[key]()
+            dict.__setitem__(self, key, value)
+        elif isinstance(value, str) and key in self._dates:
+            value = util._parse_date(value)
+            dict.__setitem__(self, key, value)
+        return value
 
     def __getattr__(self, key):
         """getattr aliased to getitem"""
-        if key in self:
+        try:
             return self[key]
-        else:
-            raise AttributeError(key)
+        except KeyError:
+            raise AttributeError(key) from None
 
     def __setattr__(self, key, value):
         """setattr aliased to setitem, with strict"""
-        if key in self:
+        try:
             self[key] = value
-        else:
-            raise AttributeError(key)
+        except KeyError:
+            raise AttributeError(key) from None
 
     def __setitem__(self, key, value):
         """strict static key enforcement"""
@@ -245,6 +278,28 @@ class Metadata(dict):
         else:
             raise KeyError(key)
 
+    def __delitem__(self, key):
+        """Reset a key to its default value"""
+        self[key] = self._defaults[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def copy(self):
+        return Metadata(self.items())
+
 
 def _is_future(f):
     """light duck-typing check for Futures"""
@@ -301,6 +356,18 @@ class Client(HasTraits):
     paramiko : bool
         flag for whether to use paramiko instead of shell ssh for tunneling.
         [default: True on win32, False else]
+    history_length : int
+        The number of most recent msg_ids to keep in `history`.
+        [default: 0, keep all]
+    max_results : int
+        The number of results to keep in memory in the local result cache.
+        Least recently used results are evicted first.
+        [default: 0, no limit]
+    spill_results : bool
+        Write results evicted from memory to a memory-mapped file on disk,
+        instead of discarding them. [default: False]
+    spill_dir : str
+        The directory for the spill file. [default: the system temp dir]
 
 
     Attributes
@@ -311,37 +378,65 @@ class Client(HasTraits):
         the registration state. To request ids without synchronization,
         use semi-private _ids attributes.
 
-    history : list of msg_ids
-        a list of msg_ids, keeping track of all the execution
-        messages you have submitted in order.
+    history : MsgHistory of msg_ids
+        a list-like record of msg_ids, keeping track of all the execution
+        messages you have submitted in order, with O(1) membership tests.
 
     outstanding : set of msg_ids
         a set of msg_ids that have been submitted, but whose
         results have not yet been received.
 
-    results : dict
-        a dict of all our results, keyed by msg_id
+    results : ResultStore
+        a mapping of our cached results, keyed by msg_id
 
     block : bool
         determines default behavior when block not specified
         in execution methods
 
+    direct_data_timeout : float
+        time (in seconds) to wait for result buffers held by an engine
+        (see ``IPythonParallelKernel.direct_data_threshold``)
+        before failing the result with an EngineError.
+        [Default: 60]
+
     """
 
     block = Bool(False)
     outstanding = Set()
-    results = Instance('collections.defaultdict', (dict,))
+    results = Instance(ResultStore)
     metadata = Instance('collections.defaultdict', (Metadata,))
     cluster = Instance('ipyparallel.cluster.Cluster', allow_none=True)
-    history = List()
+    history = Instance(MsgHistory)
+    history_length = Integer(0)
+    max_results = Integer(0)
+    spill_results = Bool(False)
+    spill_dir = Unicode(None, allow_none=True)
     debug = Bool(False)
     _futures = Dict()
     _output_futures = Dict()
+    _result_chunks = Dict()
+    direct_data_timeout = Float(60)
+    # msg_id: (apply_reply, timeout) for replies waiting for held buffers
+    _direct_replies = Dict()
+    _data_streams = Dict()
+    _shared_memory = Dict()
     _io_loop = Any()
     _io_thread = Any()
 
     profile = Unicode()
 
+    @default("history")
+    def _default_history(self):
+        return MsgHistory(maxlen=self.history_length)
+
+    @default("results")
+    def _default_results(self):
+        return ResultStore(
+            maxsize=self.max_results,
+            spill=self.spill_results,
+            spill_dir=self.spill_dir,
+        )
+
     def _profile_default(self):
         if BaseIPythonApplication.initialized():
             # an IPython app *might* be running, try to get its profile
@@ -403,9 +498,20 @@ class Client(HasTraits):
         timeout=10,
         cluster_id=None,
         cluster=None,
+        history_length=0,
+        max_results=0,
+        spill_results=False,
+        spill_dir=None,
         **extra_args,
     ):
-        super_kwargs = {'debug': debug, 'cluster': cluster}
+        super_kwargs = {
+            'debug': debug,
+            'cluster': cluster,
+            'history_length': history_length,
+            'max_results': max_results,
+            'spill_results': spill_results,
+            'spill_dir': spill_dir,
+        }
         if profile:
             super_kwargs['profile'] = profile
         super().__init__(**super_kwargs)
@@ -602,6 +708,7 @@ class Client(HasTraits):
         self._queue_handlers = {
             'execute_reply': self._handle_execute_reply,
             'apply_reply': self._handle_apply_reply,
+            'apply_reply_chunk': self._handle_apply_reply_chunk,
         }
 
         try:
@@ -808,48 +915,47 @@ class Client(HasTraits):
             e.engine_info['engine_id'] = eid
         return e
 
-    def _extract_metadata(self, msg):
+    def _update_metadata(self, md, msg):
+        """Update a Metadata object from a reply message"""
         header = msg['header']
         parent = msg['parent_header']
         msg_meta = msg['metadata']
-        content = msg['content']
-        md = {
-            'msg_id': parent['msg_id'],
-            'received': util.utcnow(),
-            'engine_uuid': msg_meta.get('engine', None),
-            'follow': msg_meta.get('follow', []),
-            'after': msg_meta.get('after', []),
-            'status': content['status'],
-            'is_broadcast': msg_meta.get('is_broadcast', False),
-            'is_coalescing': msg_meta.get('is_coalescing', False),
-        }
-
-        if md['engine_uuid'] is not None:
-            md['engine_id'] = self._engines.get(md['engine_uuid'], None)
-
-        if md['is_coalescing']:
+        md.msg_id = parent['msg_id']
+        md.received = util.utcnow()
+        md.status = msg['content']['status']
+        md.follow = msg_meta.get('follow', [])
+        md.after = msg_meta.get('after', [])
+        md.is_broadcast = msg_meta.get('is_broadcast', False)
+        md.is_coalescing = msg_meta.get('is_coalescing', False)
+
+        if md.is_coalescing:
             # get destinations from target metadata
             targets = msg_meta.get("broadcast_targets", [])
-            md['engine_uuid'], md['engine_id'] = map(list, zip(*targets))
+            md.engine_uuid, md.engine_id = map(list, zip(*targets))
+        else:
+            md.engine_uuid = msg_meta.get('engine', None)
+            if md.engine_uuid is not None:
+                md.engine_id = self._engines.get(md.engine_uuid, None)
 
         if 'date' in parent:
-            md['submitted'] = parent['date']
+            md.submitted = parent['date']
         if 'started' in msg_meta:
-            md['started'] = util._parse_date(msg_meta['started'])
+            md.started = msg_meta['started']
         if 'date' in header:
-            md['completed'] = header['date']
-        return md
+            md.completed = header['date']
 
     def _register_engine(self, msg):
-        """Register a new engine, and update our connection info."""
+        """Register new engines, and update our connection info."""
         content = msg['content']
-        eid = content['id']
-        d = {eid: content['uuid']}
-        self._update_engines(d)
-        event = {'event': 'register'}
-        event.update(content)
-        for callback in self._registration_callbacks:
-            callback(event)
+        # batched registrations list engines,
+        # single registrations describe the engine at the top level
+        engines = content.get('engines', [content])
+        self._update_engines({engine['id']: engine['uuid'] for engine in engines})
+        for engine in engines:
+            event = {'event': 'register'}
+            event.update(engine)
+            for callback in self._registration_callbacks:
+                callback(event)
 
     def _unregister_engine(self, msg):
         """Unregister an engine that has died."""
@@ -880,6 +986,8 @@ class Client(HasTraits):
         outstanding = self._outstanding_dict[uuid]
 
         for msg_id in list(outstanding):
+            # the rest of a chunked result is never coming
+            self._result_chunks.pop(msg_id, None)
             if msg_id in self.results:
                 # we already
                 continue
@@ -921,7 +1029,7 @@ class Client(HasTraits):
 
         # construct metadata:
         md = self.metadata[msg_id]
-        md.update(self._extract_metadata(msg))
+        self._update_metadata(md, msg)
 
         if md['is_coalescing']:
             engine_uuids = md['engine_uuid'] or []
@@ -968,11 +1076,17 @@ class Client(HasTraits):
         else:
             msg_id = parent['msg_id']
 
+        if msg['metadata'].get('direct_buffers') and msg_id in self.outstanding:
+            # large buffers are held by the engine, fetch them first
+            self._fetch_direct_buffers(msg_id, msg)
+            return
+        self._pop_direct_reply(msg_id)
+
         future = self._futures.get(msg_id, None)
         if msg_id not in self.outstanding:
             if msg_id in self.history:
                 print(f"got stale result: {msg_id}")
-                print(self.results[msg_id])
+                print(self.results.get(msg_id))
                 print(msg)
             else:
                 print(f"got unknown result: {msg_id}")
@@ -983,7 +1097,7 @@ class Client(HasTraits):
 
         # construct metadata:
         md = self.metadata[msg_id]
-        md.update(self._extract_metadata(msg))
+        self._update_metadata(md, msg)
 
         if md['is_coalescing']:
             engine_uuids = md['engine_uuid'] or []
@@ -996,6 +1110,13 @@ class Client(HasTraits):
                 if msg_id in e_outstanding:
                     e_outstanding.remove(msg_id)
 
+        chunks = self._result_chunks.pop(msg_id, {})
+        if msg['metadata'].get('chunked_buffers'):
+            # large buffers were sent ahead in apply_reply_chunk messages
+            msg['buffers'] = list(msg['buffers'])
+            for index in msg['metadata']['chunked_buffers']:
+                msg['buffers'][index] = chunks[index]
+
         # construct result:
         if content['status'] == 'ok':
             if md.get('is_coalescing', False):
@@ -1025,6 +1146,101 @@ class Client(HasTraits):
         if future:
             future.set_result(self.results[msg_id])
 
+    def _handle_apply_reply_chunk(self, msg):
+        """Copy one chunk of a large result buffer into place
+
+        Engines send result buffers larger than
+        ``IPythonParallelKernel.result_chunk_size`` in chunks ahead of the apply_reply.
+        Each buffer is allocated when its first chunk arrives,
+        and filled in as the rest arrive.
+        """
+        if self._should_use_metadata_msg_id(msg):
+            msg_id = msg['metadata']['original_msg_id']
+        else:
+            msg_id = msg['parent_header']['msg_id']
+        if msg_id not in self.outstanding:
+            # e.g. failed when its engine died
+            return
+        content = msg['content']
+        chunks = self._result_chunks.setdefault(msg_id, {})
+        buf = chunks.get(content['buffer'])
+        if buf is None:
+            buf = chunks[content['buffer']] = bytearray(content['nbytes'])
+        chunk = msg['buffers'][0].cast('B')
+        offset = content['offset']
+        memoryview(buf)[offset : offset + chunk.nbytes] = chunk
+
+    def _fetch_direct_buffers(self, msg_id, msg):
+        """Request result buffers held by an engine
+
+        Engines hold result buffers larger than
+        ``IPythonParallelKernel.direct_data_threshold``,
+        and send only where to fetch them with the apply_reply.
+        The reply is handled once the buffers arrive.
+        """
+        info = msg['metadata']['direct_buffers']
+        url = util.disambiguate_url(info['url'], info['location'])
+        stream = self._data_streams.get(url)
+        if stream is None:
+            socket = self._context.socket(zmq.DEALER)
+            socket.linger = 0
+            socket.connect(url)
+            stream = self._data_streams[url] = ZMQStream(socket, self._io_loop)
+            stream.on_recv(self._handle_direct_buffers, copy=False)
+        # e.g. the engine's data port can't be reached from here
+        timeout = self._io_loop.call_later(
+            self.direct_data_timeout,
+            self._direct_buffers_failed,
+            msg_id,
+            f"Result data for {msg_id} did not arrive from {url}"
+            f" in {self.direct_data_timeout}s",
+        )
+        self._direct_replies[msg_id] = (msg, timeout)
+        self.session.send(stream, 'data_request', content={'msg_id': msg_id})
+
+    def _pop_direct_reply(self, msg_id):
+        """Stop waiting for the buffers of a reply, returning the reply (or None)"""
+        msg, timeout = self._direct_replies.pop(msg_id, (None, None))
+        if timeout is not None:
+            self._io_loop.remove_timeout(timeout)
+        return msg
+
+    @unpack_message
+    def _handle_direct_buffers(self, reply):
+        """Put buffers fetched from an engine into place, and handle the reply"""
+        msg_id = reply['content']['msg_id']
+        msg = self._pop_direct_reply(msg_id)
+        if msg is None:
+            # reply already handled, e.g. the engine died or we gave up waiting
+            return
+        info = msg['metadata'].pop('direct_buffers')
+        buffers = reply['buffers']
+        if reply['content']['status'] == 'ok' and len(buffers) == len(info['indices']):
+            msg['buffers'] = list(msg['buffers'])
+            for index, buf in zip(info['indices'], buffers):
+                msg['buffers'][index] = buf
+            self._handle_apply_reply(msg)
+        else:
+            self._fail_direct_reply(
+                msg,
+                f"Result data for {msg_id} is no longer available from {info['url']}",
+            )
+
+    def _direct_buffers_failed(self, msg_id, reason):
+        """Fail a reply whose held buffers could not be fetched"""
+        msg = self._pop_direct_reply(msg_id)
+        if msg is not None:
+            msg['metadata'].pop('direct_buffers')
+            self._fail_direct_reply(msg, reason)
+
+    def _fail_direct_reply(self, msg, reason):
+        """Handle a reply as an EngineError, because its buffers are missing"""
+        try:
+            raise error.EngineError(reason)
+        except Exception:
+            msg['content'] = error.wrap_exception()
+        self._handle_apply_reply(msg)
+
     def _make_io_loop(self):
         """Make my IOLoop. Override with IOLoop.current to return"""
         # runs first thing in the io thread
@@ -1034,6 +1250,14 @@ class Client(HasTraits):
         loop = ioloop.IOLoop(make_current=False)
         return loop
 
+    def _call_in_io_loop(self, callback):
+        """Schedule a callback to run in the IO thread"""
+        self._io_loop.add_callback(callback)
+
+    def _wrap_future(self, future):
+        """Wrap one of my Futures in an asyncio Future on the running loop"""
+        return asyncio.wrap_future(future)
+
     def _stop_io_thread(self):
         """Stop my IO thread"""
         if self._io_loop:
@@ -1152,9 +1376,9 @@ class Client(HasTraits):
                 new_text = _cr_pat.sub('', new_text)
             md[name] = new_text
         elif msg_type == 'error':
-            md.update({'error': self._unwrap_exception(content)})
+            md.error = self._unwrap_exception(content)
         elif msg_type == 'execute_input':
-            md.update({'execute_input': content['code']})
+            md.execute_input = content['code']
         elif msg_type == 'display_data':
             md['outputs'].append(content)
         elif msg_type == 'execute_result':
@@ -1261,6 +1485,44 @@ class Client(HasTraits):
         msg = self.session.msg(
             msg_type, content=content, parent=parent, header=header, metadata=metadata
         )
+        futures = self._register_message(
+            msg,
+            ident,
+            track=track,
+            track_outstanding=track_outstanding,
+            message_future_hook=message_future_hook,
+        )
+
+        def _really_send():
+            sent = self.session.send(
+                socket, msg, track=track, buffers=buffers, ident=ident
+            )
+            if track:
+                futures[0].tracker.set_result(sent['tracker'])
+
+        # hand off actual send to IO thread
+        self._call_in_io_loop(_really_send)
+        if futures:
+            return futures[0]
+
+    def _register_message(
+        self,
+        msg,
+        ident=None,
+        track=False,
+        track_outstanding=False,
+        message_future_hook=None,
+        cleanup=True,
+    ):
+        """Record a message about to be sent, and create its Futures
+
+        Returns the list of Futures for the reply (and output),
+        or None if no reply is expected.
+
+        If `cleanup` is False, the caller is responsible for purging
+        caches when the Futures resolve (see :meth:`_purge_message`).
+        """
+        msg_type = msg['header']['msg_type']
         msg_id = msg['header']['msg_id']
 
         expect_reply = msg_type not in {"comm_msg", "comm_close", "comm_open"}
@@ -1279,38 +1541,85 @@ class Client(HasTraits):
                 if ident_str in self._engines.values():
                     # save for later, in case of engine death
                     self._outstanding_dict[ident_str].add(msg_id)
-            self.metadata['submitted'] = util.utcnow()
 
-        if expect_reply:
-            futures = self.create_message_futures(
-                msg_id,
-                msg['header'],
-                async_result=msg_type in {'execute_request', 'apply_request'},
-                track=track,
+        if not expect_reply:
+            return None
+
+        futures = self.create_message_futures(
+            msg_id,
+            msg['header'],
+            async_result=msg_type in {'execute_request', 'apply_request'},
+            track=track,
+        )
+        if message_future_hook is not None:
+            message_future_hook(futures[0])
+
+        if cleanup:
+            multi_future(futures).add_done_callback(
+                lambda f: self._purge_message(msg_id)
             )
-            if message_future_hook is not None:
-                message_future_hook(futures[0])
+        return futures
 
-            def cleanup(f):
-                """Purge caches on Future resolution"""
-                self.results.pop(msg_id, None)
-                self._futures.pop(msg_id, None)
-                self._output_futures.pop(msg_id, None)
-                self.metadata.pop(msg_id, None)
+    def _purge_message(self, msg_id):
+        """Purge caches on Future resolution"""
+        if not self.results.maxsize:
+            # a bounded result store keeps recent results after delivery
+            self.results.pop(msg_id, None)
+        self._futures.pop(msg_id, None)
+        self._output_futures.pop(msg_id, None)
+        self.metadata.pop(msg_id, None)
 
-            multi_future(futures).add_done_callback(cleanup)
+    def _send_batch(self, socket, requests, track=False):
+        """Send a batch of messages in a single IO thread callback
 
-        def _really_send():
-            sent = self.session.send(
-                socket, msg, track=track, buffers=buffers, ident=ident
+        `requests` is an iterable of ``(msg_type, content, buffers, metadata, ident)``
+        tuples. All messages are expected to have replies,
+        and are tracked as outstanding.
+
+        Each message's caches are purged as soon as its reply and output are done,
+        by one callback shared by the whole batch,
+        rather than a `multi_future` per message.
+
+        Returns the list of reply Futures, in the order of `requests`.
+        """
+        if self._closed:
+            raise OSError("Connections have been closed.")
+        session = self.session
+        batch = []
+        futures = []
+        # msg_id: number of the message's futures not done yet
+        pending = {}
+        lock = Lock()
+
+        def cleanup(f):
+            with lock:
+                pending[f.msg_id] -= 1
+                if pending[f.msg_id]:
+                    return
+                del pending[f.msg_id]
+            self._purge_message(f.msg_id)
+
+        for msg_type, content, buffers, metadata, ident in requests:
+            msg = session.msg(msg_type, content=content, metadata=metadata)
+            msg_futures = self._register_message(
+                msg, ident, track=track, track_outstanding=True, cleanup=False
             )
-            if track:
-                futures[0].tracker.set_result(sent['tracker'])
+            pending[msg['header']['msg_id']] = len(msg_futures)
+            for future in msg_futures:
+                future.add_done_callback(cleanup)
+            futures.append(msg_futures[0])
+            batch.append((msg, buffers, ident))
+
+        def _really_send_batch():
+            for future, (msg, buffers, ident) in zip(futures, batch):
+                sent = session.send(
+                    socket, msg, track=track, buffers=buffers, ident=ident
+                )
+                if track:
+                    future.tracker.set_result(sent['tracker'])
 
-        # hand off actual send to IO thread
-        self._io_loop.add_callback(_really_send)
-        if expect_reply:
-            return futures[0]
+        self._call_in_io_loop(_really_send_batch)
+        return futures
 
     def _send_recv(self, *args, **kwargs):
         """Send a message in the IO thread and return its reply"""
@@ -1318,6 +1627,21 @@ class Client(HasTraits):
         future.wait()
         return future.result()
 
+    def _run_query(self, query):
+        """Run a query generator to completion, and return its result
+
+        `query` yields the arguments for :meth:`_send_recv`,
+        and is sent back each reply.
+        Subclasses may run the same generator without blocking
+        (see :class:`.AsyncClient`).
+        """
+        try:
+            request = next(query)
+            while True:
+                request = query.send(self._send_recv(*request))
+        except StopIteration as e:
+            return e.value
+
     # --------------------------------------------------------------------------
     # len, getitem
     # --------------------------------------------------------------------------
@@ -1392,6 +1716,7 @@ class Client(HasTraits):
                     socket.close(linger=linger)
                 else:
                     socket.close()
+        self.results.close()
         self._closed = True
 
     def spin_thread(self, interval=1):
@@ -1623,10 +1948,17 @@ class Client(HasTraits):
         True : when all msg_ids are done
         False : timeout reached, some msg_ids still outstanding
         """
+        return self._await_futures(self._futures_for_jobs(jobs), timeout)
+
+    def _futures_for_jobs(self, jobs=None):
+        """Turn the `jobs` argument of :meth:`wait` into a list of Futures
+
+        Returns an empty list if there is nothing to wait for.
+        """
         futures = []
         if jobs is None:
             if not self.outstanding:
-                return True
+                return futures
             # make a copy, so that we aren't passing a mutable collection to _futures_for_msgs
             theids = set(self.outstanding)
         else:
@@ -1647,10 +1979,10 @@ class Client(HasTraits):
                     continue
                 theids.add(job)
             if not futures and not theids.intersection(self.outstanding):
-                return True
+                return futures
 
         futures.extend(self._futures_for_msgs(theids))
-        return self._await_futures(futures, timeout)
+        return futures
 
     def wait_interactive(self, jobs=None, interval=1.0, timeout=-1.0):
         """Wait interactively for jobs
@@ -1950,29 +2282,149 @@ class Client(HasTraits):
             raise TypeError(f"kwargs must be dict, not {type(kwargs)}")
         if not isinstance(metadata, dict):
             raise TypeError(f"metadata must be dict, not {type(metadata)}")
+        metadata = self._apply_metadata(metadata)
 
-        bufs = serialize.pack_apply_message(
-            f,
-            args,
-            kwargs,
-            buffer_threshold=self.session.buffer_threshold,
-            item_threshold=self.session.item_threshold,
-        )
+        try:
+            with sharedmem.collect() as shared_memory:
+                bufs = serialize.pack_apply_message(
+                    f,
+                    args,
+                    kwargs,
+                    buffer_threshold=self.session.buffer_threshold,
+                    item_threshold=self.session.item_threshold,
+                )
 
-        future = self._send(
-            socket,
-            "apply_request",
-            buffers=bufs,
-            ident=ident,
-            metadata=metadata,
-            track=track,
-            track_outstanding=True,
-            message_future_hook=message_future_hook,
-        )
-        msg_id = future.msg_id
+            if shared_memory:
+                sharedmem.retain(shared_memory)
+
+                def hook(future, message_future_hook=message_future_hook):
+                    # before the request is sent
+                    self._hold_shared_memory(future, shared_memory)
+                    if message_future_hook is not None:
+                        message_future_hook(future)
+
+                message_future_hook = hook
+
+            future = self._send(
+                socket,
+                "apply_request",
+                buffers=bufs,
+                ident=ident,
+                metadata=metadata,
+                track=track,
+                track_outstanding=True,
+                message_future_hook=message_future_hook,
+            )
+        except BaseException:
+            # the request was not sent, nothing else will release its segments
+            sharedmem.release(shared_memory)
+            raise
 
         return future
 
+    def _apply_metadata(self, metadata):
+        """Add what engines need to know about this client to apply_request metadata"""
+        if self._ssh:
+            # engines' data ports aren't reachable through the ssh tunnels,
+            # have them relay result buffers through the controller
+            metadata = dict(metadata, direct_data=False)
+        return metadata
+
+    def _hold_shared_memory(self, future, names):
+        """Keep shared memory segments sent with a request until its reply arrives
+
+        `names` must already be retained with :func:`sharedmem.retain`.
+        """
+        self._shared_memory[future.msg_id] = names
+        future.add_done_callback(lambda f: self._release_shared_memory(f.msg_id))
+
+    def _release_shared_memory(self, msg_id):
+        """Release shared memory segments sent with request `msg_id`
+
+        Called when its reply arrives,
+        or when all replies to a broadcast request have arrived.
+        """
+        names = self._shared_memory.pop(msg_id, None)
+        if names:
+            sharedmem.release(names)
+
+    def send_apply_requests(
+        self,
+        socket,
+        f,
+        args_list,
+        kwargs=None,
+        metadata=None,
+        track=False,
+        idents=None,
+    ):
+        """construct and send many apply messages via a socket, as one batch.
+
+        Equivalent to calling :meth:`send_apply_request` for each `args` in `args_list`,
+        but the messages are handed to the IO thread together
+        and sent in a single callback.
+
+        `f`, `kwargs` and `metadata` are shared by all requests.
+        If `idents` is given, requests are assigned to them round-robin.
+
+        Returns a list of MessageFutures, one per request.
+        """
+
+        if self._closed:
+            raise RuntimeError(
+                "Client cannot be used after its sockets have been closed"
+            )
+
+        # defaults:
+        kwargs = kwargs if kwargs is not None else {}
+        metadata = metadata if metadata is not None else {}
+
+        # validate arguments
+        if not callable(f) and not isinstance(f, (Reference, PrePickled)):
+            raise TypeError(f"f must be callable, not {type(f)}")
+        if not isinstance(kwargs, dict):
+            raise TypeError(f"kwargs must be dict, not {type(kwargs)}")
+        if not isinstance(metadata, dict):
+            raise TypeError(f"metadata must be dict, not {type(metadata)}")
+        metadata = self._apply_metadata(metadata)
+        args_list = list(args_list)
+        for args in args_list:
+            if not isinstance(args, (tuple, list)):
+                raise TypeError(f"args must be tuple or list, not {type(args)}")
+
+        buffer_threshold = self.session.buffer_threshold
+        item_threshold = self.session.item_threshold
+
+        # serialize everything before registering any messages,
+        # so a serialization error doesn't leave a partial batch
+        requests = []
+        shared_memory = []
+        try:
+            for i, args in enumerate(args_list):
+                with sharedmem.collect() as names:
+                    shared_memory.append(names)
+                    bufs = serialize.pack_apply_message(
+                        f,
+                        args,
+                        kwargs,
+                        buffer_threshold=buffer_threshold,
+                        item_threshold=item_threshold,
+                    )
+                sharedmem.retain(names)
+                ident = idents[i % len(idents)] if idents else None
+                requests.append(("apply_request", None, bufs, metadata, ident))
+
+            futures = self._send_batch(socket, requests, track=track)
+        except BaseException:
+            # the batch was not sent, nothing else will release its segments
+            for names in shared_memory:
+                sharedmem.release(names)
+            raise
+        for future, names in zip(futures, shared_memory):
+            if names:
+                self._hold_shared_memory(future, names)
+        return futures
+
     def send_execute_request(
         self,
         socket,
@@ -2178,22 +2630,26 @@ class Client(HasTraits):
         if indices_or_msg_ids is None:
             indices_or_msg_ids = -1
 
+        ar = self._run_query(self._resubmit(indices_or_msg_ids))
+
+        if block:
+            ar.wait()
+
+        return ar
+
+    def _resubmit(self, indices_or_msg_ids):
+        """Query generator for :meth:`resubmit`"""
         theids = self._msg_ids_from_jobs(indices_or_msg_ids)
         content = dict(msg_ids=theids)
 
-        reply = self._send_recv(self._query_stream, 'resubmit_request', content)
+        reply = yield (self._query_stream, 'resubmit_request', content)
         content = reply['content']
         if content['status'] != 'ok':
             raise self._unwrap_exception(content)
         mapping = content['resubmitted']
         new_ids = [mapping[msg_id] for msg_id in theids]
 
-        ar = AsyncHubResult(self, new_ids)
-
-        if block:
-            ar.wait()
-
-        return ar
+        return AsyncHubResult(self, new_ids)
 
     def result_status(self, msg_ids, status_only=True):
         """Check on the status of the result(s) of the apply request with `msg_ids`.
@@ -2217,6 +2673,10 @@ class Client(HasTraits):
             be lists of msg_ids that are incomplete or complete. If `status_only`
             is False, then completed results will be keyed by their `msg_id`.
         """
+        return self._run_query(self._result_status(msg_ids, status_only))
+
+    def _result_status(self, msg_ids, status_only):
+        """Query generator for :meth:`result_status`"""
         theids = self._msg_ids_from_jobs(msg_ids)
 
         completed = []
@@ -2231,9 +2691,7 @@ class Client(HasTraits):
 
         if theids:  # some not locally cached
             content = dict(msg_ids=theids, status_only=status_only)
-            reply = self._send_recv(
-                self._query_stream, "result_request", content=content
-            )
+            reply = yield (self._query_stream, "result_request", content)
             content = reply['content']
             if content['status'] != 'ok':
                 raise self._unwrap_exception(content)
@@ -2254,8 +2712,8 @@ class Client(HasTraits):
         for msg_id in sorted(theids):
             if msg_id in content['completed']:
                 rec = content[msg_id]
-                parent = util.extract_dates(rec['header'])
-                header = util.extract_dates(rec['result_header'])
+                parent = rec['header']
+                header = rec['result_header']
                 rcontent = rec['result_content']
                 iodict = rec['io']
                 if isinstance(rcontent, str):
@@ -2268,9 +2726,9 @@ class Client(HasTraits):
                     header=header,
                     metadata=rec['result_metadata'],
                 )
-                md.update(self._extract_metadata(md_msg))
+                self._update_metadata(md, md_msg)
                 if rec.get('received'):
-                    md['received'] = util._parse_date(rec['received'])
+                    md['received'] = rec['received']
                 md.update(iodict)
 
                 if rcontent['status'] == 'ok':
@@ -2306,13 +2764,17 @@ class Client(HasTraits):
         verbose : bool
             Whether to return lengths only, or lists of ids for each element
         """
+        return self._run_query(self._queue_status(targets, verbose))
+
+    def _queue_status(self, targets, verbose):
+        """Query generator for :meth:`queue_status`"""
         if targets == 'all':
             # allow 'all' to be evaluated on the engine
             engine_ids = None
         else:
             engine_ids = self._build_targets(targets)[1]
         content = dict(targets=engine_ids, verbose=verbose)
-        reply = self._send_recv(self._query_stream, "queue_request", content=content)
+        reply = yield (self._query_stream, "queue_request", content)
         content = reply['content']
         status = content.pop('status')
         if status != 'ok':
@@ -2467,6 +2929,10 @@ class Client(HasTraits):
 
             default : None
         """
+        return self._run_query(self._purge_hub_results(jobs, targets))
+
+    def _purge_hub_results(self, jobs, targets):
+        """Query generator for :meth:`purge_hub_results`"""
         if not targets and not jobs:
             raise ValueError("Must specify at least one of `targets` and `jobs`")
         if targets:
@@ -2479,7 +2945,7 @@ class Client(HasTraits):
             msg_ids = self._msg_ids_from_jobs(jobs)
 
         content = dict(engine_ids=targets, msg_ids=msg_ids)
-        reply = self._send_recv(self._query_stream, "purge_request", content=content)
+        reply = yield (self._query_stream, "purge_request", content)
         content = reply['content']
         if content['status'] != 'ok':
             raise self._unwrap_exception(content)
@@ -2515,7 +2981,7 @@ class Client(HasTraits):
         other bookkeeping lists.
         """
         self.purge_results("all")
-        self.history = []
+        self.history.clear()
         self.session.digest_history.clear()
 
     def hub_history(self):
@@ -2532,14 +2998,50 @@ class Client(HasTraits):
         msg_ids : list of strs
             list of all msg_ids, ordered by task submission time.
         """
+        return self._run_query(self._hub_history())
 
-        reply = self._send_recv(self._query_stream, "history_request", content={})
+    def _hub_history(self):
+        """Query generator for :meth:`hub_history`"""
+        reply = yield (self._query_stream, "history_request", {})
         content = reply['content']
         if content['status'] != 'ok':
             raise self._unwrap_exception(content)
         else:
             return content['history']
 
+    def hub_metrics(self):
+        """Get task counters and latency histograms from the Hub
+
+        Only available when the Hub is running with `Hub.metrics_only`
+        (`ipcontroller --metrics`).
+
+        Returns
+        -------
+        metrics : dict
+            With keys:
+
+            - engines: dict of counters, keyed by integer engine id
+            - clients: dict of counters, keyed by client session id
+            - unassigned: number of tasks waiting in the task scheduler
+            - latency: histogram of time from submission to completion
+            - runtime: histogram of time from start to completion on the engine
+
+            Histograms are dicts with the total `count`, `total` time in seconds,
+            and `buckets`, where bucket 0 counts durations under 1ms
+            and bucket i counts durations in [2 ** (i - 1), 2 ** i) ms.
+        """
+        return self._run_query(self._hub_metrics())
+
+    def _hub_metrics(self):
+        """Query generator for :meth:`hub_metrics`"""
+        reply = yield (self._query_stream, "metrics_request", {})
+        content = reply['content']
+        if content['status'] != 'ok':
+            raise self._unwrap_exception(content)
+        metrics = content['metrics']
+        metrics['engines'] = util.int_keys(metrics['engines'])
+        return metrics
+
     def db_query(self, query, keys=None):
         """Query the Hub's TaskRecord database
 
@@ -2553,10 +3055,14 @@ class Client(HasTraits):
             The subset of keys to be returned.  The default is to fetch everything but buffers.
             'msg_id' will *always* be included.
         """
+        return self._run_query(self._db_query(query, keys))
+
+    def _db_query(self, query, keys):
+        """Query generator for :meth:`db_query`"""
         if isinstance(keys, str):
             keys = [keys]
         content = dict(query=query, keys=keys)
-        reply = self._send_recv(self._query_stream, "db_request", content=content)
+        reply = yield (self._query_stream, "db_request", content)
         content = reply['content']
         if content['status'] != 'ok':
             raise self._unwrap_exception(content)
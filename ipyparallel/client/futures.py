@@ -4,12 +4,77 @@
 # Distributed under the terms of the Modified BSD License.
 import sys
 from concurrent.futures import Future
-from threading import Event
+from threading import Event, Lock
 
 from tornado.log import app_log
 
 
-class MessageFuture(Future):
+class ReplaceableFuture(Future):
+    """Future whose result can be replaced after it is set
+
+    The result and the done callbacks are kept here, rather than in the base Future,
+    so that memory held by a result can be released (or shared)
+    once it has been consumed or copied elsewhere,
+    and callbacks (and the objects they reference) are released once they have run.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._value = None
+        self._callbacks_lock = Lock()
+        # None once the callbacks have run
+        self._callbacks = []
+
+    def add_done_callback(self, fn):
+        with self._callbacks_lock:
+            if self._callbacks is not None:
+                self._callbacks.append(fn)
+                return
+        self._run_callback(fn)
+
+    def _run_callback(self, fn):
+        try:
+            fn(self)
+        except Exception:
+            app_log.exception("exception calling callback for %r", self)
+
+    def _run_callbacks(self):
+        with self._callbacks_lock:
+            callbacks, self._callbacks = self._callbacks, None
+        for fn in callbacks:
+            self._run_callback(fn)
+
+    def set_result(self, result):
+        with self._callbacks_lock:
+            if not self.done():
+                self._value = result
+            # raises if already done
+            super().set_result(None)
+        self._run_callbacks()
+
+    def set_exception(self, exception):
+        super().set_exception(exception)
+        self._run_callbacks()
+
+    def cancel(self):
+        if not super().cancel():
+            return False
+        self._run_callbacks()
+        return True
+
+    def result(self, timeout=None):
+        # waits, and raises if there is no result
+        super().result(timeout)
+        return self._value
+
+    def replace_result(self, result):
+        """Replace the result of a finished Future"""
+        if not self.done():
+            raise RuntimeError("Cannot replace the result of an unfinished Future")
+        self._value = result
+
+
+class MessageFuture(ReplaceableFuture):
     """Future class to wrap async messages"""
 
     def __init__(self, msg_id, header=None, *, track=False):
@@ -91,7 +156,7 @@ def multi_future(children):
     """
     unfinished_children = set(children)
 
-    future = Future()
+    future = ReplaceableFuture()
     if not children:
         future_set_result_unless_cancelled(future, [])
 
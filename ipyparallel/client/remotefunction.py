@@ -178,6 +178,14 @@ class ParallelFunction(RemoteFunction):
         Whether the result should be kept in order. If False,
         results become available as they arrive, regardless of submission order.
     return_exceptions : bool [default: False]
+    out : numpy array or True [default: None]
+        Write results into a single array as they arrive,
+        instead of concatenating them at the end.
+        If True, the array is allocated with the dtype and shape of the first result.
+        The output of each task must have the same length as its input.
+        Only supported with dist='b'.
+
+        .. versionadded:: 9.1
     **flags
         remaining kwargs are passed to View.temp_flags
     """
@@ -185,6 +193,7 @@ class ParallelFunction(RemoteFunction):
     chunksize = None
     ordered = None
     mapObject = None
+    out = None
 
     def __init__(
         self,
@@ -195,12 +204,16 @@ class ParallelFunction(RemoteFunction):
         chunksize=None,
         ordered=True,
         return_exceptions=False,
+        out=None,
         **flags,
     ):
         super().__init__(view, f, block=block, **flags)
         self.chunksize = chunksize
         self.ordered = ordered
         self.return_exceptions = return_exceptions
+        if out is not None and dist != 'b':
+            raise ValueError(f"out is not supported with dist={dist!r}")
+        self.out = out
 
         mapClass = Map.dists[dist]
         self.mapObject = mapClass()
@@ -270,6 +283,7 @@ class ParallelFunction(RemoteFunction):
 
         chunk_sizes = {}
         chunk_size = 1
+        lengths = []
 
         for index, t in enumerate(targets):
             args = []
@@ -279,6 +293,7 @@ class ParallelFunction(RemoteFunction):
 
             if sum(len(arg) for arg in args) == 0:
                 continue
+            lengths.append(min(len(arg) for arg in args))
 
             if _mapping:
                 chunk_size = min(len(arg) for arg in args)
@@ -308,6 +323,8 @@ class ParallelFunction(RemoteFunction):
             ordered=self.ordered,
             return_exceptions=self.return_exceptions,
             chunk_sizes=chunk_sizes,
+            out=self.out,
+            lengths=lengths,
         )
 
         if self.block:
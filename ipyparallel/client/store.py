@@ -0,0 +1,344 @@
+"""Bounded bookkeeping containers for the Client
+
+A long-running Client submits an unbounded number of messages,
+so its history and result cache are bounded here:
+
+- MsgHistory is a list-like record of submitted msg_ids
+  with O(1) membership, optionally keeping only the most recent entries.
+- ResultStore is an LRU mapping of msg_id to result,
+  which can spill evicted results to a memory-mapped file on disk.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import mmap
+import os
+import tempfile
+import warnings
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping, Sequence
+from threading import RLock
+
+from ipyparallel.serialize import deserialize_object, serialize_object
+
+_missing = object()
+
+
+class MsgHistory(Sequence):
+    """Ordered record of submitted msg_ids with O(1) membership
+
+    Behaves like a list of msg_ids, in submission order.
+    If `maxlen` is given, only the most recent `maxlen` msg_ids are kept.
+    Indices are not shifted when old msg_ids are dropped:
+    ``len(history)`` is the number of msg_ids ever added,
+    ``history[-1]`` is always the most recent,
+    and looking up the index of a dropped msg_id raises IndexError.
+    Iteration covers only the msg_ids still kept.
+    """
+
+    def __init__(self, msg_ids=(), maxlen=None):
+        self.maxlen = maxlen or None
+        self._msg_ids = deque(maxlen=self.maxlen)
+        self._members = set()
+        self._dropped = 0
+        self.extend(msg_ids)
+
+    def append(self, msg_id):
+        if self.maxlen and len(self._msg_ids) == self.maxlen:
+            self._members.discard(self._msg_ids[0])
+            self._dropped += 1
+        self._msg_ids.append(msg_id)
+        self._members.add(msg_id)
+
+    def extend(self, msg_ids):
+        for msg_id in msg_ids:
+            self.append(msg_id)
+
+    def clear(self):
+        self._msg_ids.clear()
+        self._members.clear()
+        self._dropped = 0
+
+    def __len__(self):
+        return self._dropped + len(self._msg_ids)
+
+    def __contains__(self, msg_id):
+        return msg_id in self._members
+
+    def __iter__(self):
+        return iter(self._msg_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [
+                self._msg_ids[i - self._dropped]
+                for i in range(*index.indices(len(self)))
+                if i >= self._dropped
+            ]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("history index out of range")
+        if index < self._dropped:
+            raise IndexError(
+                f"history index {index} has been dropped (keeping {self.maxlen} msg_ids)"
+            )
+        return self._msg_ids[index - self._dropped]
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({len(self)} msg_ids, maxlen={self.maxlen})>"
+
+
+class SpillFile:
+    """Append-only file of serialized results, read via mmap
+
+    Each result is stored as the buffers of `serialize_object`,
+    and located by an in-memory index of msg_id to buffer offsets and lengths.
+    Space of removed results is reclaimed by :meth:`compact`,
+    which runs automatically once the file is at least `compact_size` bytes
+    and less than half of it is still in use.
+    """
+
+    def __init__(self, directory=None, compact_size=1 << 20):
+        self.directory = directory
+        self.compact_size = compact_size
+        self._file = self._open()
+        self._mmap = None
+        self._size = 0
+        self._live = 0
+        self._index = {}
+
+    def _open(self):
+        fd, self.path = tempfile.mkstemp(
+            prefix="ipp-results-", suffix=".bin", dir=self.directory
+        )
+        return os.fdopen(fd, "w+b")
+
+    def _map(self, end):
+        """Ensure the mmap covers the file up to `end`"""
+        if self._mmap is None or len(self._mmap) < end:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def write(self, msg_id, obj):
+        bufs = serialize_object(obj)
+        self.discard(msg_id)
+        frames = []
+        self._file.seek(self._size)
+        for buf in bufs:
+            buf = memoryview(buf).cast("B")
+            self._file.write(buf)
+            frames.append((self._size, len(buf)))
+            self._size += len(buf)
+        self._index[msg_id] = frames
+        self._live += sum(length for offset, length in frames)
+
+    def read(self, msg_id):
+        frames = self._index[msg_id]
+        offset, length = frames[-1]
+        mm = self._map(offset + length)
+        # copy out of the mmap, so it can be remapped when the file grows
+        bufs = [mm[offset : offset + length] for offset, length in frames]
+        return deserialize_object(bufs)[0]
+
+    def discard(self, msg_id):
+        frames = self._index.pop(msg_id, None)
+        if frames is None:
+            return
+        self._live -= sum(length for offset, length in frames)
+        if not self._index:
+            self.clear()
+        elif self._size >= self.compact_size and 2 * self._live < self._size:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the results still in use to a new file, and remove the old one"""
+        old_file, old_path = self._file, self.path
+        mm = self._map(self._size)
+        self._file = self._open()
+        self._size = 0
+        for msg_id, frames in self._index.items():
+            new_frames = []
+            for offset, length in frames:
+                self._file.write(mm[offset : offset + length])
+                new_frames.append((self._size, length))
+                self._size += length
+            self._index[msg_id] = new_frames
+        mm.close()
+        self._mmap = None
+        old_file.close()
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+
+    def clear(self):
+        self._index.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.truncate(0)
+        self._size = 0
+        self._live = 0
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __contains__(self, msg_id):
+        return msg_id in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+class ResultStore(MutableMapping):
+    """Mapping of msg_id to result, with bounded memory
+
+    At most `maxsize` results are kept in memory (0 for no limit).
+    The least recently used results are evicted first.
+    If `spill` is True, evicted results are written to a memory-mapped
+    file in `spill_dir` (default: the system temp dir),
+    and loaded back into memory when accessed.
+    Otherwise, evicted results are dropped,
+    and can be retrieved from the Hub with `Client.get_result`.
+
+    The store is shared by the Client's IO thread and the user's thread,
+    so all access is serialized by a lock.
+    """
+
+    def __init__(self, maxsize=0, spill=False, spill_dir=None):
+        self.maxsize = maxsize
+        self.spill_dir = spill_dir
+        self._spill_enabled = spill
+        self._results = OrderedDict()
+        self._spill = None
+        self._lock = RLock()
+
+    def _evict(self):
+        while self.maxsize and len(self._results) > self.maxsize:
+            msg_id, result = self._results.popitem(last=False)
+            if not self._spill_enabled:
+                continue
+            if self._spill is None:
+                self._spill = SpillFile(self.spill_dir)
+            try:
+                self._spill.write(msg_id, result)
+            except Exception as e:
+                warnings.warn(
+                    f"Dropping result {msg_id} that could not be spilled to disk: {e}",
+                    RuntimeWarning,
+                    stacklevel=4,
+                )
+
+    def __getitem__(self, msg_id):
+        with self._lock:
+            try:
+                result = self._results[msg_id]
+            except KeyError:
+                if self._spill is None or msg_id not in self._spill:
+                    raise
+                result = self._spill.read(msg_id)
+                self._spill.discard(msg_id)
+                self._results[msg_id] = result
+                self._evict()
+            else:
+                self._results.move_to_end(msg_id)
+            return result
+
+    def __setitem__(self, msg_id, result):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.discard(msg_id)
+            self._results[msg_id] = result
+            self._results.move_to_end(msg_id)
+            self._evict()
+
+    def __delitem__(self, msg_id):
+        with self._lock:
+            if msg_id in self._results:
+                del self._results[msg_id]
+            elif self._spill is not None and msg_id in self._spill:
+                self._spill.discard(msg_id)
+            else:
+                raise KeyError(msg_id)
+
+    def __contains__(self, msg_id):
+        with self._lock:
+            return msg_id in self._results or (
+                self._spill is not None and msg_id in self._spill
+            )
+
+    def __iter__(self):
+        with self._lock:
+            msg_ids = list(self._results)
+            if self._spill is not None:
+                msg_ids.extend(self._spill)
+        return iter(msg_ids)
+
+    def __len__(self):
+        with self._lock:
+            n = len(self._results)
+            if self._spill is not None:
+                n += len(self._spill)
+            return n
+
+    def get(self, msg_id, default=None):
+        with self._lock:
+            if msg_id in self:
+                return self[msg_id]
+            return default
+
+    def pop(self, msg_id, default=_missing):
+        with self._lock:
+            if msg_id in self._results:
+                return self._results.pop(msg_id)
+            if self._spill is not None and msg_id in self._spill:
+                result = self._spill.read(msg_id)
+                self._spill.discard(msg_id)
+                return result
+        if default is _missing:
+            raise KeyError(msg_id)
+        return default
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            if self._spill is not None:
+                self._spill.clear()
+
+    @property
+    def spilled(self):
+        """The number of results currently on disk"""
+        with self._lock:
+            return 0 if self._spill is None else len(self._spill)
+
+    def close(self):
+        """Remove the spill file, if any"""
+        with self._lock:
+            self._results.clear()
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__}({len(self._results)} in memory,"
+            f" {self.spilled} on disk, maxsize={self.maxsize})>"
+        )
+
+
+__all__ = ['MsgHistory', 'ResultStore']
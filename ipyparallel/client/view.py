@@ -10,11 +10,12 @@ import threading
 import time
 import warnings
 from collections import deque
+from collections.abc import MutableMapping
 from contextlib import contextmanager
 
 from decorator import decorator
 from IPython import get_ipython
-from traitlets import Any, Bool, CFloat, Dict, HasTraits, Instance, Integer, List, Set
+from traitlets import Any, Bool, CFloat, HasTraits, Instance, Integer, List, Set
 
 import ipyparallel as ipp
 from ipyparallel import util
@@ -25,6 +26,7 @@ from ..serialize import PrePickled
 from . import map as Map
 from .asyncresult import AsyncMapResult, AsyncResult
 from .remotefunction import ParallelFunction, getname, parallel, remote
+from .store import MsgHistory
 
 # -----------------------------------------------------------------------------
 # Decorators
@@ -39,9 +41,10 @@ def save_ids(f, self, *args, **kwargs):
         ret = f(self, *args, **kwargs)
     finally:
         nmsgs = len(self.client.history) - n_previous
-        msg_ids = self.client.history[-nmsgs:]
-        self.history.extend(msg_ids)
-        self.outstanding.update(msg_ids)
+        if nmsgs:
+            msg_ids = self.client.history[-nmsgs:]
+            self.history.extend(msg_ids)
+            self.outstanding.update(msg_ids)
     return ret
 
 
@@ -99,9 +102,9 @@ class View(HasTraits):
     track = Bool(False)
     targets = Any()
 
-    history = List()
+    history = Instance(MsgHistory)
     outstanding = Set()
-    results = Dict()
+    results = Instance(MutableMapping, allow_none=True)
     client = Instance('ipyparallel.Client', allow_none=True)
 
     _socket = Any()
@@ -112,6 +115,7 @@ class View(HasTraits):
 
     def __init__(self, client=None, socket=None, **flags):
         super().__init__(client=client, _socket=socket)
+        self.history = MsgHistory(maxlen=client.history_length)
         self.results = client.results
         self.block = client.block
         self.executor = ViewExecutor(self)
@@ -227,6 +231,48 @@ class View(HasTraits):
         """
         return self._really_apply(__ipp_f, args, kwargs, block=True)
 
+    def apply_many(self, f, args_list, kwargs=None, block=None):
+        """calls ``f(*args, **kwargs)`` once for each ``args`` in `args_list`.
+
+        Submits one task per item, like calling :meth:`apply_async` in a loop,
+        but `f` and `kwargs` are serialized once
+        and all messages are sent to the IO thread as a single batch,
+        which is much faster for large numbers of small tasks.
+        Not available for BroadcastView.
+
+        .. versionadded:: 9.1
+
+        Parameters
+        ----------
+        f : callable
+        args_list : sequence of tuples
+            the positional arguments for each call
+        kwargs : dict [default: empty]
+            keyword arguments, passed to every call
+        block : bool [default: self.block]
+            whether to wait for the results
+
+        Returns
+        -------
+        if block is False:
+            returns an AsyncResult for all the tasks,
+            whose result is the list of results in the order of `args_list`.
+        else:
+            returns the list of results
+        """
+        args_list = [tuple(args) for args in args_list]
+        if not args_list:
+            raise ValueError("apply_many requires at least one set of arguments")
+        return self._really_apply_many(f, args_list, kwargs, block=block)
+
+    @sync_results
+    @save_ids
+    def _really_apply_many(self, f, args_list, kwargs=None, block=None):
+        """wrapper for client.send_apply_requests"""
+        raise NotImplementedError(
+            f"apply_many is not implemented for {self.__class__.__name__}"
+        )
+
     # ----------------------------------------------------------------
     # wrappers for client and control methods
     # ----------------------------------------------------------------
@@ -255,7 +301,7 @@ class View(HasTraits):
         False : timeout reached, some msg_ids still outstanding
         """
         if jobs is None:
-            jobs = self.history
+            jobs = list(self.history)
         return self.client.wait(jobs, timeout)
 
     def abort(self, jobs=None, targets=None, block=None):
@@ -527,6 +573,22 @@ class DirectView(View):
         serialize.use_pickle()
         return self.apply(serialize.use_pickle)
 
+    def use_shared_memory(self, threshold=1_000_000, ttl=600):
+        """Pass arrays of at least `threshold` bytes through shared memory
+
+        Arrays are placed in shared memory and only a handle is sent,
+        so pushing and pulling large arrays doesn't copy them through sockets.
+        Only use this if the client and all engines are on the same host.
+        0 disables shared memory.
+        Segments not received within `ttl` seconds are removed by their creator.
+
+        This calls ipyparallel.serialize.use_shared_memory() here and on each engine.
+
+        .. versionadded:: 9.1
+        """
+        serialize.use_shared_memory(threshold, ttl)
+        return self.apply(serialize.use_shared_memory, threshold, ttl)
+
     @sync_results
     @save_ids
     def _really_apply(
@@ -592,7 +654,42 @@ class DirectView(View):
         return ar
 
     @sync_results
-    def map(self, f, *sequences, block=None, track=False, return_exceptions=False):
+    @save_ids
+    def _really_apply_many(self, f, args_list, kwargs=None, block=None):
+        """Submit f(*args, **kwargs) for each args, round-robin across targets"""
+        kwargs = {} if kwargs is None else kwargs
+        block = self.block if block is None else block
+
+        _idents, _targets = self.client._build_targets(self.targets)
+        futures = self.client.send_apply_requests(
+            self._socket,
+            PrePickled(f),
+            args_list,
+            {k: PrePickled(v) for k, v in kwargs.items()},
+            track=self.track,
+            idents=_idents,
+        )
+        targets = [_targets[i % len(_targets)] for i in range(len(futures))]
+        ar = AsyncResult(
+            self.client, futures, fname=getname(f), targets=targets, owner=True
+        )
+        if block:
+            try:
+                return ar.get()
+            except KeyboardInterrupt:
+                pass
+        return ar
+
+    @sync_results
+    def map(
+        self,
+        f,
+        *sequences,
+        block=None,
+        track=False,
+        return_exceptions=False,
+        out=None,
+    ):
         """Parallel version of builtin `map`, using this View's `targets`.
 
         There will be one task per target, so work will be chunked
@@ -616,6 +713,12 @@ class DirectView(View):
             Only for zero-copy sends such as numpy arrays that are going to be modified in-place.
         return_exceptions : bool [default False]
             Return remote Exceptions in the result sequence instead of raising them.
+        out : numpy array or True [default None]
+            Write results into a single array as they arrive,
+            instead of building a list.
+            If True, the array is allocated with the dtype and shape of the first result.
+
+            .. versionadded:: 9.1
 
         Returns
         -------
@@ -633,7 +736,12 @@ class DirectView(View):
 
         assert len(sequences) > 0, "must have some sequences to map onto!"
         pf = ParallelFunction(
-            self, f, block=block, track=track, return_exceptions=return_exceptions
+            self,
+            f,
+            block=block,
+            track=track,
+            return_exceptions=return_exceptions,
+            out=out,
         )
         return pf.map(*sequences)
 
@@ -920,9 +1028,20 @@ class BroadcastView(DirectView):
                         self.client._outstanding_dict[ident].discard(original_msg_id)
 
             ar.add_done_callback(_rm_outstanding)
+        else:
+            # the original request has no reply of its own,
+            # it is done with its shared memory when every engine has replied
+            ar.add_done_callback(
+                lambda _: self.client._release_shared_memory(original_msg_id)
+            )
 
         return ar
 
+    def _really_apply_many(self, f, args_list, kwargs=None, block=None):
+        # each request is broadcast to every target,
+        # which doesn't fit the one-task-per-item results of apply_many
+        raise NotImplementedError("apply_many is not implemented for BroadcastView")
+
     @sync_results
     @save_ids
     def _really_apply(
@@ -1036,7 +1155,15 @@ class BroadcastView(DirectView):
         return list(map(f, *sequences))
 
     @_not_coalescing
-    def map(self, f, *sequences, block=None, track=False, return_exceptions=False):
+    def map(
+        self,
+        f,
+        *sequences,
+        block=None,
+        track=False,
+        return_exceptions=False,
+        out=None,
+    ):
         """Parallel version of builtin `map`, using this View's `targets`.
 
         There will be one task per engine, so work will be chunked
@@ -1069,6 +1196,12 @@ class BroadcastView(DirectView):
             Only for zero-copy sends such as numpy arrays that are going to be modified in-place.
         return_exceptions : bool [default False]
             Return remote Exceptions in the result sequence instead of raising them.
+        out : numpy array or True [default None]
+            Write results into a single array as they arrive,
+            instead of building a list.
+            If True, the array is allocated with the dtype and shape of the first result.
+
+            .. versionadded:: 9.1
 
         Returns
         -------
@@ -1118,6 +1251,8 @@ class BroadcastView(DirectView):
                 future.msg_id: chunk_size
                 for future, chunk_size in zip(ar._children, scatter_chunk_sizes)
             },
+            out=out,
+            lengths=scatter_chunk_sizes,
         )
 
         if block:
@@ -1315,6 +1450,45 @@ class LoadBalancedView(View):
             the single result if self.targets is an integer engine id
         """
 
+        # build args
+        args = [] if args is None else args
+        kwargs = {} if kwargs is None else kwargs
+        block = self.block if block is None else block
+        track = self.track if track is None else track
+        metadata = self._task_metadata(
+            f,
+            after=after,
+            follow=follow,
+            timeout=timeout,
+            targets=targets,
+            retries=retries,
+        )
+
+        future = self.client.send_apply_request(
+            self._socket, f, args, kwargs, track=track, metadata=metadata
+        )
+
+        ar = AsyncResult(
+            self.client,
+            future,
+            fname=getname(f),
+            targets=None,
+            owner=True,
+        )
+        if block:
+            try:
+                return ar.get()
+            except KeyboardInterrupt:
+                pass
+        return ar
+
+    def _task_metadata(
+        self, f, after=None, follow=None, timeout=None, targets=None, retries=None
+    ):
+        """Validate scheduler flags and build the metadata for a task request
+
+        Flags that are None are taken from this View.
+        """
         # validate whether we can run
         if self._socket.closed():
             msg = "Task farming is disabled"
@@ -1334,11 +1508,6 @@ class LoadBalancedView(View):
                 # soft warn on functional dependencies
                 warnings.warn(msg, RuntimeWarning)
 
-        # build args
-        args = [] if args is None else args
-        kwargs = {} if kwargs is None else kwargs
-        block = self.block if block is None else block
-        track = self.track if track is None else track
         after = self.after if after is None else after
         retries = self.retries if retries is None else retries
         follow = self.follow if follow is None else follow
@@ -1357,21 +1526,28 @@ class LoadBalancedView(View):
 
         after = self._render_dependency(after)
         follow = self._render_dependency(follow)
-        metadata = dict(
+        return dict(
             after=after, follow=follow, timeout=timeout, targets=idents, retries=retries
         )
 
-        future = self.client.send_apply_request(
-            self._socket, f, args, kwargs, track=track, metadata=metadata
-        )
+    @sync_results
+    @save_ids
+    def _really_apply_many(self, f, args_list, kwargs=None, block=None):
+        """Submit f(*args, **kwargs) for each args as a load-balanced task"""
+        kwargs = {} if kwargs is None else kwargs
+        block = self.block if block is None else block
+        # all tasks share the same scheduler flags
+        metadata = self._task_metadata(f)
 
-        ar = AsyncResult(
-            self.client,
-            future,
-            fname=getname(f),
-            targets=None,
-            owner=True,
+        futures = self.client.send_apply_requests(
+            self._socket,
+            PrePickled(f),
+            args_list,
+            {k: PrePickled(v) for k, v in kwargs.items()},
+            metadata=metadata,
+            track=self.track,
         )
+        ar = AsyncResult(self.client, futures, fname=getname(f), owner=True)
         if block:
             try:
                 return ar.get()
@@ -1389,6 +1565,7 @@ class LoadBalancedView(View):
         chunksize=1,
         ordered=True,
         return_exceptions=False,
+        out=None,
     ):
         """Parallel version of builtin `map`, load-balanced by this View.
 
@@ -1418,6 +1595,12 @@ class LoadBalancedView(View):
 
         return_exceptions: bool [default False]
             Return Exceptions instead of raising on the first exception.
+        out : numpy array or True [default None]
+            Write results into a single array as they arrive,
+            instead of building a list.
+            If True, the array is allocated with the dtype and shape of the first result.
+
+            .. versionadded:: 9.1
 
         Returns
         -------
@@ -1443,6 +1626,7 @@ class LoadBalancedView(View):
             chunksize=chunksize,
             ordered=ordered,
             return_exceptions=return_exceptions,
+            out=out,
         )
         return pf.map(*sequences)
 
@@ -0,0 +1,313 @@
+"""Fork server for starting engines quickly
+
+The fork server is a template process that imports everything an engine needs
+(plus any modules it is asked to preload) once,
+and then starts each engine by forking itself,
+so engines do not pay the cost of importing IPython, ipykernel, zmq, etc.
+in a fresh Python process.
+
+Requests are sent as lines of JSON on the server's stdin,
+and the pid of each started engine is written as a line of JSON on stdout.
+Engines are children of the fork server, which reaps them
+and reports each engine's exit as an event,
+like :mod:`ipyparallel.cluster.sshagent`::
+
+    -> {"args": ["--profile-dir=..."], "env": {...}, "cwd": "...", "output_file": "..."}
+    <- {"pid": 1234}
+    <- {"event": "exit", "pid": 1234, "exit_code": -15}
+
+The server exits when its stdin is closed.
+Engines it has started keep running, but their exits are no longer reported.
+Requires :func:`os.fork`, so it is not available on Windows.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import importlib
+import json
+import logging
+import os
+import selectors
+import signal
+import sys
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from subprocess import PIPE, Popen
+from threading import Lock
+
+from ..util import _OutputProducingThread as Thread
+
+
+class ForkServer:
+    """Handle on a fork server process, used by ForkServerEngineSetLauncher
+
+    Parameters
+    ----------
+    preload : list of str
+        Modules to import in the template process,
+        so forked engines start with them already imported.
+    output_file : str
+        Where to write the output of the server itself
+        (engines write to their own output files).
+    """
+
+    def __init__(self, preload=(), output_file=os.devnull, log=None):
+        self.preload = list(preload)
+        self.output_file = output_file
+        self.log = log or logging.getLogger(__name__)
+        self.process = None
+        self._lock = Lock()
+        # Futures for the pids of requested engines, in request order
+        self._replies = deque()
+        # pid: (exit callback, lost callback)
+        self._watching = {}
+        # exit codes of engines that exited before anyone watched them
+        self._exit_codes = {}
+        self._closing = False
+        self._reader = None
+
+    def start(self):
+        """Start the template process"""
+        cmd = [sys.executable, "-m", __name__, *self.preload]
+        self.log.debug("Starting fork server: %s", cmd)
+        with open(self.output_file, "ab") as f:
+            self.process = Popen(
+                cmd,
+                stdin=PIPE,
+                stdout=PIPE,
+                stderr=f.fileno(),
+                start_new_session=True,  # don't forward signals
+            )
+        self._reader = Thread(target=self._read, daemon=True, name="ForkServer")
+        self._reader.start()
+
+    def _exited_error(self):
+        return RuntimeError(
+            f"Fork server exited with status {self.process.poll()},"
+            f" see {self.output_file} for details"
+        )
+
+    def _read(self):
+        """Read pids and exit events from the fork server"""
+        for line in self.process.stdout:
+            msg = json.loads(line)
+            if "event" in msg:
+                self._handle_event(msg)
+                continue
+            with self._lock:
+                future = self._replies.popleft() if self._replies else None
+            if future is not None:
+                future.set_result(msg["pid"])
+
+        # the fork server exited
+        with self._lock:
+            replies = list(self._replies)
+            self._replies.clear()
+            watching = list(self._watching.values())
+            self._watching.clear()
+        for future in replies:
+            future.set_exception(self._exited_error())
+        if watching and not self._closing:
+            self.log.warning("Fork server exited with engines still running")
+        for _, on_lost in watching:
+            if on_lost is not None:
+                on_lost()
+
+    def _handle_event(self, msg):
+        if msg["event"] != "exit":
+            return
+        pid = msg["pid"]
+        with self._lock:
+            callbacks = self._watching.pop(pid, None)
+            if callbacks is None:
+                self._exit_codes[pid] = msg["exit_code"]
+                return
+        on_exit, _ = callbacks
+        try:
+            on_exit(msg["exit_code"])
+        except Exception:
+            self.log.exception("Error in exit callback for pid %s", pid)
+
+    def spawn(self, args, env, cwd, output_file):
+        """Fork an engine with command-line `args`
+
+        The engine's stdout and stderr are written to `output_file`.
+
+        Returns the pid of the engine.
+        """
+        request = dict(args=args, env=env, cwd=cwd, output_file=output_file)
+        future = Future()
+        with self._lock:
+            self._replies.append(future)
+            try:
+                self.process.stdin.write(json.dumps(request).encode("utf8") + b"\n")
+                self.process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                self._replies.remove(future)
+                raise self._exited_error() from None
+        return future.result()
+
+    def watch(self, pid, on_exit, on_lost=None):
+        """Call `on_exit(exit_code)` when engine `pid` exits
+
+        Only engines started by this fork server can be watched.
+        If the fork server exits first, `on_lost()` is called instead.
+        Callbacks are called in the fork server's reader thread.
+        """
+        with self._lock:
+            if pid not in self._exit_codes:
+                self._watching[pid] = (on_exit, on_lost)
+                return
+            exit_code = self._exit_codes.pop(pid)
+        on_exit(exit_code)
+
+    def stop(self, timeout=5):
+        """Stop the template process
+
+        Engines it has started keep running.
+        """
+        if self.process is None:
+            return
+        self._closing = True
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+        self._reader.join(timeout)
+        self.process.stdout.close()
+        self.process = None
+
+
+def start_engine(args, env, cwd, output_file):
+    """Run an engine in a newly forked process
+
+    Never returns.
+    """
+    exit_code = 1
+    try:
+        # like Popen(start_new_session=True)
+        os.setsid()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        stdin = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(stdin, 0)
+        os.close(stdin)
+        out = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.dup2(out, 1)
+        os.dup2(out, 2)
+        os.close(out)
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(env)
+        sys.argv = ["ipengine", *args]
+
+        from ipyparallel.engine.app import IPEngine
+        from ipyparallel.engine.nanny import fork_nanny
+
+        # fork the nanny now, while this process has no zmq context or threads
+        fork_nanny()
+
+        IPEngine.launch_instance(args)
+        exit_code = 0
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def _exit_code(status):
+    """Exit code from a wait status, negative for signals like Popen.returncode"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _send(msg):
+    sys.stdout.write(json.dumps(msg) + "\n")
+    sys.stdout.flush()
+
+
+def _reap():
+    """Reap exited engines, reporting their exit codes"""
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        _send({"event": "exit", "pid": pid, "exit_code": _exit_code(status)})
+
+
+def main():
+    """Entrypoint of the fork server process
+
+    Preloads modules given as arguments,
+    then forks an engine for each request on stdin,
+    and reports engines' exit codes as they exit.
+    """
+    # SIGCHLD wakes up the main loop to reap engines
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    # import what engines need before forking
+    import ipyparallel.engine.app  # noqa: F401
+
+    for module in sys.argv[1:]:
+        importlib.import_module(module)
+
+    stdin = sys.stdin.fileno()
+    selector = selectors.DefaultSelector()
+    selector.register(stdin, selectors.EVENT_READ)
+    selector.register(wake_r, selectors.EVENT_READ)
+    buf = b""
+    while True:
+        for key, _ in selector.select():
+            if key.fd == wake_r:
+                try:
+                    while os.read(wake_r, 1024):
+                        pass
+                except BlockingIOError:
+                    pass
+                _reap()
+                continue
+            # read stdin unbuffered, so no requests wait in a buffer
+            # while we select
+            chunk = os.read(stdin, 65536)
+            if not chunk:
+                # report engines that already exited before we go
+                _reap()
+                return
+            *lines, buf = (buf + chunk).split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    signal.set_wakeup_fd(-1)
+                    os.close(wake_r)
+                    os.close(wake_w)
+                    start_engine(**request)
+                _send({"pid": pid})
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,7 @@ from IPython.utils.text import EvalFormatter
 from tornado import ioloop
 from traitlets import (
     Any,
+    Bool,
     CRegExp,
     Dict,
     Float,
@@ -45,6 +46,8 @@ from ..traitlets import entry_points
 from ..util import _OutputProducingThread as Thread
 from ..util import shlex_join
 from ._winhpcjob import IPControllerJob, IPControllerTask, IPEngineSetJob, IPEngineTask
+from .forkserver import ForkServer
+from .procwatch import output_streamer, process_watcher
 from .shellcmd import ShellCommandSend
 
 WINDOWS = os.name == 'nt'
@@ -454,12 +457,10 @@ class LocalProcessLauncher(BaseLauncher):
     poll_seconds = Integer(
         30,
         config=True,
-        help="""Interval on which to poll processes (.
+        help="""Interval on which to poll remote processes (e.g. via ssh).
 
-        Note: process exit should be noticed immediately,
-        due to use of Process.wait(),
-        but this interval should ensure we aren't leaving threads running forever,
-        as other signals/events are checked on this interval
+        Local processes are watched by a single thread shared by all launchers,
+        which notices their exit immediately.
         """,
     )
 
@@ -482,7 +483,8 @@ class LocalProcessLauncher(BaseLauncher):
     stdout = None
     stderr = None
     process = None
-    _wait_thread = None
+    _exited = None
+    _streaming = False
     _popen_process = None
 
     def find_args(self):
@@ -503,32 +505,23 @@ class LocalProcessLauncher(BaseLauncher):
                 raise NotRunning(f"Process {d['pid']}")
             self._start_waiting()
 
-    def _wait(self):
-        """Background thread waiting for a process to exit"""
-        exit_code = None
-        while not self._stop_waiting.is_set() and self.state == 'running':
-            try:
-                # use a timeout so we can check the _stop_waiting event
-                exit_code = self.process.wait(timeout=self.poll_seconds)
-            except psutil.TimeoutExpired:
-                continue
-            else:
-                break
+    def _process_exited(self, exit_code):
+        """Called in the process watcher's thread when our process exits"""
         stop_data = dict(exit_code=exit_code, pid=self.pid, identifier=self.identifier)
         self.loop.add_callback(lambda: self.notify_stop(stop_data))
         if self._popen_process:
             # wait avoids ResourceWarning if the process has exited
             self._popen_process.wait(0)
+        if self._streaming:
+            output_streamer().stop(self.output_file)
+        self._exited.set()
 
     def _start_waiting(self):
-        """Start background thread waiting on the process to exit"""
+        """Start watching for the process to exit"""
         # ensure self.loop is accessed on the main thread before waiting
         self.loop
-        self._stop_waiting = threading.Event()
-        self._wait_thread = Thread(
-            target=self._wait, daemon=True, name=f"wait(pid={self.pid})"
-        )
-        self._wait_thread.start()
+        self._exited = threading.Event()
+        process_watcher().watch(self.process, self._process_exited)
 
     def start(self):
         self.log.debug("Starting %s: %r", self.__class__.__name__, self.args)
@@ -542,6 +535,17 @@ class LocalProcessLauncher(BaseLauncher):
         env.update(self.get_env())
         self.log.debug(f"Setting environment: {','.join(self.get_env())}")
 
+        self.pid = self._spawn(env)
+        # use psutil API for self.process
+        self.process = psutil.Process(self.pid)
+
+        self.notify_start(self.process.pid)
+        self._start_waiting()
+        if 1 <= self.log.getEffectiveLevel() <= logging.DEBUG:
+            self._start_streaming()
+
+    def _spawn(self, env):
+        """Start the process with environment `env`, returning its pid"""
         with open(self.output_file, "ab") as f, open(os.devnull, "rb") as stdin:
             proc = self._popen_process = Popen(
                 self.args,
@@ -552,44 +556,19 @@ class LocalProcessLauncher(BaseLauncher):
                 cwd=self.work_dir,
                 start_new_session=True,  # don't forward signals
             )
-        self.pid = proc.pid
-        # use psutil API for self.process
-        self.process = psutil.Process(proc.pid)
-
-        self.notify_start(self.process.pid)
-        self._start_waiting()
-        if 1 <= self.log.getEffectiveLevel() <= logging.DEBUG:
-            self._start_streaming()
+        return proc.pid
 
     async def join(self, timeout=None):
         """Wait for the process to exit"""
-        if self._wait_thread is not None:
-            self._wait_thread.join(timeout=timeout)
-            if self._wait_thread.is_alive():
+        if self._exited is not None:
+            if not self._exited.wait(timeout=timeout):
                 raise TimeoutError(
                     f"Process {self.process.pid} did not exit in {timeout} seconds."
                 )
 
-    def _stream_file(self, path):
-        """Stream one file"""
-        with open(path) as f:
-            while self.state == 'running' and not self._stop_waiting.is_set():
-                line = f.readline()
-                # log prefix?
-                # or stream directly to sys.stderr
-                if line:
-                    sys.stderr.write(line)
-                else:
-                    # pause while we are at the end of the file
-                    time.sleep(0.1)
-
     def _start_streaming(self):
-        self._stream_thread = t = Thread(
-            target=partial(self._stream_file, self.output_file),
-            name=f"Stream Output {self.identifier}",
-            daemon=True,
-        )
-        t.start()
+        self._streaming = True
+        output_streamer().stream(self.output_file)
 
     _output = None
 
@@ -843,6 +822,109 @@ class LocalEngineSetLauncher(LocalEngineLauncher):
         return '\n'.join(joined_output)
 
 
+class ForkServerEngineLauncher(LocalEngineLauncher):
+    """Launch a single engine by forking it from its parent's fork server"""
+
+    def _spawn(self, env):
+        # create the output file now, as Popen would, so it can be streamed
+        open(self.output_file, "ab").close()
+        # the fork server runs IPEngine itself, engine_cmd is not used
+        return self.parent.fork_server.spawn(
+            self.cluster_args + self.engine_args,
+            env=env,
+            cwd=self.work_dir,
+            output_file=self.output_file,
+        )
+
+    def _start_waiting(self):
+        """Start watching for the engine to exit
+
+        Forked engines are children of the fork server, which reaps them,
+        so their exit codes come from the fork server.
+        """
+        fork_server = getattr(self.parent, "fork_server", None)
+        if fork_server is None:
+            # e.g. reconstructed from a dict, in a process that didn't fork us
+            return super()._start_waiting()
+        # ensure self.loop is accessed on the main thread before waiting
+        self.loop
+        self._exited = threading.Event()
+        fork_server.watch(self.pid, self._process_exited, self._fork_server_lost)
+
+    def _fork_server_lost(self):
+        """Called if the fork server exits before the engine"""
+        self.log.warning(f"Lost fork server, polling engine pid={self.pid} instead")
+        process_watcher().watch(self.process, self._process_exited)
+
+
+class ForkServerEngineSetLauncher(LocalEngineSetLauncher):
+    """Launch a set of engines by forking them from a template process
+
+    The template process (the fork server) imports IPython, ipykernel, zmq
+    and any `preload_modules` once,
+    so engines start in milliseconds instead of
+    re-importing everything in a fresh Python process.
+    Engines are otherwise managed like LocalEngineSetLauncher's engines.
+
+    Forked engines inherit the modules imported by the fork server,
+    so environment variables read at import time (e.g. OMP_NUM_THREADS)
+    must be set before the engines are started.
+    Requires :func:`os.fork`, so it is not available on Windows.
+
+    .. versionadded:: 9.1
+    """
+
+    delay = Float(
+        0,
+        config=True,
+        help="""delay (in seconds) between starting each engine after the first.
+
+        Forking engines is cheap, so there is no delay by default.""",
+    )
+
+    preload_modules = List(
+        Unicode(),
+        config=True,
+        help="""Modules to import in the fork server before forking any engines,
+        e.g. large libraries that every engine will import.""",
+    )
+
+    launcher_class = ForkServerEngineLauncher
+
+    fork_server = Any()
+
+    def start(self, n):
+        """Start n engines by forking them from the fork server"""
+        if WINDOWS:
+            raise LauncherError("Forking engines is not available on Windows")
+        if self.fork_server is None:
+            self.fork_server = ForkServer(
+                preload=self.preload_modules,
+                output_file=os.path.join(
+                    self.profile_dir,
+                    "log",
+                    f"ipengine-{self.cluster_id}-{self.engine_set_id}-forkserver.log",
+                ),
+                log=self.log,
+            )
+            self.fork_server.start()
+        return super().start(n)
+
+    def _stop_fork_server(self):
+        if self.fork_server is not None:
+            self.fork_server.stop()
+            self.fork_server = None
+
+    async def stop(self):
+        await super().stop()
+        self._stop_fork_server()
+
+    def _notice_engine_stopped(self, data):
+        super()._notice_engine_stopped(data)
+        if not self.launchers:
+            self._stop_fork_server()
+
+
 # -----------------------------------------------------------------------------
 # MPI launchers
 # -----------------------------------------------------------------------------
@@ -1196,6 +1278,9 @@ class SSHLauncher(LocalProcessLauncher):
 
     _ssh_sender = None
 
+    # SSHAgent controlling our process, if it was started by one
+    agent = Any()
+
     @property
     def ssh_sender(self):
         """instantiate ShellCommandSend object if needed"""
@@ -1299,6 +1384,16 @@ class SSHLauncher(LocalProcessLauncher):
             self._fetch_file(remote_file, local_file)
 
     def start(self, hostname=None, user=None, port=None):
+        self._set_location(hostname=hostname, user=user, port=port)
+        self._prepare_remote()
+        pid = self.ssh_sender.cmd_start(
+            self.program + self.program_args,
+            env=self.get_env(),
+            output_file=self.remote_output_file,
+        )
+        self._started(pid)
+
+    def _set_location(self, hostname=None, user=None, port=None):
         if hostname is not None:
             self.hostname = hostname
         if user is not None:
@@ -1311,6 +1406,8 @@ class SSHLauncher(LocalProcessLauncher):
                 self.scp_args.append('-P')
                 self.scp_args.append(str(port))
 
+    def _prepare_remote(self):
+        """Check the remote host and send files, before starting the process"""
         # do some checks that setting are correct
         shell_info = self.ssh_sender.get_shell_info()
         python_ok = self.ssh_sender.has_python()
@@ -1323,11 +1420,10 @@ class SSHLauncher(LocalProcessLauncher):
             ["IPython", "profile", "create", "--profile-dir", self.remote_profile_dir]
         )
         self.send_files()
-        self.pid = self.ssh_sender.cmd_start(
-            self.program + self.program_args,
-            env=self.get_env(),
-            output_file=self.remote_output_file,
-        )
+
+    def _started(self, pid):
+        """Called once the remote process has been started"""
+        self.pid = pid
         remote_cmd = ' '.join(self.program + self.program_args)
         self.log.debug("Running `%s` (pid=%s)", remote_cmd, self.pid)
         self.notify_start({'host': self.location, 'pid': self.pid})
@@ -1345,13 +1441,23 @@ class SSHLauncher(LocalProcessLauncher):
                 continue
             else:
                 break
-        stop_data = dict(exit_code=exit_code, pid=self.pid, identifier=self.identifier)
-        self.loop.add_callback(lambda: self.notify_stop(stop_data))
+        self._process_exited(exit_code)
 
     def _start_waiting(self):
-        """Start background thread waiting on the process to exit"""
+        """Start waiting on the process to exit
+
+        Processes started by an agent are watched by the agent.
+        Otherwise, a background thread polls the process over ssh.
+        """
         # ensure self.loop is accessed on the main thread before waiting
         self.loop
+        self._exited = threading.Event()
+        if self.agent is not None:
+            self.agent.watch(self.pid, self._process_exited, self._agent_lost)
+        else:
+            self._start_polling()
+
+    def _start_polling(self):
         self._stop_waiting = threading.Event()
         self._wait_thread = Thread(
             target=self._wait,
@@ -1360,6 +1466,14 @@ class SSHLauncher(LocalProcessLauncher):
         )
         self._wait_thread.start()
 
+    def _agent_lost(self):
+        """Called if the connection to our agent is lost before the process exits"""
+        self.log.warning(
+            f"Lost ssh agent for {self.location}, polling pid={self.pid} instead"
+        )
+        self.agent = None
+        self._start_polling()
+
     def wait_one(self, timeout):
         python_code = f"from ipyparallel.cluster.launcher import ssh_waitpid; ssh_waitpid({self.pid}, timeout={timeout})"
         out = self.ssh_sender.check_output_python_code(python_code)
@@ -1371,9 +1485,16 @@ class SSHLauncher(LocalProcessLauncher):
             raise TimeoutError("still running")
         return int(values.get("exit_code", -1))
 
+    def _wait_exited(self, timeout=None):
+        if not self._exited.wait(timeout):
+            raise TimeoutError("still running")
+
     async def join(self, timeout=None):
         with ThreadPoolExecutor(1) as pool:
-            wait = partial(self.wait_one, timeout=timeout)
+            if self.agent is not None:
+                wait = partial(self._wait_exited, timeout=timeout)
+            else:
+                wait = partial(self.wait_one, timeout=timeout)
             try:
                 future = pool.submit(wait)
             except RuntimeError:
@@ -1392,6 +1513,16 @@ class SSHLauncher(LocalProcessLauncher):
 
     def signal(self, sig):
         if self.state == 'running':
+            if self.agent is not None:
+                try:
+                    self.agent.signal(self.pid, sig)
+                except TimeoutError:
+                    self.log.warning(
+                        f"ssh agent for {self.location} not responding,"
+                        f" signaling pid={self.pid} over ssh instead"
+                    )
+                else:
+                    return
             self.ssh_sender.cmd_kill(self.pid, sig)
 
     @property
@@ -1460,6 +1591,25 @@ class SSHEngineSetLauncher(LocalEngineSetLauncher, SSHLauncher):
         corresponding to the number of engines to start on that host.""",
     ).tag(to_dict=True)
 
+    use_agent = Bool(
+        True,
+        config=True,
+        help="""Control engines through one persistent ssh connection per host.
+
+        The connection runs an agent on the host
+        (requires ipyparallel to be installed there, like the engines themselves),
+        which starts all of the host's engines in one batch
+        and reports their exit as soon as it happens,
+        instead of opening a new ssh connection to start each engine
+        and to poll each engine every `poll_seconds`.
+        Not used for Windows hosts.
+
+        .. versionadded:: 9.1
+        """,
+    )
+
+    agents = Dict()
+
     def _engine_cmd_default(self):
         return [self.remote_python, "-m", "ipyparallel.engine"]
 
@@ -1507,9 +1657,8 @@ class SSHEngineSetLauncher(LocalEngineSetLauncher, SSHLauncher):
             else:
                 port = None
 
+            host_launchers = []
             for i in range(min(n, requested_n - started_n)):
-                if i > 0:
-                    time.sleep(self.delay)
                 # pass all common traits to the launcher
                 kwargs = {attr: getattr(self, attr) for attr in inherited_traits}
                 # overrides from engine config
@@ -1521,17 +1670,122 @@ class SSHEngineSetLauncher(LocalEngineSetLauncher, SSHLauncher):
                 if i > 0:
                     # only send files for the first engine on each host
                     el.to_send = []
+                if 'remote_output_file' not in overrides:
+                    # engines started in one batch need distinct names
+                    name = f"{self.cluster_id}-{self.engine_set_id}-{host}-{i}"
+                    el.remote_output_file = os.path.join(
+                        el.remote_profile_dir, 'log', f"ipengine-{name}.out"
+                    )
 
                 el.on_stop(self._notice_engine_stopped)
-                d = el.start(user=user, hostname=host, port=port)
+                host_launchers.append(el)
                 dlist.append(key)
                 started_n += 1
                 if started_n >= requested_n:
                     break
+            if host_launchers:
+                self._start_host(host_launchers, user=user, hostname=host, port=port)
         self.notify_start(dlist)
         self.n = started_n
         return dlist
 
+    def _start_host(self, launchers, **location):
+        """Start all the engines for one host
+
+        With an agent, they are started in one batch over the agent's connection.
+        Otherwise, each engine is started with its own ssh connection.
+        """
+        first = launchers[0]
+        first._set_location(**location)
+        agent = self._get_agent(first) if self.use_agent else None
+        if agent is None:
+            for i, el in enumerate(launchers):
+                if i > 0:
+                    time.sleep(self.delay)
+                el.start(**location)
+            return
+
+        first._prepare_remote()
+        for el in launchers[1:]:
+            el._set_location(**location)
+        try:
+            pids = agent.start_processes(
+                [
+                    dict(
+                        cmd=el.program + el.program_args,
+                        env=el.get_env(),
+                        output_file=el.remote_output_file,
+                    )
+                    for el in launchers
+                ],
+                delay=self.delay,
+            )
+        except TimeoutError as e:
+            self.log.warning(
+                f"{e}, starting engines on {first.location} with one ssh connection each"
+            )
+            self._drop_agent(agent)
+            for i, el in enumerate(launchers):
+                if i > 0:
+                    time.sleep(self.delay)
+                el.start(**location)
+            return
+        for el, pid in zip(launchers, pids):
+            el.agent = agent
+            el._started(pid)
+
+    def _get_agent(self, launcher):
+        """Get the agent for a launcher's host, starting it if needed
+
+        Returns None if agents cannot be used on the host (Windows).
+        """
+        key = shlex_join(launcher.ssh_args + [launcher.location])
+        if key in self.agents:
+            return self.agents[key]
+        system, shell = launcher.ssh_sender.get_shell_info()
+        if system == "Windows_NT":
+            self.log.debug(f"Not using an ssh agent on Windows host {key}")
+            return None
+        # not imported at the top, so `python -m` can run it without a warning
+        from .sshagent import SSHAgent
+
+        agent = self.agents[key] = SSHAgent(
+            launcher.ssh_cmd
+            + launcher.ssh_args
+            + [
+                launcher.location,
+                launcher.remote_python,
+                "-m",
+                "ipyparallel.cluster.sshagent",
+            ],
+            log=self.log,
+        )
+        agent.start()
+        return agent
+
+    def _drop_agent(self, agent):
+        """Stop using an unresponsive agent"""
+        for key, value in list(self.agents.items()):
+            if value is agent:
+                # use ssh directly for this host from now on
+                self.agents[key] = None
+        agent.stop()
+
+    def _stop_agents(self):
+        for agent in self.agents.values():
+            if agent is not None:
+                agent.stop()
+        self.agents = {}
+
+    async def stop(self):
+        await super().stop()
+        self._stop_agents()
+
+    def _notice_engine_stopped(self, data):
+        super()._notice_engine_stopped(data)
+        if not self.launchers:
+            self._stop_agents()
+
 
 class SSHProxyEngineSetLauncher(SSHLauncher, EngineLauncher):
     """Launcher for calling
@@ -2432,6 +2686,8 @@ local_launchers = [
     LocalControllerLauncher,
     LocalEngineLauncher,
     LocalEngineSetLauncher,
+    ForkServerEngineLauncher,
+    ForkServerEngineSetLauncher,
 ]
 mpi_launchers = [
     MPILauncher,
@@ -0,0 +1,188 @@
+"""Watching local processes and their output
+
+LocalProcessLaunchers share one thread watching all of their processes for exit,
+and one thread streaming all of their output files,
+so the number of threads doesn't grow with the number of engines.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import logging
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+
+import psutil
+
+from ..util import _OutputProducingThread as Thread
+
+log = logging.getLogger(__name__)
+
+
+class ProcessWatcher:
+    """Watch local processes for exit in a single thread
+
+    Where available (Linux), a pidfd is used for each process,
+    so exits are noticed as soon as they happen.
+    Otherwise, processes are polled every `poll_interval` seconds.
+
+    Callbacks are called in the watcher thread,
+    with the exit code of the process (None if it cannot be retrieved).
+    """
+
+    def __init__(self, poll_interval=0.1):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # (pid, callback): (psutil.Process, pidfd or None)
+        self._watching = {}
+        self._thread = None
+        # written to whenever _watching changes, to wake the thread
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+
+    def watch(self, process, callback):
+        """Call `callback(exit_code)` when `process` exits"""
+        pidfd = None
+        if hasattr(os, "pidfd_open"):
+            try:
+                pidfd = os.pidfd_open(process.pid)
+            except OSError:
+                # not supported, or already exited; fall back on polling
+                pass
+        with self._lock:
+            self._watching[(process.pid, callback)] = (process, pidfd)
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, daemon=True, name="ProcessWatcher"
+                )
+                self._thread.start()
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_send.send(b"x")
+        except BlockingIOError:
+            # already plenty of wakeups pending
+            pass
+
+    def _check(self, key, process):
+        """Check if one process has exited, calling its callback if it has"""
+        pid, callback = key
+        try:
+            exit_code = process.wait(timeout=0)
+        except psutil.TimeoutExpired:
+            return
+        with self._lock:
+            self._watching.pop(key, None)
+        try:
+            callback(exit_code)
+        except Exception:
+            log.exception("Error in exit callback for pid %s", pid)
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._wake_recv, selectors.EVENT_READ)
+        registered = set()
+        while True:
+            with self._lock:
+                watching = dict(self._watching)
+            for key, (process, pidfd) in watching.items():
+                if pidfd is not None and pidfd not in registered:
+                    selector.register(pidfd, selectors.EVENT_READ, key)
+                    registered.add(pidfd)
+            polling = any(pidfd is None for _, pidfd in watching.values())
+
+            events = selector.select(self.poll_interval if polling else None)
+
+            ready = set()
+            for selector_key, _ in events:
+                if selector_key.fileobj is self._wake_recv:
+                    try:
+                        while self._wake_recv.recv(1024):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                # the process has exited, we don't need its pidfd anymore.
+                # If it can't be reaped yet (not our child), it is polled instead.
+                key = selector_key.data
+                pidfd = selector_key.fileobj
+                selector.unregister(pidfd)
+                registered.remove(pidfd)
+                os.close(pidfd)
+                with self._lock:
+                    if key in self._watching:
+                        self._watching[key] = (self._watching[key][0], None)
+                ready.add(key)
+
+            for key, (process, pidfd) in watching.items():
+                if pidfd is None or key in ready:
+                    self._check(key, process)
+
+
+class OutputStreamer:
+    """Stream the output files of local processes to stderr in a single thread"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # path: open file
+        self._files = {}
+        self._thread = None
+
+    def stream(self, path):
+        """Start streaming lines appended to `path`"""
+        f = open(path)
+        with self._lock:
+            self._files[path] = f
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, daemon=True, name="OutputStreamer"
+                )
+                self._thread.start()
+
+    def stop(self, path):
+        """Stop streaming `path`, after streaming what it has so far"""
+        with self._lock:
+            f = self._files.pop(path, None)
+            if f is not None:
+                sys.stderr.write(f.read())
+                f.close()
+
+    def _run(self):
+        while True:
+            wrote = False
+            with self._lock:
+                for f in self._files.values():
+                    line = f.readline()
+                    while line:
+                        sys.stderr.write(line)
+                        wrote = True
+                        line = f.readline()
+            if not wrote:
+                # pause while we are at the end of all files
+                time.sleep(self.interval)
+
+
+_watcher = None
+_streamer = None
+
+
+def process_watcher():
+    """The ProcessWatcher shared by all launchers"""
+    global _watcher
+    if _watcher is None:
+        _watcher = ProcessWatcher()
+    return _watcher
+
+
+def output_streamer():
+    """The OutputStreamer shared by all launchers"""
+    global _streamer
+    if _streamer is None:
+        _streamer = OutputStreamer()
+    return _streamer
@@ -0,0 +1,301 @@
+"""Persistent control channel for starting and watching processes over ssh
+
+SSH launchers start one agent per host, over a single long-lived ssh connection,
+instead of a new ssh connection for every engine started and every poll of its state.
+The agent starts batches of processes on the remote host,
+sends signals to them,
+and reports each process's exit as soon as it happens.
+
+Messages are lines of JSON,
+requests on the agent's stdin and replies and events on its stdout::
+
+    -> {"id": 1, "op": "start", "delay": 0.1,
+        "processes": [{"cmd": [...], "env": {...}, "output_file": "..."}, ...]}
+    <- {"id": 1, "pids": [1234, 1235]}
+    -> {"id": 2, "op": "signal", "pid": 1234, "sig": 15}
+    <- {"id": 2}
+    <- {"event": "exit", "pid": 1234, "exit_code": -15}
+
+Failed requests get a reply with an "error" message instead.
+The agent exits when its stdin is closed,
+e.g. when the ssh connection is lost.
+Processes it started keep running.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from itertools import count
+from subprocess import DEVNULL, PIPE, Popen
+
+from ..util import _OutputProducingThread as Thread
+
+
+class SSHAgent:
+    """Handle on an agent process, usually running on the other end of ssh
+
+    Parameters
+    ----------
+    cmd : list of str
+        The command starting the agent, e.g.
+        ``['ssh', 'host', 'python3', '-m', 'ipyparallel.cluster.sshagent']``
+    timeout : float
+        How long to wait for the reply to a request, in seconds
+    """
+
+    def __init__(self, cmd, log=None, timeout=30):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.log = log or logging.getLogger(__name__)
+        self.process = None
+        self._lock = threading.Lock()
+        self._ids = count(1)
+        # request id: Future for the reply
+        self._replies = {}
+        # pid: (exit callback, lost callback)
+        self._watching = {}
+        # exit codes of processes that exited before anyone watched them
+        self._exit_codes = {}
+        self._closing = False
+        self._reader = None
+
+    def start(self):
+        """Start the agent"""
+        self.log.debug("Starting ssh agent: %s", self.cmd)
+        self.process = Popen(
+            self.cmd,
+            stdin=PIPE,
+            stdout=PIPE,
+            start_new_session=True,  # don't forward signals
+        )
+        self._reader = Thread(target=self._read, daemon=True, name="SSHAgent")
+        self._reader.start()
+
+    def _read(self):
+        """Read replies and events from the agent"""
+        for line in self.process.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                # not for us, e.g. a login banner
+                self.log.debug("ssh agent: %s", line.decode("utf8", "replace"))
+                continue
+            if "event" in msg:
+                self._handle_event(msg)
+                continue
+            with self._lock:
+                future = self._replies.pop(msg.get("id"), None)
+            if future is None:
+                continue
+            if "error" in msg:
+                future.set_exception(RuntimeError(msg["error"]))
+            else:
+                future.set_result(msg)
+
+        # connection lost
+        with self._lock:
+            replies = list(self._replies.values())
+            self._replies.clear()
+            watching = list(self._watching.values())
+            self._watching.clear()
+        for future in replies:
+            future.set_exception(RuntimeError("ssh agent exited"))
+        if self._closing:
+            return
+        self.log.warning("Lost connection to ssh agent: %s", self.cmd)
+        for _, on_lost in watching:
+            if on_lost is not None:
+                on_lost()
+
+    def _handle_event(self, msg):
+        if msg["event"] != "exit":
+            return
+        pid = msg["pid"]
+        with self._lock:
+            callbacks = self._watching.pop(pid, None)
+            if callbacks is None:
+                self._exit_codes[pid] = msg["exit_code"]
+                return
+        on_exit, _ = callbacks
+        try:
+            on_exit(msg["exit_code"])
+        except Exception:
+            self.log.exception("Error in exit callback for pid %s", pid)
+
+    def request(self, op, timeout=None, **kwargs):
+        """Send one request to the agent and wait for its reply
+
+        Raises TimeoutError if there is no reply within `timeout` seconds
+        (default: `self.timeout`).
+        """
+        if timeout is None:
+            timeout = self.timeout
+        future = Future()
+        with self._lock:
+            msg_id = next(self._ids)
+            self._replies[msg_id] = future
+            try:
+                self.process.stdin.write(
+                    json.dumps(dict(id=msg_id, op=op, **kwargs)).encode("utf8") + b"\n"
+                )
+                self.process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                self._replies.pop(msg_id)
+                raise RuntimeError(
+                    f"ssh agent exited with status {self.process.poll()}"
+                )
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._replies.pop(msg_id, None)
+            raise TimeoutError(
+                f"No reply to {op} request from ssh agent in {timeout}s"
+            ) from None
+
+    def start_processes(self, processes, delay=0):
+        """Start a batch of processes
+
+        Each process is a dict with keys ``cmd``, ``env`` and ``output_file``.
+        The agent waits `delay` seconds between starting each process.
+
+        Returns the list of remote pids.
+        """
+        return self.request(
+            "start",
+            timeout=self.timeout + delay * len(processes),
+            processes=processes,
+            delay=delay,
+        )["pids"]
+
+    def signal(self, pid, sig):
+        """Send signal `sig` to process `pid`"""
+        self.request("signal", pid=pid, sig=int(sig))
+
+    def watch(self, pid, on_exit, on_lost=None):
+        """Call `on_exit(exit_code)` when process `pid` exits
+
+        Only processes started by this agent can be watched.
+        If the connection to the agent is lost first, `on_lost()` is called instead.
+        Callbacks are called in the agent's reader thread.
+        """
+        with self._lock:
+            if pid not in self._exit_codes:
+                self._watching[pid] = (on_exit, on_lost)
+                return
+            exit_code = self._exit_codes.pop(pid)
+        on_exit(exit_code)
+
+    def stop(self, timeout=5):
+        """Stop the agent
+
+        Processes it has started keep running.
+        """
+        if self.process is None:
+            return
+        self._closing = True
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+        self._reader.join(timeout)
+        self.process.stdout.close()
+        self.process = None
+
+
+class _Agent:
+    """The remote end of SSHAgent"""
+
+    def __init__(self, out=sys.stdout):
+        from .procwatch import ProcessWatcher
+
+        self.out = out
+        self._write_lock = threading.Lock()
+        self.watcher = ProcessWatcher()
+        # pid: Popen, to keep them from being garbage collected
+        self.processes = {}
+
+    def send(self, msg):
+        with self._write_lock:
+            self.out.write(json.dumps(msg) + "\n")
+            self.out.flush()
+
+    def start(self, processes, delay=0):
+        import psutil
+
+        pids = []
+        for i, spec in enumerate(processes):
+            if i > 0 and delay:
+                time.sleep(delay)
+            env = os.environ.copy()
+            for key, value in (spec.get("env") or {}).items():
+                if value is None or value == '':
+                    env.pop(key, None)
+                else:
+                    env[key] = str(value)
+            output_file = spec.get("output_file") or os.devnull
+            with open(output_file, "ab") as f:
+                p = Popen(
+                    spec["cmd"],
+                    stdin=DEVNULL,
+                    stdout=f,
+                    stderr=f,
+                    env=env,
+                    start_new_session=True,  # survive the ssh connection
+                )
+            self.processes[p.pid] = p
+            self.watcher.watch(psutil.Process(p.pid), self._exit_callback(p.pid))
+            pids.append(p.pid)
+        return {"pids": pids}
+
+    def _exit_callback(self, pid):
+        def exited(exit_code):
+            p = self.processes.pop(pid, None)
+            if p is not None:
+                # already reaped by the watcher, avoids ResourceWarning
+                p.wait(0)
+            self.send({"event": "exit", "pid": pid, "exit_code": exit_code})
+
+        return exited
+
+    def signal(self, pid, sig):
+        os.kill(pid, sig)
+        return {}
+
+    def handle(self, request):
+        msg_id = request.pop("id")
+        op = request.pop("op")
+        try:
+            if op not in {"start", "signal"}:
+                raise ValueError(f"Unknown request: {op}")
+            reply = getattr(self, op)(**request)
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        reply["id"] = msg_id
+        self.send(reply)
+
+
+def main():
+    """Entrypoint of the agent process
+
+    Handles requests on stdin until it is closed.
+    """
+    agent = _Agent()
+    for line in sys.stdin:
+        agent.handle(json.loads(line))
+
+
+if __name__ == "__main__":
+    main()
@@ -48,10 +48,15 @@ from ipyparallel.apps.baseapp import (
 )
 from ipyparallel.controller.broadcast_scheduler import launch_broadcast_scheduler
 from ipyparallel.controller.dictdb import DictDB
-from ipyparallel.controller.heartmonitor import HeartMonitor, start_heartmonitor
+from ipyparallel.controller.heartmonitor import (
+    HeartMonitor,
+    start_heart_aggregator,
+    start_heartmonitor,
+)
 from ipyparallel.controller.hub import Hub
 from ipyparallel.controller.scheduler import launch_scheduler
 from ipyparallel.controller.task_scheduler import TaskScheduler
+from ipyparallel.serialize.packers import resolve_packer
 from ipyparallel.traitlets import PortList
 from ipyparallel.util import disambiguate_url
 
@@ -129,6 +134,31 @@ flags.update(
                     select one of the true db backends.
                     """,
         ),
+        'lightweight': (
+            {
+                'Hub': {'lightweight_monitoring': True},
+                'Scheduler': {'lightweight_monitoring': True},
+            },
+            """Only track task status and timing in the Hub.
+
+                    The task scheduler sends the Hub batched summaries of messages,
+                    and message content and output are not stored.
+                    Results cannot be retrieved or resubmitted via the Hub.
+                    """,
+        ),
+        'metrics': (
+            {
+                'IPController': {'db_class': 'ipyparallel.controller.dictdb.NoDB'},
+                'Hub': {'metrics_only': True},
+                'Scheduler': {'lightweight_monitoring': True},
+            },
+            """Only count tasks in the Hub, without storing any records.
+
+                    The Hub keeps per-engine and per-client counters
+                    and latency histograms, available via `Client.hub_metrics()`.
+                    Results cannot be retrieved or resubmitted via the Hub.
+                    """,
+        ),
         'reuse': (
             {'IPController': {'reuse_files': True}},
             'reuse existing json connection files',
@@ -154,6 +184,7 @@ aliases = dict(
     ping='HeartMonitor.period',
     scheme='TaskScheduler.scheme_name',
     hwm='TaskScheduler.hwm',
+    packer='IPController.packer',
 )
 aliases.update(base_aliases)
 aliases.update(session_aliases)
@@ -223,6 +254,19 @@ class IPController(BaseParallelApplication):
         False, config=True, help='Use threads instead of processes for the schedulers'
     )
 
+    packer = Unicode(
+        '',
+        config=True,
+        help="""The packer for message headers, metadata and content.
+
+        One of 'json', 'orjson', 'msgpack',
+        or 'auto' to use the fastest one installed.
+        The packer is written to the connection files,
+        so engines and clients use the same one.
+        Default: use Session.packer.
+        """,
+    )
+
     engine_json_file = Unicode(
         'ipcontroller-engine.json',
         config=True,
@@ -325,6 +369,20 @@ class IPController(BaseParallelApplication):
         config=True,
         help="Depth of spanning tree schedulers",
     )
+    heart_aggregators = Integer(
+        0,
+        config=True,
+        help="""Number of heart aggregators to spread engines across.
+
+        By default, one heart monitor pings every engine and checks every response.
+        With aggregators, each one pings a share of the engines
+        and only tells the Hub about engines that start or stop beating,
+        while the root heart monitor only pings the aggregators.
+        Useful for clusters with thousands of engines.
+
+        .. versionadded:: 9.1
+        """,
+    )
     number_of_leaf_schedulers = Integer()
     number_of_broadcast_schedulers = Integer()
     number_of_non_leaf_schedulers = Integer()
@@ -694,6 +752,8 @@ class IPController(BaseParallelApplication):
 
         # json gives unicode, Session.key wants bytes
         c.Session.key = ecfg['key'].encode('ascii')
+        # engines and clients connected with the existing packer
+        self._set_packer(ecfg['pack'], ecfg['unpack'])
 
         xport, ip = ecfg['interface'].split('://')
 
@@ -751,6 +811,17 @@ class IPController(BaseParallelApplication):
                 # successfully loaded config from JSON, and reuse=True
                 # no need to write back the same file
                 self.write_connection_files = False
+                return
+        if self.packer:
+            self._set_packer(*resolve_packer(self.packer))
+
+    def _set_packer(self, packer, unpacker):
+        """Set the Session packer for the controller and its schedulers"""
+        self.log.info("Using message packer %s", packer)
+        self.config.Session.packer = packer
+        self.config.Session.unpacker = unpacker
+        self.session.packer = packer
+        self.session.unpacker = unpacker
 
     def init_hub(self):
         if self.enable_curve:
@@ -785,6 +856,12 @@ class IPController(BaseParallelApplication):
                 'iopub': self.next_port('engine'),
                 'hb_ping': self.next_port('engine'),
                 'hb_pong': self.next_port('engine'),
+                'hb_aggregator_ping': [
+                    self.next_port('engine') for i in range(self.heart_aggregators)
+                ],
+                'hb_aggregator_pong': [
+                    self.next_port('engine') for i in range(self.heart_aggregators)
+                ],
                 BroadcastScheduler.port_name: [
                     self.next_port('engine')
                     for i in range(self.number_of_leaf_schedulers)
@@ -875,6 +952,30 @@ class IPController(BaseParallelApplication):
             ),
             daemon=True,
         )
+        heart_aggregator_ids = []
+        self.heart_aggregator_processes = []
+        for i in range(len(self.engine_info.get('hb_aggregator_ping', []))):
+            heart_id = f"heart-aggregator-{i}".encode()
+            heart_aggregator_ids.append(heart_id)
+            self.heart_aggregator_processes.append(
+                Process(
+                    target=start_heart_aggregator,
+                    kwargs=dict(
+                        ping_url=self.engine_url('hb_aggregator_ping', index=i),
+                        pong_url=self.engine_url('hb_aggregator_pong', index=i),
+                        monitor_url=disambiguate_url(self.monitor_url),
+                        upstream_ping_url=disambiguate_url(self.engine_url('hb_ping')),
+                        upstream_pong_url=disambiguate_url(self.engine_url('hb_pong')),
+                        heart_id=heart_id,
+                        config=hm_config,
+                        log_level=self.log.getEffectiveLevel(),
+                        curve_publickey=self.curve_publickey,
+                        curve_secretkey=self.curve_secretkey,
+                    ),
+                    name=f"HeartAggregator({i})",
+                    daemon=True,
+                )
+            )
 
         ### Client connections ###
 
@@ -917,8 +1018,14 @@ class IPController(BaseParallelApplication):
             client_info=self.client_info,
             log=self.log,
             registration_timeout=self.registration_timeout,
+            heart_aggregators=set(heart_aggregator_ids),
             parent=self,
         )
+        if self.hub.lightweight_monitoring and not isinstance(self.db, DictDB):
+            self.log.warning(
+                f"{db_class.__name__} only stores the status and timing of tasks"
+                " with Hub.lightweight_monitoring, not their content or results"
+            )
 
         if self.write_connection_files:
             # save to new json config files
@@ -1182,7 +1289,8 @@ class IPController(BaseParallelApplication):
 
     def terminate_children(self):
         child_procs = []
-        for child in self.children + [self.heartmonitor_process]:
+        heart_processes = [self.heartmonitor_process] + self.heart_aggregator_processes
+        for child in self.children + heart_processes:
             if isinstance(child, ProcessMonitoredQueue):
                 child_procs.append(child.launcher)
             elif isinstance(child, Process):
@@ -1241,6 +1349,12 @@ class IPController(BaseParallelApplication):
 
         self.heartmonitor_process.start()
         self.log.info(f"Heartmonitor beating every {self.hub.heartmonitor_period}ms")
+        for process in self.heart_aggregator_processes:
+            process.start()
+        if self.heart_aggregator_processes:
+            self.log.info(
+                f"Started {len(self.heart_aggregator_processes)} heart aggregators"
+            )
 
         self.init_signal()
 
@@ -0,0 +1,96 @@
+"""Async interface to TaskRecord backends
+
+The Hub handles every monitor message on its event loop,
+so a backend that blocks on disk or network I/O (SQLite, MongoDB)
+caps Hub throughput at one DB round trip per message.
+
+AsyncDB wraps any BaseDB, running calls to blocking backends
+in a single background thread.
+A single thread preserves the order of operations,
+so records are updated in the order their messages arrived.
+Non-blocking backends (DictDB, NoDB) are called directly.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import asyncio
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+from traitlets import Instance, default
+from traitlets.config import LoggingConfigurable
+
+from .dictdb import BaseDB
+
+
+class AsyncDB(LoggingConfigurable):
+    """Awaitable wrapper for a TaskRecord backend.
+
+    Every public method of BaseDB is available as a coroutine.
+    :meth:`submit` can be used for fire-and-forget writes.
+    """
+
+    db = Instance(BaseDB)
+    executor = Instance(Executor, allow_none=True)
+
+    @default("executor")
+    def _default_executor(self):
+        if self.db.blocking:
+            return ThreadPoolExecutor(1, thread_name_prefix="ipp-db")
+        return None
+
+    def submit(self, method, *args, **kwargs):
+        """Call a method of the db, returning a concurrent.futures.Future
+
+        For non-blocking backends, the call happens immediately
+        and the returned Future is already done.
+        """
+        f = getattr(self.db, method)
+        if self.executor is not None:
+            return self.executor.submit(f, *args, **kwargs)
+        future = Future()
+        try:
+            future.set_result(f(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def _call(self, method, *args, **kwargs):
+        future = self.submit(method, *args, **kwargs)
+        if future.done():
+            return future.result()
+        return await asyncio.wrap_future(future)
+
+    async def add_record(self, msg_id, rec):
+        return await self._call("add_record", msg_id, rec)
+
+    async def get_record(self, msg_id):
+        return await self._call("get_record", msg_id)
+
+    async def update_record(self, msg_id, rec):
+        return await self._call("update_record", msg_id, rec)
+
+    async def merge_record(self, msg_id, rec, append_keys=(), warn_conflicts=False):
+        return await self._call(
+            "merge_record", msg_id, rec, append_keys, warn_conflicts=warn_conflicts
+        )
+
+    async def drop_record(self, msg_id):
+        return await self._call("drop_record", msg_id)
+
+    async def drop_matching_records(self, check):
+        return await self._call("drop_matching_records", check)
+
+    async def find_records(self, check, keys=None):
+        return await self._call("find_records", check, keys)
+
+    async def get_history(self):
+        return await self._call("get_history")
+
+    def close(self):
+        """Wait for pending operations and close the db"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.db.close()
+
+
+__all__ = ['AsyncDB']
@@ -42,7 +42,7 @@ from datetime import datetime
 from traitlets import Dict, Float, Integer, Unicode
 from traitlets.config.configurable import LoggingConfigurable
 
-from ..util import ensure_timezone
+from ..util import _parse_date, ensure_timezone
 
 # Python can't copy memoryviews, but creating another memoryview works for us
 copy._deepcopy_dispatch[memoryview] = lambda x, memo: memoryview(x)
@@ -91,9 +91,76 @@ class BaseDB(LoggingConfigurable):
     # base configurable traits:
     session = Unicode("")
 
+    # whether calls may block on I/O (disk, network).
+    # Blocking backends are driven from a background thread by the Hub
+    # (see AsyncDB), so that storage latency doesn't stall the Hub's event loop.
+    blocking = False
+
+    # timestamp fields of a TaskRecord
+    _date_keys = ('submitted', 'started', 'completed', 'received')
+
+    def _parse_dates(self, rec):
+        """Parse ISO8601 timestamp strings in a record to datetimes, in-place
+
+        The Hub stores timestamps as they arrive in messages,
+        deferring the cost of parsing to the backend.
+        """
+        for key in self._date_keys:
+            value = rec.get(key)
+            if isinstance(value, str):
+                rec[key] = _parse_date(value)
+        return rec
+
     def close(self):
         pass
 
+    def _warn_conflicts(self, msg_id, existing, rec, append_keys=()):
+        """Log values in `rec` that would overwrite different existing values"""
+        # timestamps may be stored unparsed
+        existing = self._parse_dates(dict(existing))
+        rec = self._parse_dates(dict(rec))
+        for key, rvalue in rec.items():
+            if key in append_keys or key.endswith('buffers'):
+                # don't compare buffers
+                continue
+            evalue = existing.get(key, None)
+            if evalue and rvalue and evalue != rvalue:
+                self.log.warning(
+                    "conflicting initial state for record: %r:%r <%r> %r",
+                    msg_id,
+                    rvalue,
+                    key,
+                    evalue,
+                )
+
+    def merge_record(self, msg_id, rec, append_keys=(), warn_conflicts=False):
+        """Merge data into a record, creating it if it doesn't exist.
+
+        Only non-empty values in `rec` overwrite existing values,
+        so partial records arriving in any order (e.g. iopub before the request)
+        are combined instead of clobbering each other.
+        Values for keys in `append_keys` are appended to the existing value.
+        If `warn_conflicts` is True, a warning is logged for each existing value
+        that is overwritten with a different one.
+
+        Backends should override this with a single-step upsert where they can.
+        """
+        try:
+            existing = self.get_record(msg_id)
+        except KeyError:
+            self.add_record(msg_id, rec)
+            return
+        if warn_conflicts:
+            self._warn_conflicts(msg_id, existing, rec, append_keys)
+        update = {}
+        for key, value in rec.items():
+            if key in append_keys:
+                update[key] = (existing.get(key) or '') + (value or '')
+            elif value:
+                update[key] = value
+        if update:
+            self.update_record(msg_id, update)
+
 
 class DictDB(BaseDB):
     """Basic in-memory dict-based object for saving Task Records.
@@ -144,7 +211,11 @@ class DictDB(BaseDB):
     def _match_one(self, rec, tests):
         """Check if a specific record matches tests."""
         for key, test in tests.items():
-            if not test(rec.get(key, None)):
+            value = rec.get(key, None)
+            if isinstance(value, str) and key in self._date_keys:
+                # parse timestamps on first query
+                value = rec[key] = _parse_date(value)
+            if not test(value):
                 return False
         return True
 
@@ -160,7 +231,7 @@ class DictDB(BaseDB):
 
         for rec in self._records.values():
             if self._match_one(rec, tests):
-                matches.append(deepcopy(rec))
+                matches.append(deepcopy(self._parse_dates(rec)))
         return matches
 
     def _extract_subdict(self, rec, keys):
@@ -224,10 +295,16 @@ class DictDB(BaseDB):
             )
 
     def _check_dates(self, rec):
-        for key in ('submitted', 'started', 'completed', 'received'):
+        """Check timestamps of a record
+
+        ISO8601 strings are stored as-is, and parsed when the record is read.
+        """
+        for key in self._date_keys:
             value = rec.get(key, None)
-            if value is not None and not isinstance(value, datetime):
-                raise ValueError(f"{key} must be None or datetime, not {value!r}")
+            if value is not None and not isinstance(value, (datetime, str)):
+                raise ValueError(
+                    f"{key} must be None, datetime, or ISO8601 str, not {value!r}"
+                )
             if isinstance(value, datetime) and value.tzinfo is None:
                 self.log.warning(
                     "Timestamps should always have timezones: %s=%s", key, value
@@ -251,7 +328,7 @@ class DictDB(BaseDB):
             raise KeyError(f"Record {msg_id!r} has been culled for size")
         if msg_id not in self._records:
             raise KeyError(f"No such msg_id {msg_id!r}")
-        return deepcopy(self._records[msg_id])
+        return deepcopy(self._parse_dates(self._records[msg_id]))
 
     def update_record(self, msg_id, rec):
         """Update the data in an existing record."""
@@ -263,6 +340,25 @@ class DictDB(BaseDB):
         _rec.update(rec)
         self._add_bytes(_rec)
 
+    def merge_record(self, msg_id, rec, append_keys=(), warn_conflicts=False):
+        """Merge data into a record, creating it if it doesn't exist."""
+        if msg_id in self._culled_ids:
+            raise KeyError(f"Record {msg_id!r} has been culled for size")
+        if msg_id not in self._records:
+            self.add_record(msg_id, rec)
+            return
+        self._check_dates(rec)
+        _rec = self._records[msg_id]
+        if warn_conflicts:
+            self._warn_conflicts(msg_id, _rec, rec, append_keys)
+        self._drop_bytes(_rec)
+        for key, value in rec.items():
+            if key in append_keys:
+                _rec[key] = (_rec.get(key) or '') + (value or '')
+            elif value:
+                _rec[key] = value
+        self._add_bytes(_rec)
+
     def drop_matching_records(self, check):
         """Remove a record from the DB."""
         matches = self._match(check)
@@ -302,7 +398,14 @@ class DictDB(BaseDB):
         # This is extremely unlikely to happen,
         # but it seems to come up in some tests on VMs.
         msg_ids = [m for m in msg_ids if self._records[m]['submitted'] is not None]
-        return sorted(msg_ids, key=lambda m: self._records[m]['submitted'])
+
+        def submitted(msg_id):
+            rec = self._records[msg_id]
+            if isinstance(rec['submitted'], str):
+                rec['submitted'] = _parse_date(rec['submitted'])
+            return rec['submitted']
+
+        return sorted(msg_ids, key=submitted)
 
 
 class NoData(KeyError):
@@ -331,6 +434,9 @@ class NoDB(BaseDB):
     def update_record(self, msg_id, record):
         pass
 
+    def merge_record(self, msg_id, record, append_keys=(), warn_conflicts=False):
+        pass
+
     def drop_matching_records(self, check):
         pass
 
@@ -14,7 +14,17 @@ import uuid
 import zmq
 from jupyter_client.session import Session
 from tornado import ioloop
-from traitlets import Bool, Dict, Float, Instance, Integer, Set, default
+from traitlets import (
+    Bool,
+    Bytes,
+    Dict,
+    Float,
+    Instance,
+    Integer,
+    Set,
+    Unicode,
+    default,
+)
 from traitlets.config.configurable import LoggingConfigurable
 from zmq.devices import ThreadDevice, ThreadMonitoredQueue
 from zmq.eventloop.zmqstream import ZMQStream
@@ -187,29 +197,26 @@ class HeartMonitor(LoggingConfigurable):
                 new_probation[cur_heart] = miss_count
         return failures, new_probation
 
-    def handle_new_hearts(self, hearts):
-        for heart in hearts:
-            self.hearts.add(heart)
-        self.log.debug(f"Notifying hub of {len(hearts)} new hearts")
+    def _notify_hub(self, msg_type, hearts):
+        """Send the hub a list of new or stopped hearts"""
         self.session.send(
             self.monitor_stream,
-            "new_heart",
+            msg_type,
             content={
                 "hearts": [h.decode("utf8", "replace") for h in hearts],
             },
             ident=[b"heartmonitor", b""],
         )
 
+    def handle_new_hearts(self, hearts):
+        for heart in hearts:
+            self.hearts.add(heart)
+        self.log.debug(f"Notifying hub of {len(hearts)} new hearts")
+        self._notify_hub("new_heart", hearts)
+
     def handle_heart_failure(self, hearts):
         self.log.debug(f"Notifying hub of {len(hearts)} stopped hearts")
-        self.session.send(
-            self.monitor_stream,
-            "stopped_heart",
-            content={
-                "hearts": [h.decode("utf8", "replace") for h in hearts],
-            },
-            ident=[b"heartmonitor", b""],
-        )
+        self._notify_hub("stopped_heart", hearts)
         for heart in hearts:
             try:
                 self.hearts.remove(heart)
@@ -244,6 +251,47 @@ class HeartMonitor(LoggingConfigurable):
             )
 
 
+class HeartAggregator(HeartMonitor):
+    """A HeartMonitor for a subset of engines, in a heartbeat tree
+
+    Large clusters can spread their engines across several aggregators,
+    so no single process pings every engine and checks every response each period.
+    Like any HeartMonitor, an aggregator only tells the Hub about
+    hearts that start or stop beating,
+    and identifies itself in those messages.
+
+    The aggregator is itself a heart of the root HeartMonitor,
+    so if the aggregator stops,
+    the Hub treats all of the engines it reported as stopped.
+    """
+
+    heart_id = Bytes()
+    upstream_ping_url = Unicode()
+    upstream_pong_url = Unicode()
+    upstream_curve_keys = Dict()
+
+    def start(self):
+        self.heart = Heart(
+            self.upstream_ping_url,
+            self.upstream_pong_url,
+            heart_id=self.heart_id,
+            **self.upstream_curve_keys,
+        )
+        self.heart.start()
+        super().start()
+
+    def _notify_hub(self, msg_type, hearts):
+        self.session.send(
+            self.monitor_stream,
+            msg_type,
+            content={
+                "hearts": [h.decode("utf8", "replace") for h in hearts],
+                "aggregator": self.heart_id.decode("utf8"),
+            },
+            ident=[b"heartmonitor", b""],
+        )
+
+
 async def _setup_heartmonitor(
     ctx,
     ping_url,
@@ -252,6 +300,7 @@ async def _setup_heartmonitor(
     log_level=logging.INFO,
     curve_publickey=None,
     curve_secretkey=None,
+    heart_monitor_class=HeartMonitor,
     **heart_monitor_kwargs,
 ):
     """Set up heart monitor
@@ -294,7 +343,7 @@ async def _setup_heartmonitor(
     app = IPController(log_level=log_level)
     heart_monitor_kwargs['log'] = app.log
 
-    heart_monitor = HeartMonitor(
+    heart_monitor = heart_monitor_class(
         ping_stream=ping_stream,
         pong_stream=pong_stream,
         monitor_stream=monitor_stream,
@@ -336,3 +385,35 @@ def start_heartmonitor(
     finally:
         loop.close()
         ctx.destroy()
+
+
+def start_heart_aggregator(
+    upstream_ping_url,
+    upstream_pong_url,
+    heart_id,
+    curve_publickey=None,
+    curve_secretkey=None,
+    **kwargs,
+):
+    """Start a heart aggregator, beating as a heart of the root HeartMonitor.
+
+    For use in a background process,
+    via Process(target=start_heart_aggregator)
+    """
+    upstream_curve_keys = {}
+    if curve_publickey:
+        upstream_curve_keys = dict(
+            curve_serverkey=curve_publickey,
+            curve_secretkey=curve_secretkey,
+            curve_publickey=curve_publickey,
+        )
+    start_heartmonitor(
+        heart_monitor_class=HeartAggregator,
+        heart_id=heart_id,
+        upstream_ping_url=upstream_ping_url,
+        upstream_pong_url=upstream_pong_url,
+        upstream_curve_keys=upstream_curve_keys,
+        curve_publickey=curve_publickey,
+        curve_secretkey=curve_secretkey,
+        **kwargs,
+    )
@@ -15,17 +15,18 @@ from collections import deque
 from datetime import datetime
 
 import zmq
-from jupyter_client.jsonutil import parse_date
 from jupyter_client.session import Session
 from tornado import ioloop
 from traitlets import (
     Any,
+    Bool,
     Bytes,
     Dict,
     Float,
     HasTraits,
     Instance,
     Integer,
+    List,
     Set,
     Unicode,
     default,
@@ -36,7 +37,9 @@ from zmq.eventloop.zmqstream import ZMQStream
 from ipyparallel import error, util
 
 from ..util import extract_dates
+from .asyncdb import AsyncDB
 from .heartmonitor import HeartMonitor
+from .metrics import TaskMetrics
 
 # internal:
 
@@ -78,23 +81,32 @@ def empty_record():
     }
 
 
-def ensure_date_is_parsed(header):
-    if not isinstance(header['date'], datetime):
-        header['date'] = parse_date(header['date'])
+def _parse_timestamp(value):
+    """Parse a timestamp from a message, which may already be a datetime
+
+    Returns None if there is no valid timestamp.
+    """
+    value = extract_dates(value)
+    if isinstance(value, datetime):
+        return util.ensure_timezone(value)
+    return None
 
 
 def init_record(msg):
-    """Initialize a TaskRecord based on a request."""
+    """Initialize a TaskRecord based on a request.
+
+    Timestamps are stored as they arrive (usually ISO8601 strings),
+    and parsed by the db backend when needed.
+    """
     header = msg['header']
 
-    ensure_date_is_parsed(header)
     return {
         'msg_id': header['msg_id'],
         'header': header,
         'content': msg['content'],
         'metadata': msg['metadata'],
         'buffers': msg['buffers'],
-        'submitted': util.ensure_timezone(header['date']),
+        'submitted': header['date'],
         'client_uuid': None,
         'engine_uuid': None,
         'started': None,
@@ -119,6 +131,7 @@ class EngineConnector(HasTraits):
     Attributes are:
     id (int): engine ID
     uuid (unicode): engine UUID
+    slots (int): number of tasks the engine runs at the same time
     pending: set of msg_ids
     stallback: tornado timeout for stalled registration
     registration_started (float): time when registration began
@@ -127,6 +140,7 @@ class EngineConnector(HasTraits):
     id = Integer()
     uuid = Unicode()
     ident = Bytes()
+    slots = Integer(1)
     pending = Set()
     stallback = Any()
     registration_started = Float()
@@ -137,6 +151,86 @@ class EngineConnector(HasTraits):
             self.registration_started = time.monotonic()
 
 
+class OutputBuffer:
+    """IOPub output for one task that has not yet been written to the db
+
+    Stream text is collected as a list of chunks and joined once per flush,
+    other outputs (error, execute_result, etc.) keep only the latest value,
+    as they would in the record.
+
+    Attributes are:
+    fields (dict): latest non-stream values, keyed by TaskRecord key
+    streams (dict): lists of unwritten text chunks, keyed by stream name
+    size (int): number of unwritten stream characters
+    stored (int): number of stream characters accepted for this task so far
+    truncated (bool): whether stream output has been dropped
+    """
+
+    __slots__ = ("fields", "streams", "size", "stored", "truncated")
+
+    def __init__(self):
+        self.fields = {}
+        self.streams = {}
+        self.size = 0
+        self.stored = 0
+        self.truncated = False
+
+    def __bool__(self):
+        return bool(self.fields or self.streams)
+
+    def add_stream(self, name, text, limit=0):
+        """Add stream text, dropping anything past `limit` total characters"""
+        if self.truncated:
+            return
+        if limit and self.stored + len(text) > limit:
+            text = text[: max(limit - self.stored, 0)]
+            text += f"\n[Output truncated after {limit} characters]\n"
+            self.truncated = True
+        self.streams.setdefault(name, []).append(text)
+        self.stored += len(text)
+        self.size += len(text)
+
+    def pop_record(self, msg_id):
+        """Return unwritten output as a record to merge and reset the buffer
+
+        Returns the record and the keys that should be appended
+        """
+        rec = empty_record()
+        rec['msg_id'] = msg_id
+        rec.update(self.fields)
+        for name, chunks in self.streams.items():
+            rec[name] = ''.join(chunks)
+        append_keys = tuple(self.streams)
+        self.fields = {}
+        self.streams = {}
+        self.size = 0
+        return rec, append_keys
+
+
+class CompletedHistory:
+    """Count of completed msg_ids for one engine, plus the most recent ones
+
+    Only the last `maxlen` msg_ids are kept, so memory stays flat
+    for long-lived controllers. len() is the total count.
+    """
+
+    __slots__ = ("count", "recent")
+
+    def __init__(self, maxlen=None):
+        self.count = 0
+        self.recent = deque(maxlen=maxlen)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.recent)
+
+    def append(self, msg_id):
+        self.count += 1
+        self.recent.append(msg_id)
+
+
 class Hub(LoggingConfigurable):
     """The IPython Controller Hub with 0MQ connections
 
@@ -159,19 +253,124 @@ class Hub(LoggingConfigurable):
 
     engine_state_file = Unicode()
 
+    iopub_flush_interval = Float(
+        0.5,
+        config=True,
+        help="""Interval (in seconds) at which output (stdout, displays, etc.)
+        is written to the task database.
+
+        Output is collected in memory and written once per interval,
+        when a task completes, or when a task has buffered `iopub_flush_size`
+        characters, instead of updating the database for every message.
+        Set to 0 to write every output message as it arrives.
+        """,
+    )
+    iopub_flush_size = Integer(
+        64 * 1024,
+        config=True,
+        help="""Number of buffered stream characters for a single task
+        that triggers an immediate write to the task database.""",
+    )
+    max_output_size = Integer(
+        0,
+        config=True,
+        help="""Maximum number of stdout/stderr characters stored per task.
+
+        Output past the limit is dropped and a note is added to the stream.
+        0 means no limit.""",
+    )
+
+    lightweight_monitoring = Bool(
+        False,
+        config=True,
+        help="""Only track the status and timing of tasks.
+
+        Message content, buffers, and output are not deserialized or stored,
+        whichever DB backend is used,
+        which saves a lot of work in the Hub on busy clusters,
+        but results cannot be retrieved or resubmitted via the Hub.
+
+        Usually enabled with `Scheduler.lightweight_monitoring`
+        (`ipcontroller --lightweight`), so the task scheduler sends the Hub
+        batched summaries instead of a copy of every message.
+        """,
+    )
+    metrics_only = Bool(
+        False,
+        config=True,
+        help="""Only count tasks, without tracking individual messages.
+
+        The Hub keeps per-engine and per-client counters and latency histograms
+        (see `Client.hub_metrics`) instead of task records,
+        which is the cheapest way to run the Hub for high-throughput workloads.
+        Implies `lightweight_monitoring`.
+        Nothing is written to the task database,
+        and results cannot be retrieved or resubmitted via the Hub.
+        """,
+    )
+    completed_history_length = Integer(
+        1000,
+        config=True,
+        help="""Number of completed msg_ids to remember per engine
+        for verbose queue_status replies.
+
+        The count of completed tasks is always exact.
+        Set to 0 to remember all completed msg_ids.
+        """,
+    )
+
+    resubmit_timeout = Float(
+        60,
+        config=True,
+        help="""Time (in seconds) to wait for the monitor copy of a resubmitted task.
+
+        The Hub remembers the tasks it resubmits, so the original submission time
+        and client of their records are not overwritten when the schedulers'
+        copy of the request arrives.
+        If no copy arrives within this time (e.g. the scheduler is gone),
+        the task is forgotten.
+        """,
+    )
+
+    registration_batch_interval = Float(
+        0.1,
+        config=True,
+        help="""Interval (in seconds) over which engine registrations are coalesced.
+
+        Engines that finish registering within the interval are announced
+        to clients and schedulers in one notification,
+        and the engine state file is written once,
+        instead of once per engine.
+        Set to 0 to only coalesce registrations handled together
+        (e.g. hearts that started beating in the same heartbeat period).
+        Set to a negative value to announce each engine on its own, as before 9.1,
+        e.g. if clients older than 9.1 connect to this controller.
+        """,
+    )
+
     # internal data structures:
     ids = Set()  # engine IDs
     by_ident = Dict()  # map bytes identities : int engine id
     engines = Dict()  # map int engine id : EngineConnector
     hearts = Dict()  # map bytes identities : int engine id, only for active heartbeats
+    heart_aggregators = Set()  # bytes identities of HeartAggregators
+    aggregated_hearts = Dict()  # map bytes identities : HeartAggregator identity
     heartmonitor_period = Integer()
     pending = Set()
-    queues = Dict()  # pending msg_ids keyed by engine_id
-    tasks = Dict()  # pending msg_ids submitted as tasks, keyed by client_id
-    completed = Dict()  # completed msg_ids keyed by engine_id
+    # ordered sets (dicts with None values) of pending msg_ids, keyed by engine_id
+    queues = Dict()  # submitted to the engine directly
+    tasks = Dict()  # submitted as tasks
+    completed = Dict()  # CompletedHistory keyed by engine_id
+    engine_resources = Dict()  # latest resource samples keyed by engine_id
     all_completed = Set()  # completed msg_ids keyed by engine_id
     unassigned = Set()  # set of task msg_ids not yet assigned a destination
+    # msg_ids of resubmitted tasks not yet seen by the monitor : expiry timeout
+    resubmitted = Dict()
     incoming_registrations = Dict()
+    # notification content for registered engines, not yet announced
+    _registered_batch = List()
+    _registration_flush = Any()  # scheduled _flush_registrations
+    output_buffers = Dict()  # OutputBuffers keyed by msg_id
     registration_timeout = Integer()
     _idcounter = Integer(0)
     distributed_scheduler = Any()
@@ -199,6 +398,13 @@ class Hub(LoggingConfigurable):
     resubmit = Instance(ZMQStream, allow_none=True)
     heartmonitor = Instance(HeartMonitor, allow_none=True)
     db = Instance(object, allow_none=True)
+    async_db = Instance(AsyncDB)
+    metrics = Instance(TaskMetrics, allow_none=True)
+
+    @default("async_db")
+    def _default_async_db(self):
+        return AsyncDB(db=self.db, parent=self, log=self.log)
+
     client_info = Dict()
     engine_info = Dict()
 
@@ -234,6 +440,7 @@ class Hub(LoggingConfigurable):
             b'incontrol': _passer,
             b'outcontrol': _passer,
             b'iopub': self.monitor_iopub_message,
+            b'summaries': self.save_summaries,
             b'heartmonitor': self.heartmonitor_message,
         }
 
@@ -247,15 +454,36 @@ class Hub(LoggingConfigurable):
             'resubmit_request': self.resubmit_task,
             'shutdown_request': self.shutdown_request,
             'registration_request': self.register_engine,
-            'unregistration_request': self.unregister_engine,
+            'unregistration_request': self.unregistration_request,
             'connection_request': self.connection_request,
             'become_dask_request': self.become_dask,
             'stop_distributed_request': self.stop_distributed,
         }
 
+        if self.metrics_only:
+            self.lightweight_monitoring = True
+            self.metrics = TaskMetrics()
+            self.monitor_handlers.update(
+                {
+                    b'in': self.count_queue_request,
+                    b'out': self.count_queue_result,
+                    b'intask': self.count_task_request,
+                    b'outtask': self.count_task_result,
+                    b'tracktask': self.count_task_destination,
+                    b'summaries': self.count_summaries,
+                }
+            )
+        self.query_handlers['metrics_request'] = self.get_metrics
+
         # ignore resubmit replies
         self.resubmit.on_recv(lambda msg: None, copy=False)
 
+        if self.iopub_flush_interval > 0:
+            self._flush_callback = ioloop.PeriodicCallback(
+                self.flush_output, 1000 * self.iopub_flush_interval
+            )
+            self._flush_callback.start()
+
         self.log.info("hub::created hub")
 
     def new_engine_id(self, requested_id=None):
@@ -311,6 +539,21 @@ class Hub(LoggingConfigurable):
             raise IndexError("No Engines Registered")
         return targets
 
+    def _db_write(self, errmsg, method, msg_id, *args, **kwargs):
+        """Write to the db without waiting for it to finish
+
+        Failures are logged as `errmsg % msg_id`.
+        """
+        future = self.async_db.submit(method, msg_id, *args, **kwargs)
+
+        def log_error(future):
+            exc = future.exception()
+            if exc is not None:
+                self.log.error(errmsg, msg_id, exc_info=exc)
+
+        future.add_done_callback(log_error)
+        return future
+
     # -----------------------------------------------------------------------------
     # dispatch methods (1 per stream)
     # -----------------------------------------------------------------------------
@@ -400,28 +643,46 @@ class Hub(LoggingConfigurable):
             )
             return
         msg_type = msg['header']['msg_type']
+        # set if the hearts are monitored by a HeartAggregator
+        aggregator = msg['content'].get('aggregator')
+        if aggregator is not None:
+            aggregator = aggregator.encode("utf8")
         if msg_type == 'new_heart':
             hearts = msg['content']['hearts']
             self.log.info(f"Registering {len(hearts)} new hearts")
             for heart in hearts:
-                self.handle_new_heart(heart.encode("utf8"))
+                self.handle_new_heart(heart.encode("utf8"), aggregator)
         elif msg_type == 'stopped_heart':
             hearts = msg['content']['hearts']
             self.log.warning(f"{len(hearts)} hearts stopped")
             for heart in hearts:
                 self.handle_stopped_heart(heart.encode("utf8"))
 
-    def handle_new_heart(self, heart):
+    def handle_new_heart(self, heart, aggregator=None):
         """Handle a new heart that just started beating"""
         self.log.debug("heartbeat::handle_new_heart(%r)", heart)
-        if heart not in self.incoming_registrations:
+        if heart in self.heart_aggregators:
+            self.log.debug("heartbeat::heart aggregator %r started", heart)
+        elif heart not in self.incoming_registrations:
             self.log.info("heartbeat::ignoring new heart: %r", heart)
         else:
+            if aggregator is not None:
+                self.aggregated_hearts[heart] = aggregator
             self.finish_registration(heart)
 
     def handle_stopped_heart(self, heart):
         """Handle notification that heart has stopped"""
         self.log.debug("heartbeat::handle_stopped_heart(%r)", heart)
+        if heart in self.heart_aggregators:
+            # the hearts it was monitoring can't be trusted to be beating
+            hearts = [h for h, agg in self.aggregated_hearts.items() if agg == heart]
+            self.log.error(
+                f"heartbeat::heart aggregator {heart} stopped,"
+                f" stopping its {len(hearts)} hearts"
+            )
+            for h in hearts:
+                self.handle_stopped_heart(h)
+            return
         eid = self.hearts.get(heart, None)
         if eid is None:
             if heart in self.expect_stopped_hearts:
@@ -444,7 +705,7 @@ class Hub(LoggingConfigurable):
             return
         queue_id, client_id = idents[:2]
         try:
-            msg = self.session.deserialize(msg)
+            msg = self.session.deserialize(msg, content=not self.lightweight_monitoring)
         except Exception:
             self.log.error(
                 "queue::client %r sent invalid message to %r: %r",
@@ -461,6 +722,8 @@ class Hub(LoggingConfigurable):
             self.log.debug("queue::    valid are: %r", self.by_ident.keys())
             return
         record = init_record(msg)
+        if self.lightweight_monitoring:
+            record['content'] = record['buffers'] = None
         msg_id = record['msg_id']
         self.log.info(
             "queue::client %r submitted request %r to %s", client_id, msg_id, eid
@@ -470,33 +733,17 @@ class Hub(LoggingConfigurable):
         record['client_uuid'] = msg['header']['session']
         record['queue'] = 'mux'
 
-        try:
-            # it's posible iopub arrived first:
-            existing = self.db.get_record(msg_id)
-            for key, evalue in existing.items():
-                rvalue = record.get(key, None)
-                if evalue and rvalue and evalue != rvalue:
-                    self.log.warning(
-                        "conflicting initial state for record: %r:%r <%r> %r",
-                        msg_id,
-                        rvalue,
-                        key,
-                        evalue,
-                    )
-                elif evalue and not rvalue:
-                    record[key] = evalue
-            try:
-                self.db.update_record(msg_id, record)
-            except Exception:
-                self.log.error("DB Error updating record %r", msg_id, exc_info=True)
-        except KeyError:
-            try:
-                self.db.add_record(msg_id, record)
-            except Exception:
-                self.log.error("DB Error adding record %r", msg_id, exc_info=True)
+        # it's possible iopub arrived first, so merge with any existing record
+        self._db_write(
+            "DB Error saving record %r",
+            'merge_record',
+            msg_id,
+            record,
+            warn_conflicts=True,
+        )
 
         self.pending.add(msg_id)
-        self.queues[eid].append(msg_id)
+        self.queues[eid][msg_id] = None
 
     def save_queue_result(self, idents, msg):
         if len(idents) < 2:
@@ -505,7 +752,7 @@ class Hub(LoggingConfigurable):
 
         client_id, queue_id = idents[:2]
         try:
-            msg = self.session.deserialize(msg)
+            msg = self.session.deserialize(msg, content=not self.lightweight_monitoring)
         except Exception:
             self.log.error(
                 "queue::engine %r sent invalid message to %r: %r",
@@ -516,6 +763,10 @@ class Hub(LoggingConfigurable):
             )
             return
 
+        if msg['header']['msg_type'] == 'apply_reply_chunk':
+            # part of a large result, which is not stored
+            return
+
         eid = self.by_ident.get(queue_id, None)
         if eid is None:
             self.log.error("queue::unknown engine %r is sending a reply: ", queue_id)
@@ -528,7 +779,7 @@ class Hub(LoggingConfigurable):
         if msg_id in self.pending:
             self.pending.remove(msg_id)
             self.all_completed.add(msg_id)
-            self.queues[eid].remove(msg_id)
+            self.queues[eid].pop(msg_id, None)
             self.completed[eid].append(msg_id)
             self.log.info("queue::request %r completed on %s", msg_id, eid)
         elif msg_id not in self.all_completed:
@@ -539,9 +790,9 @@ class Hub(LoggingConfigurable):
         # update record anyway, because the unregistration could have been premature
         rheader = msg['header']
         md = msg['metadata']
-        ensure_date_is_parsed(rheader)
-        completed = util.ensure_timezone(rheader['date'])
-        started = extract_dates(md.get('started', None))
+        self._save_resources(eid, md)
+        completed = rheader['date']
+        started = md.get('started', None)
         result = {
             'result_header': rheader,
             'result_metadata': md,
@@ -552,10 +803,10 @@ class Hub(LoggingConfigurable):
         }
 
         result['result_buffers'] = msg['buffers']
-        try:
-            self.db.update_record(msg_id, result)
-        except Exception:
-            self.log.error("DB Error updating record %r", msg_id, exc_info=True)
+        if self.lightweight_monitoring:
+            result['result_content'] = result['result_buffers'] = None
+        self._db_write("DB Error updating record %r", 'update_record', msg_id, result)
+        self.finish_output(msg_id)
 
     # --------------------- Broadcast traffic ------------------------------
     def save_broadcast_request(self, idents, msg):
@@ -576,10 +827,7 @@ class Hub(LoggingConfigurable):
         msg_id = header['msg_id']
         self.pending.add(msg_id)
 
-        try:
-            self.db.add_record(msg_id, record)
-        except Exception as e:
-            self.log.error(f'DB Error adding record {msg_id}', exc_info=True)
+        self._db_write("DB Error adding record %r", 'add_record', msg_id, record)
 
     def save_broadcast_result(self, idents, msg):
         client_id = idents[0]
@@ -608,9 +856,8 @@ class Hub(LoggingConfigurable):
             self.all_completed.add(msg_id)
             if eid is not None and status != 'aborted':
                 self.completed[eid].append(msg_id)
-            ensure_date_is_parsed(header)
-            completed = util.ensure_timezone(header['date'])
-            started = extract_dates(md.get('started', None))
+            completed = header['date']
+            started = md.get('started', None)
             result = {
                 'result_header': header,
                 'result_metadata': msg['metadata'],
@@ -622,12 +869,10 @@ class Hub(LoggingConfigurable):
                 'result_buffers': msg['buffers'],
             }
 
-            try:
-                self.db.update_record(msg_id, result)
-            except Exception as e:
-                self.log.error(
-                    f'DB Error saving broadcast result {msg_id}', msg_id, exc_info=True
-                )
+            self._db_write(
+                "DB Error saving broadcast result %r", 'update_record', msg_id, result
+            )
+            self.finish_output(msg_id)
         else:
             self.log.debug(f'broadcast::unknown broadcast {msg_id} finished')
 
@@ -638,7 +883,7 @@ class Hub(LoggingConfigurable):
         client_id = idents[0]
 
         try:
-            msg = self.session.deserialize(msg)
+            msg = self.session.deserialize(msg, content=not self.lightweight_monitoring)
         except Exception:
             self.log.error(
                 "task::client %r sent invalid task message: %r",
@@ -648,57 +893,38 @@ class Hub(LoggingConfigurable):
             )
             return
         record = init_record(msg)
-
+        if self.lightweight_monitoring:
+            record['content'] = record['buffers'] = None
         record['client_uuid'] = msg['header']['session']
+        self._task_submitted(record)
+
+    def _task_submitted(self, record):
         record['queue'] = 'task'
-        header = msg['header']
-        msg_id = header['msg_id']
+        msg_id = record['msg_id']
+        expiry = self.resubmitted.pop(msg_id, None)
+        if expiry is not None:
+            self.loop.remove_timeout(expiry)
+            for key in ('submitted', 'client_uuid', 'buffers'):
+                # don't clobber these keys on resubmit
+                # submitted and client_uuid should be different
+                # and buffers might be big, and shouldn't have changed
+                record.pop(key, None)
         self.pending.add(msg_id)
         self.unassigned.add(msg_id)
-        try:
-            # it's posible iopub arrived first:
-            existing = self.db.get_record(msg_id)
-            if existing['resubmitted']:
-                for key in ('submitted', 'client_uuid', 'buffers'):
-                    # don't clobber these keys on resubmit
-                    # submitted and client_uuid should be different
-                    # and buffers might be big, and shouldn't have changed
-                    record.pop(key)
-                    # still check content,header which should not change
-                    # but are not expensive to compare as buffers
-
-            for key, evalue in existing.items():
-                if key.endswith('buffers'):
-                    # don't compare buffers
-                    continue
-                rvalue = record.get(key, None)
-                if evalue and rvalue and evalue != rvalue:
-                    self.log.warning(
-                        "conflicting initial state for record: %r:%r <%r> %r",
-                        msg_id,
-                        rvalue,
-                        key,
-                        evalue,
-                    )
-                elif evalue and not rvalue:
-                    record[key] = evalue
-            try:
-                self.db.update_record(msg_id, record)
-            except Exception:
-                self.log.error("DB Error updating record %r", msg_id, exc_info=True)
-        except KeyError:
-            try:
-                self.db.add_record(msg_id, record)
-            except Exception:
-                self.log.error("DB Error adding record %r", msg_id, exc_info=True)
-        except Exception:
-            self.log.error("DB Error saving task request %r", msg_id, exc_info=True)
+        # it's possible iopub arrived first, so merge with any existing record
+        self._db_write(
+            "DB Error saving task request %r",
+            'merge_record',
+            msg_id,
+            record,
+            warn_conflicts=True,
+        )
 
     def save_task_result(self, idents, msg):
         """save the result of a completed task."""
         client_id = idents[0]
         try:
-            msg = self.session.deserialize(msg)
+            msg = self.session.deserialize(msg, content=not self.lightweight_monitoring)
         except Exception:
             self.log.error(
                 "task::invalid task result message send to %r: %r",
@@ -708,21 +934,38 @@ class Hub(LoggingConfigurable):
             )
             return
 
+        if msg['header']['msg_type'] == 'apply_reply_chunk':
+            # part of a large result, which is not stored
+            return
+
         parent = msg['parent_header']
         if not parent:
             # print msg
             self.log.warning("Task %r had no parent!", msg)
             return
         msg_id = parent['msg_id']
-        if msg_id in self.unassigned:
-            self.unassigned.remove(msg_id)
-
         header = msg['header']
         md = msg['metadata']
-        engine_uuid = md.get('engine', '')
-        eid = self.by_ident.get(engine_uuid.encode("utf8"), None)
+        result = {
+            'result_header': header,
+            'result_metadata': md,
+            'result_content': msg['content'],
+            'started': md.get('started', None),
+            'completed': header['date'],
+            'received': util.utcnow(),
+            'engine_uuid': md.get('engine', ''),
+            'result_buffers': msg['buffers'],
+        }
+        if self.lightweight_monitoring:
+            result['result_content'] = result['result_buffers'] = None
+        self._task_finished(msg_id, md.get('status', None), result)
 
-        status = md.get('status', None)
+    def _task_finished(self, msg_id, status, result):
+        if msg_id in self.unassigned:
+            self.unassigned.remove(msg_id)
+
+        eid = self.by_ident.get(result['engine_uuid'].encode("utf8"), None)
+        self._save_resources(eid, result['result_metadata'])
 
         if msg_id in self.pending:
             self.log.info("task::task %r finished on %s", msg_id, eid)
@@ -731,30 +974,21 @@ class Hub(LoggingConfigurable):
             if eid is not None:
                 if status != 'aborted':
                     self.completed[eid].append(msg_id)
-                if msg_id in self.tasks[eid]:
-                    self.tasks[eid].remove(msg_id)
-            ensure_date_is_parsed(header)
-            completed = util.ensure_timezone(header['date'])
-            started = extract_dates(md.get('started', None))
-            result = {
-                'result_header': header,
-                'result_metadata': msg['metadata'],
-                'result_content': msg['content'],
-                'started': started,
-                'completed': completed,
-                'received': util.utcnow(),
-                'engine_uuid': engine_uuid,
-            }
-
-            result['result_buffers'] = msg['buffers']
-            try:
-                self.db.update_record(msg_id, result)
-            except Exception:
-                self.log.error("DB Error saving task request %r", msg_id, exc_info=True)
+                self.tasks[eid].pop(msg_id, None)
+            self._db_write(
+                "DB Error saving task result %r", 'update_record', msg_id, result
+            )
+            self.finish_output(msg_id)
 
         else:
             self.log.debug("task::unknown task %r finished", msg_id)
 
+    def _save_resources(self, eid, md):
+        """Keep the latest resource sample attached to an engine's reply"""
+        resources = md.get('resources') if md else None
+        if resources and eid in self.engines:
+            self.engine_resources[eid] = resources
+
     def save_task_destination(self, idents, msg):
         try:
             msg = self.session.deserialize(msg, content=True)
@@ -763,8 +997,9 @@ class Hub(LoggingConfigurable):
             return
         content = msg['content']
         # print (content)
-        msg_id = content['msg_id']
-        engine_uuid = content['engine_id']
+        self._task_assigned(content['msg_id'], content['engine_id'])
+
+    def _task_assigned(self, msg_id, engine_uuid):
         eid = self.by_ident[engine_uuid.encode("utf8")]
 
         self.log.info("task::task %r arrived on %r", msg_id, eid)
@@ -773,18 +1008,67 @@ class Hub(LoggingConfigurable):
         # else:
         #     self.log.debug("task::task %r not listed as MIA?!"%(msg_id))
 
-        self.tasks[eid].append(msg_id)
+        self.tasks[eid][msg_id] = None
+        self._db_write(
+            "DB Error saving task destination %r",
+            'update_record',
+            msg_id,
+            dict(engine_uuid=engine_uuid),
+        )
+
+    def save_summaries(self, idents, msg):
+        """Save a batch of message summaries from a scheduler
+
+        Sent instead of full copies of each message
+        when `Scheduler.lightweight_monitoring` is enabled.
+        """
         try:
-            self.db.update_record(msg_id, dict(engine_uuid=engine_uuid))
+            msg = self.session.deserialize(msg, content=True)
         except Exception:
-            self.log.error("DB Error saving task destination %r", msg_id, exc_info=True)
+            self.log.error("monitor::invalid summary message", exc_info=True)
+            return
+        for summary in msg['content']['summaries']:
+            topic = summary['topic']
+            msg_id = summary['msg_id']
+            try:
+                if topic == 'intask':
+                    record = empty_record()
+                    header = summary['header']
+                    record['msg_id'] = msg_id
+                    record['header'] = header
+                    record['submitted'] = header['date']
+                    record['client_uuid'] = header['session']
+                    self._task_submitted(record)
+                elif topic == 'tracktask':
+                    self._task_assigned(msg_id, summary['engine_uuid'])
+                elif topic == 'outtask':
+                    header = summary['header']
+                    md = summary['metadata']
+                    result = {
+                        'result_header': header,
+                        'result_metadata': md,
+                        'started': md.get('started', None),
+                        'completed': header['date'],
+                        'received': util.utcnow(),
+                        'engine_uuid': md.get('engine', ''),
+                    }
+                    self._task_finished(msg_id, md.get('status', None), result)
+                else:
+                    self.log.error("Unrecognized summary topic: %r", topic)
+            except Exception:
+                self.log.error(
+                    "monitor::failed to handle %s summary for %r",
+                    topic,
+                    msg_id,
+                    exc_info=True,
+                )
 
     # --------------------- IOPub Traffic ------------------------------
 
     def monitor_iopub_message(self, topics, msg):
         '''intercept iopub traffic so events can be acted upon'''
         try:
-            msg = self.session.deserialize(msg, content=True)
+            msg = self.session.deserialize(msg, content=not self.lightweight_monitoring)
         except Exception:
             self.log.error("iopub::invalid IOPub message", exc_info=True)
             return
@@ -802,6 +1086,10 @@ class Hub(LoggingConfigurable):
                 ident='shutdown_reply', msg=dict(content=dict(id=eid, queue=uuid))
             )
 
+        if self.lightweight_monitoring:
+            # output is not stored
+            return
+
         if msg_type not in (
             'status',
             'shutdown_reply',
@@ -818,46 +1106,150 @@ class Hub(LoggingConfigurable):
         msg_type = msg['header']['msg_type']
         content = msg['content']
 
-        # ensure msg_id is in db
-        try:
-            rec = self.db.get_record(msg_id)
-        except KeyError:
-            rec = None
+        buf = self.output_buffers.get(msg_id)
+        if buf is None:
+            buf = self.output_buffers[msg_id] = OutputBuffer()
 
-        # stream
-        d = {}
         if msg_type == 'stream':
-            name = content['name']
-            s = '' if rec is None else rec[name]
-            d[name] = s + content['text']
+            buf.add_stream(content['name'], content['text'], self.max_output_size)
         elif msg_type == 'error':
-            d['error'] = content
+            buf.fields['error'] = content
         elif msg_type == 'execute_input':
-            d['execute_input'] = content['code']
+            buf.fields['execute_input'] = content['code']
         elif msg_type in ('display_data', 'execute_result'):
-            d[msg_type] = content
+            buf.fields[msg_type] = content
         elif msg_type == 'data_pub':
             self.log.info(f"ignored data_pub message for {msg_id}")
         else:
             self.log.warning("unhandled iopub msg_type: %r", msg_type)
 
-        if not d:
+        if buf and (
+            self.iopub_flush_interval <= 0 or buf.size >= self.iopub_flush_size
+        ):
+            self._write_output(msg_id, buf)
+
+    def _write_output(self, msg_id, buf):
+        """Write the contents of one OutputBuffer to the db"""
+        # iopub may arrive before the request, so create the record if needed
+        rec, append_keys = buf.pop_record(msg_id)
+        self._db_write(
+            "DB Error saving iopub message %r",
+            'merge_record',
+            msg_id,
+            rec,
+            append_keys=append_keys,
+        )
+
+    def finish_output(self, msg_id):
+        """Write buffered output for a task that has just completed
+
+        The buffer is kept until the next periodic flush,
+        so output arriving shortly after the reply still counts toward
+        `max_output_size`.
+        Without periodic flushes, output is already written,
+        and the buffer is dropped right away.
+        """
+        if self.iopub_flush_interval <= 0:
+            self.output_buffers.pop(msg_id, None)
             return
+        buf = self.output_buffers.get(msg_id)
+        if buf:
+            self._write_output(msg_id, buf)
 
-        if rec is None:
-            # new record
-            rec = empty_record()
-            rec['msg_id'] = msg_id
-            rec.update(d)
-            d = rec
-            update_record = self.db.add_record
-        else:
-            update_record = self.db.update_record
+    def flush_output(self):
+        """Write all buffered output to the db
+
+        Called periodically, and before handling requests that read the db.
+        """
+        for msg_id, buf in list(self.output_buffers.items()):
+            if buf:
+                self._write_output(msg_id, buf)
+            elif msg_id not in self.pending:
+                # finished (or never submitted): nothing left to track
+                self.output_buffers.pop(msg_id)
+
+    # ------------------------- Metrics Only ---------------------------------
+
+    def _deserialize_headers(self, msg):
+        """Deserialize a monitored message, except for its content"""
+        try:
+            return self.session.deserialize(msg, content=False)
+        except Exception:
+            self.log.error("monitor::invalid message", exc_info=True)
+            return None
+
+    def count_queue_request(self, idents, msg):
+        msg = self._deserialize_headers(msg)
+        if msg is None:
+            return
+        eid = self.by_ident.get(idents[0], None)
+        if eid is None:
+            self.log.error("queue::target %r not registered", idents[0])
+            return
+        self.metrics.submitted(msg['header']['session'], eid)
+
+    def count_task_request(self, idents, msg):
+        msg = self._deserialize_headers(msg)
+        if msg is not None:
+            self.metrics.submitted(msg['header']['session'])
+
+    def count_task_destination(self, idents, msg):
+        try:
+            msg = self.session.deserialize(msg, content=True)
+        except Exception:
+            self.log.error("task::invalid task tracking message", exc_info=True)
+            return
+        engine_uuid = msg['content']['engine_id']
+        self.metrics.assigned(self.by_ident.get(engine_uuid.encode("utf8"), None))
 
+    def _count_result(self, header, parent, md, task):
+        engine_uuid = md.get('engine', '')
+        self.metrics.finished(
+            parent.get('session'),
+            self.by_ident.get(engine_uuid.encode("utf8"), None),
+            md.get('status', None),
+            task=task,
+            submitted=_parse_timestamp(parent.get('date')),
+            started=_parse_timestamp(md.get('started')),
+            completed=_parse_timestamp(header.get('date')),
+        )
+
+    def count_queue_result(self, idents, msg):
+        msg = self._deserialize_headers(msg)
+        if msg is not None and msg['parent_header']:
+            self._count_result(
+                msg['header'], msg['parent_header'], msg['metadata'], task=False
+            )
+
+    def count_task_result(self, idents, msg):
+        msg = self._deserialize_headers(msg)
+        if msg is not None and msg['parent_header']:
+            self._count_result(
+                msg['header'], msg['parent_header'], msg['metadata'], task=True
+            )
+
+    def count_summaries(self, idents, msg):
         try:
-            update_record(msg_id, d)
+            msg = self.session.deserialize(msg, content=True)
         except Exception:
-            self.log.error("DB Error saving iopub message %r", msg_id, exc_info=True)
+            self.log.error("monitor::invalid summary message", exc_info=True)
+            return
+        for summary in msg['content']['summaries']:
+            topic = summary['topic']
+            if topic == 'intask':
+                self.metrics.submitted(summary['header']['session'])
+            elif topic == 'tracktask':
+                engine_uuid = summary['engine_uuid']
+                self.metrics.assigned(
+                    self.by_ident.get(engine_uuid.encode("utf8"), None)
+                )
+            elif topic == 'outtask':
+                self._count_result(
+                    summary['header'],
+                    summary.get('parent_header', {}),
+                    summary['metadata'],
+                    task=True,
+                )
 
     # -------------------------------------------------------------------------
     # Registration requests
@@ -866,11 +1258,15 @@ class Hub(LoggingConfigurable):
     def connection_request(self, client_id, msg):
         """Reply with connection addresses for clients."""
         self.log.info("client::client %r connected", client_id)
+        # announce pending registrations first,
+        # so they aren't announced again after this reply
+        self._flush_registrations()
         content = dict(status='ok')
         jsonable = {}
         for eid, ec in self.engines.items():
             jsonable[str(eid)] = ec.uuid
         content['engines'] = jsonable
+        content['engine_slots'] = {ec.uuid: ec.slots for ec in self.engines.values()}
         self.session.send(
             self.query, 'connection_reply', content, parent=msg, ident=client_id
         )
@@ -883,6 +1279,7 @@ class Hub(LoggingConfigurable):
         except KeyError:
             self.log.error("registration::queue not specified", exc_info=True)
             return
+        slots = content.get('slots', 1)
 
         eid = self.new_engine_id(content.get('id'))
         self.log.debug(f"registration::requesting registration {eid}:{uuid}")
@@ -934,7 +1331,11 @@ class Hub(LoggingConfigurable):
                 lambda: self._purge_stalled_registration(heart),
             )
             self.incoming_registrations[heart] = EngineConnector(
-                id=eid, uuid=uuid, ident=heart, stallback=t
+                id=eid,
+                uuid=uuid,
+                ident=heart,
+                slots=slots,
+                stallback=t,
             )
         else:
             self.log.error(
@@ -971,16 +1372,24 @@ class Hub(LoggingConfigurable):
 
         self.log.info(f"registration::unregister_engine({eid})")
         ec = self.engines[eid]
+        # announce registrations before any unregistrations
+        self._flush_registrations()
 
         content = dict(id=eid, uuid=ec.uuid)
 
         # stop the heartbeats
         self.hearts.pop(ec.ident, None)
+        self.aggregated_hearts.pop(ec.ident, None)
+        self.engine_resources.pop(eid, None)
         self.expect_stopped_hearts.append(ec.ident)
+        if self.metrics is not None:
+            self.metrics.unregistered(eid)
 
+        # the id may be reused (e.g. by a recycled engine) before this fires
+        outstanding = self.queues[eid]
         self.loop.add_timeout(
             self.loop.time() + self.registration_timeout,
-            lambda: self._handle_stranded_msgs(eid, ec.uuid),
+            lambda: self._handle_stranded_msgs(eid, ec.uuid, outstanding),
         )
 
         # cleanup mappings
@@ -994,7 +1403,22 @@ class Hub(LoggingConfigurable):
                 self.notifier, "unregistration_notification", content=content
             )
 
-    def _handle_stranded_msgs(self, eid, uuid):
+    def unregistration_request(self, ident, msg):
+        """Unregister an engine at its request, and acknowledge it
+
+        Engines that are exiting don't wait for the reply,
+        but recycled engines do before registering again with the same id.
+        """
+        self.unregister_engine(ident, msg)
+        self.session.send(
+            self.query,
+            "unregistration_reply",
+            content=dict(status='ok'),
+            parent=msg,
+            ident=ident,
+        )
+
+    def _handle_stranded_msgs(self, eid, uuid, outstanding):
         """Handle messages known to be on an engine when the engine unregisters.
 
         It is possible that this will fire prematurely - that is, an engine will
@@ -1002,8 +1426,6 @@ class Hub(LoggingConfigurable):
         that the result failed and later receive the actual result.
         """
 
-        outstanding = self.queues[eid]
-
         for msg_id in outstanding:
             self.pending.remove(msg_id)
             self.all_completed.add(msg_id)
@@ -1018,14 +1440,12 @@ class Hub(LoggingConfigurable):
             header['engine'] = uuid
             header['date'] = util.utcnow()
             rec = dict(result_content=content, result_header=header, result_buffers=[])
-            rec['completed'] = util.ensure_timezone(header['date'])
+            rec['completed'] = header['date']
             rec['engine_uuid'] = uuid
-            try:
-                self.db.update_record(msg_id, rec)
-            except Exception:
-                self.log.error(
-                    "DB Error handling stranded msg %r", msg_id, exc_info=True
-                )
+            self._db_write(
+                "DB Error handling stranded msg %r", 'update_record', msg_id, rec
+            )
+            self.finish_output(msg_id)
 
     def finish_registration(self, heart):
         """Second half of engine registration, called after our HeartMonitor
@@ -1048,16 +1468,39 @@ class Hub(LoggingConfigurable):
         self.ids.add(eid)
         self.engines[eid] = ec
         self.by_ident[ec.ident] = ec.id
-        self.queues[eid] = list()
-        self.tasks[eid] = list()
-        self.completed[eid] = list()
+        self.queues[eid] = {}
+        self.tasks[eid] = {}
+        self.completed[eid] = CompletedHistory(self.completed_history_length or None)
         self.hearts[heart] = eid
-        content = dict(id=eid, uuid=ec.uuid)
+        self.log.info("engine::Engine Connected: %i", eid)
+
+        # announce new engines in batches
+        self._registered_batch.append(dict(id=eid, uuid=ec.uuid, slots=ec.slots))
+        if self.registration_batch_interval < 0:
+            self._flush_registrations()
+        elif self._registration_flush is None:
+            self._registration_flush = self.loop.call_later(
+                self.registration_batch_interval, self._flush_registrations
+            )
+
+    def _flush_registrations(self):
+        """Announce registered engines and save engine state, once per batch"""
+        if self._registration_flush is not None:
+            self.loop.remove_timeout(self._registration_flush)
+            self._registration_flush = None
+        if not self._registered_batch:
+            return
+        batch = self._registered_batch
+        self._registered_batch = []
+        if len(batch) > 1:
+            self.log.info(f"registration::announcing {len(batch)} new engines")
         if self.notifier:
+            # the last engine is described at the top level, as before 9.1
+            content = dict(batch[-1])
+            content['engines'] = batch
             self.session.send(
                 self.notifier, "registration_notification", content=content
             )
-        self.log.info("engine::Engine Connected: %i", eid)
 
         self._save_engine_state()
 
@@ -1098,6 +1541,7 @@ class Hub(LoggingConfigurable):
             engines[eid] = ec.uuid
 
         state['engines'] = engines
+        state['slots'] = {eid: ec.slots for eid, ec in self.engines.items()}
 
         state['next_id'] = self._idcounter
 
@@ -1116,13 +1560,15 @@ class Hub(LoggingConfigurable):
 
         save_notifier = self.notifier
         self.notifier = None
+        slots = state.get('slots', {})
         for eid, uuid in state['engines'].items():
             heart = uuid.encode('ascii')
 
             self.incoming_registrations[heart] = EngineConnector(
-                id=int(eid), uuid=uuid, ident=heart
+                id=int(eid), uuid=uuid, ident=heart, slots=slots.get(eid, 1)
             )
             self.finish_registration(heart)
+        self._flush_registrations()
 
         self.notifier = save_notifier
 
@@ -1149,6 +1595,7 @@ class Hub(LoggingConfigurable):
 
     def _shutdown(self):
         self.log.info("hub::hub shutting down.")
+        self.flush_output()
         time.sleep(0.1)
         sys.exit(0)
 
@@ -1182,6 +1629,10 @@ class Hub(LoggingConfigurable):
         * queue (pending MUX jobs)
         * tasks (pending Task jobs)
         * completed (finished jobs from both queues)
+        * resources (latest resource sample from the engine, if any)
+
+        Verbose `completed` lists are limited to the most recent
+        `completed_history_length` msg_ids.
         """
         content = msg['content']
         targets = content['targets']
@@ -1196,32 +1647,48 @@ class Hub(LoggingConfigurable):
         verbose = content.get('verbose', False)
         content = dict(status='ok')
         for t in targets:
+            if self.metrics_only:
+                # only counts are available
+                content[str(t)] = self.metrics.queue_status(t)
+                if t in self.engine_resources:
+                    content[str(t)]['resources'] = self.engine_resources[t]
+                continue
             queue = self.queues[t]
             completed = self.completed[t]
             tasks = self.tasks[t]
-            if not verbose:
+            if verbose:
+                queue = list(queue)
+                completed = list(completed)
+                tasks = list(tasks)
+            else:
                 queue = len(queue)
                 completed = len(completed)
                 tasks = len(tasks)
             content[str(t)] = {'queue': queue, 'completed': completed, 'tasks': tasks}
-        content['unassigned'] = (
-            list(self.unassigned) if verbose else len(self.unassigned)
-        )
+            if t in self.engine_resources:
+                content[str(t)]['resources'] = self.engine_resources[t]
+        if self.metrics_only:
+            content['unassigned'] = self.metrics.unassigned
+        else:
+            content['unassigned'] = (
+                list(self.unassigned) if verbose else len(self.unassigned)
+            )
         # print (content)
         self.session.send(
             self.query, "queue_reply", content=content, ident=client_id, parent=msg
         )
 
-    def purge_results(self, client_id, msg):
+    async def purge_results(self, client_id, msg):
         """Purge results from memory. This method is more valuable before we move
         to a DB based message storage mechanism."""
+        self.flush_output()
         content = msg['content']
         self.log.info("Dropping records with %s", content)
         msg_ids = content.get('msg_ids', [])
         reply = dict(status='ok')
         if msg_ids == 'all':
             try:
-                self.db.drop_matching_records(dict(completed={'$ne': None}))
+                await self.async_db.drop_matching_records(dict(completed={'$ne': None}))
             except Exception:
                 reply = error.wrap_exception()
                 self.log.exception("Error dropping records")
@@ -1235,7 +1702,9 @@ class Hub(LoggingConfigurable):
                     self.log.exception("Error dropping records")
             else:
                 try:
-                    self.db.drop_matching_records(dict(msg_id={'$in': msg_ids}))
+                    await self.async_db.drop_matching_records(
+                        dict(msg_id={'$in': msg_ids})
+                    )
                 except Exception:
                     reply = error.wrap_exception()
                     self.log.exception("Error dropping records")
@@ -1252,7 +1721,7 @@ class Hub(LoggingConfigurable):
                         break
                     uid = self.engines[eid].uuid
                     try:
-                        self.db.drop_matching_records(
+                        await self.async_db.drop_matching_records(
                             dict(engine_uuid=uid, completed={'$ne': None})
                         )
                     except Exception:
@@ -1264,8 +1733,9 @@ class Hub(LoggingConfigurable):
             self.query, 'purge_reply', content=reply, ident=client_id, parent=msg
         )
 
-    def resubmit_task(self, client_id, msg):
+    async def resubmit_task(self, client_id, msg):
         """Resubmit one or more tasks."""
+        self.flush_output()
         parent = msg
 
         def finish(reply):
@@ -1277,11 +1747,19 @@ class Hub(LoggingConfigurable):
                 parent=parent,
             )
 
+        if self.lightweight_monitoring:
+            try:
+                raise RuntimeError(
+                    "Tasks cannot be resubmitted with Hub.lightweight_monitoring"
+                )
+            except Exception:
+                return finish(error.wrap_exception())
+
         content = msg['content']
         msg_ids = content['msg_ids']
         reply = dict(status='ok')
         try:
-            records = self.db.find_records(
+            records = await self.async_db.find_records(
                 {'msg_id': {'$in': msg_ids}}, keys=['header', 'content', 'buffers']
             )
         except Exception:
@@ -1333,13 +1811,16 @@ class Hub(LoggingConfigurable):
             header['date'] = fresh['date']
             msg['header'] = header
 
+            self.resubmitted[msg_id] = self.loop.call_later(
+                self.resubmit_timeout, self._expire_resubmitted, msg_id
+            )
             self.session.send(self.resubmit, msg, buffers=rec['buffers'])
 
             resubmitted[rec['msg_id']] = msg_id
             self.pending.add(msg_id)
             msg['buffers'] = rec['buffers']
             try:
-                self.db.add_record(msg_id, init_record(msg))
+                await self.async_db.add_record(msg_id, init_record(msg))
             except Exception:
                 self.log.error(
                     "db::DB Error updating record: %s", msg_id, exc_info=True
@@ -1350,12 +1831,21 @@ class Hub(LoggingConfigurable):
 
         # store the new IDs in the Task DB
         for msg_id, resubmit_id in resubmitted.items():
-            try:
-                self.db.update_record(msg_id, {'resubmitted': resubmit_id})
-            except Exception:
-                self.log.error(
-                    "db::DB Error updating record: %s", msg_id, exc_info=True
-                )
+            self._db_write(
+                "db::DB Error updating record: %s",
+                'update_record',
+                msg_id,
+                {'resubmitted': resubmit_id},
+            )
+
+    def _expire_resubmitted(self, msg_id):
+        """Forget a resubmitted task whose monitor copy never arrived"""
+        if self.resubmitted.pop(msg_id, None) is not None:
+            self.log.warning(
+                "resubmit::task %r was not seen by the monitor after %is",
+                msg_id,
+                self.resubmit_timeout,
+            )
 
     def _extract_record(self, rec):
         """decompose a TaskRecord dict into subsection of reply for get_result"""
@@ -1378,8 +1868,9 @@ class Hub(LoggingConfigurable):
 
         return content, buffers
 
-    def get_results(self, client_id, msg):
+    async def get_results(self, client_id, msg):
         """Get the result of 1 or more messages."""
+        self.flush_output()
         content = msg['content']
         msg_ids = sorted(set(content['msg_ids']))
         statusonly = content.get('status_only', False)
@@ -1391,7 +1882,13 @@ class Hub(LoggingConfigurable):
         buffers = []
         if not statusonly:
             try:
-                matches = self.db.find_records(dict(msg_id={'$in': msg_ids}))
+                if self.lightweight_monitoring:
+                    raise RuntimeError(
+                        "Results are not stored with Hub.lightweight_monitoring"
+                    )
+                matches = await self.async_db.find_records(
+                    dict(msg_id={'$in': msg_ids})
+                )
                 # turn match list into dict, for faster lookup
                 records = {}
                 for rec in matches:
@@ -1441,10 +1938,24 @@ class Hub(LoggingConfigurable):
             buffers=buffers,
         )
 
-    def get_history(self, client_id, msg):
+    def get_metrics(self, client_id, msg):
+        """Get task counters and latency histograms"""
+        if self.metrics is None:
+            try:
+                raise RuntimeError("Metrics are only collected with Hub.metrics_only")
+            except Exception:
+                content = error.wrap_exception()
+        else:
+            content = dict(status='ok', metrics=self.metrics.to_dict())
+        self.session.send(
+            self.query, "metrics_reply", content=content, parent=msg, ident=client_id
+        )
+
+    async def get_history(self, client_id, msg):
         """Get a list of all msg_ids in our DB records"""
+        self.flush_output()
         try:
-            msg_ids = self.db.get_history()
+            msg_ids = await self.async_db.get_history()
         except Exception as e:
             content = error.wrap_exception()
             self.log.exception("Failed to get history")
@@ -1455,15 +1966,16 @@ class Hub(LoggingConfigurable):
             self.query, "history_reply", content=content, parent=msg, ident=client_id
         )
 
-    def db_query(self, client_id, msg):
+    async def db_query(self, client_id, msg):
         """Perform a raw query on the task record database."""
+        self.flush_output()
         content = msg['content']
         query = extract_dates(content.get('query', {}))
         keys = content.get('keys', None)
         buffers = []
         empty = list()
         try:
-            records = self.db.find_records(query, keys)
+            records = await self.async_db.find_records(query, keys)
         except Exception as e:
             content = error.wrap_exception()
             self.log.exception("DB query failed")
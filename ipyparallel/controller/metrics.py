@@ -0,0 +1,137 @@
+"""Task counters and latency histograms for the Hub
+
+Used instead of per-task records when `Hub.metrics_only` is enabled.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+from collections import Counter, defaultdict
+
+
+class Histogram:
+    """Histogram of durations with power-of-two millisecond buckets
+
+    Bucket 0 counts durations under 1ms,
+    bucket i counts durations in [2 ** (i - 1), 2 ** i) ms.
+    """
+
+    nbuckets = 32
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * self.nbuckets
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        ms = int(seconds * 1000)
+        bucket = min(max(ms, 0).bit_length(), self.nbuckets - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+
+    def to_dict(self):
+        # trim empty buckets from the end
+        last = max((i for i, n in enumerate(self.counts) if n), default=-1)
+        return {
+            'count': self.count,
+            'total': self.total,
+            'buckets': self.counts[: last + 1],
+        }
+
+
+class TaskMetrics:
+    """Counters of tasks per engine and per client, plus timing histograms
+
+    Counter keys are:
+
+    - submitted: requests sent directly to an engine (or by a client)
+    - assigned: tasks assigned to an engine by the task scheduler
+    - finished_direct, finished_tasks: replies, by queue
+    - ok, error, aborted: replies, by status
+
+    latency is the time from submission to completion,
+    runtime is the time from start to completion on the engine.
+    """
+
+    def __init__(self):
+        self.engines = defaultdict(Counter)
+        self.clients = defaultdict(Counter)
+        self.unassigned = 0
+        self.latency = Histogram()
+        self.runtime = Histogram()
+
+    def submitted(self, client_uuid, eid=None):
+        """A request was submitted, to engine `eid` or the task scheduler"""
+        if client_uuid is not None:
+            self.clients[client_uuid]['submitted'] += 1
+        if eid is None:
+            self.unassigned += 1
+        else:
+            self.engines[eid]['submitted'] += 1
+
+    def assigned(self, eid):
+        """A task was assigned to engine `eid`"""
+        self.unassigned = max(self.unassigned - 1, 0)
+        if eid is not None:
+            self.engines[eid]['assigned'] += 1
+
+    def finished(
+        self,
+        client_uuid,
+        eid,
+        status,
+        task,
+        submitted=None,
+        started=None,
+        completed=None,
+    ):
+        """A reply was sent
+
+        `task` is whether the request was submitted as a task.
+        """
+        if client_uuid is not None:
+            self.clients[client_uuid][status] += 1
+        if eid is not None:
+            counter = self.engines[eid]
+            counter[status] += 1
+            counter['finished_tasks' if task else 'finished_direct'] += 1
+        elif task:
+            # failed in the scheduler without being assigned
+            self.unassigned = max(self.unassigned - 1, 0)
+        if completed is not None:
+            if submitted is not None:
+                self.latency.add((completed - submitted).total_seconds())
+            if started is not None:
+                self.runtime.add((completed - started).total_seconds())
+
+    def unregistered(self, eid):
+        """Engine `eid` has unregistered, forget its counters"""
+        self.engines.pop(eid, None)
+
+    def queue_status(self, eid):
+        """Return queue/tasks/completed counts for one engine
+
+        as in the Hub's non-verbose queue_status reply
+        """
+        counter = self.engines[eid]
+        return {
+            'queue': counter['submitted'] - counter['finished_direct'],
+            'tasks': counter['assigned'] - counter['finished_tasks'],
+            'completed': counter['ok'] + counter['error'],
+        }
+
+    def to_dict(self):
+        return {
+            'engines': {eid: dict(counter) for eid, counter in self.engines.items()},
+            'clients': {
+                client: dict(counter) for client, counter in self.clients.items()
+            },
+            'unassigned': self.unassigned,
+            'latency': self.latency.to_dict(),
+            'runtime': self.runtime.to_dict(),
+        }
+
+
+__all__ = ['Histogram', 'TaskMetrics']
@@ -23,6 +23,8 @@ from .dictdb import BaseDB
 class MongoDB(BaseDB):
     """MongoDB TaskRecord backend."""
 
+    blocking = True
+
     connection_args = List(
         config=True,
         help="""Positional arguments to be passed to pymongo.MongoClient.  Only
@@ -70,6 +72,7 @@ class MongoDB(BaseDB):
         """Add a new Task Record, by msg_id."""
         # print rec
         rec = self._binary_buffers(rec)
+        self._parse_dates(rec)
         self._records.insert(rec)
 
     def get_record(self, msg_id):
@@ -83,9 +86,24 @@ class MongoDB(BaseDB):
     def update_record(self, msg_id, rec):
         """Update the data in an existing record."""
         rec = self._binary_buffers(rec)
-
+        self._parse_dates(rec)
         self._records.update({'msg_id': msg_id}, {'$set': rec})
 
+    def merge_record(self, msg_id, rec, append_keys=(), warn_conflicts=False):
+        """Merge data into a record, creating it if it doesn't exist."""
+        if warn_conflicts or any(key in rec for key in append_keys):
+            # no string concatenation or comparison in update operators
+            return super().merge_record(msg_id, rec, append_keys, warn_conflicts)
+        rec = self._binary_buffers(rec)
+        self._parse_dates(rec)
+        update = {key: value for key, value in rec.items() if value}
+        on_insert = {key: value for key, value in rec.items() if key not in update}
+        # msg_id is filled in from the query on insert
+        spec = {'$setOnInsert': on_insert}
+        if update:
+            spec['$set'] = update
+        self._records.update({'msg_id': msg_id}, spec, upsert=True)
+
     def drop_matching_records(self, check):
         """Remove a record from the DB."""
         self._records.remove(check)
@@ -14,7 +14,7 @@ import traitlets.log
 import zmq
 from decorator import decorator
 from tornado import ioloop
-from traitlets import Bytes, Instance, Set, default
+from traitlets import Bool, Bytes, Instance, Integer, List, Set, default
 from traitlets.config import Config, LoggingConfigurable
 from zmq.eventloop import zmqstream
 
@@ -68,6 +68,30 @@ class Scheduler(LoggingConfigurable):
     all_done = Set()  # set of all finished tasks=union(completed,failed)
     all_ids = Set()  # set of all submitted task IDs
 
+    lightweight_monitoring = Bool(
+        False,
+        config=True,
+        help="""Send the Hub batched summaries of messages
+        (headers and metadata only) instead of a full copy of every message.
+
+        Use with `Hub.lightweight_monitoring`.
+        Results cannot be retrieved from the Hub in this mode.
+        """,
+    )
+    monitor_batch_interval = Integer(
+        100,
+        config=True,
+        help="""Interval (in ms) at which batched summaries are sent to the Hub
+        with lightweight_monitoring.""",
+    )
+    monitor_batch_size = Integer(
+        1000,
+        config=True,
+        help="""Number of summaries that triggers sending a batch to the Hub
+        before the next monitor_batch_interval.""",
+    )
+    _monitor_batch = List()
+
     ident = Bytes()  # ZMQ identity. This should just be self.session.session as bytes
 
     # but ensure Bytes
@@ -78,6 +102,12 @@ class Scheduler(LoggingConfigurable):
     def start(self):
         self.engine_stream.on_recv(self.dispatch_result, copy=False)
         self.client_stream.on_recv(self.dispatch_submission, copy=False)
+        if self.lightweight_monitoring:
+            self._monitor_callback = ioloop.PeriodicCallback(
+                self.flush_monitor, self.monitor_batch_interval
+            )
+            # start from our loop, which may not be current yet
+            self.loop.add_callback(self._monitor_callback.start)
 
     def resume_receiving(self):
         """Resume accepting jobs."""
@@ -91,6 +121,47 @@ class Scheduler(LoggingConfigurable):
     def dispatch_result(self, raw_msg):
         raise NotImplementedError("Implement in subclasses")
 
+    def send_monitor(self, topic, raw_msg, msg):
+        """Notify the Hub of a message on `topic`
+
+        Sends `raw_msg` as-is, or queues a summary of the deserialized `msg`
+        with lightweight_monitoring.
+        """
+        if not self.lightweight_monitoring:
+            self.mon_stream.send_multipart([topic] + raw_msg, copy=False)
+            return
+        header = msg['header']
+        summary = {'topic': topic.decode('ascii')}
+        if topic.startswith(b'in'):
+            summary['msg_id'] = header['msg_id']
+            summary['header'] = header
+        else:
+            parent = msg['parent_header']
+            summary['msg_id'] = parent['msg_id']
+            summary['header'] = header
+            summary['parent_header'] = parent
+            summary['metadata'] = msg['metadata']
+        self.queue_summary(summary)
+
+    def queue_summary(self, summary):
+        """Queue a summary dict to be sent to the Hub in the next batch"""
+        self._monitor_batch.append(summary)
+        if len(self._monitor_batch) >= self.monitor_batch_size:
+            self.flush_monitor()
+
+    def flush_monitor(self):
+        """Send queued summaries to the Hub"""
+        if not self._monitor_batch:
+            return
+        batch = self._monitor_batch
+        self._monitor_batch = []
+        self.session.send(
+            self.mon_stream,
+            'monitor_summaries',
+            content={'summaries': batch},
+            ident=[b'summaries', self.ident],
+        )
+
     def dispatch_submission(self, raw_msg):
         raise NotImplementedError("Implement in subclasses")
 
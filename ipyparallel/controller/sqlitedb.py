@@ -4,6 +4,7 @@
 # Distributed under the terms of the Modified BSD License.
 import json
 import os
+import threading
 
 try:
     import cPickle as pickle
@@ -106,6 +107,8 @@ def _convert_timestamp(s):
 class SQLiteDB(BaseDB):
     """SQLite3 TaskRecord backend."""
 
+    blocking = True
+
     filename = Unicode(
         'tasks.db',
         config=True,
@@ -204,18 +207,34 @@ class SQLiteDB(BaseDB):
                     self.location = '.'
             else:
                 self.location = '.'
+        # the Hub may call us from a background thread (see AsyncDB),
+        # while commits happen on the event loop
+        self._lock = threading.Lock()
         self._init_db()
 
         # register db commit as 2s periodic callback
         # to prevent clogging pipes
         # assumes we are being run in a zmq ioloop app
-        self._commit_callback = pc = ioloop.PeriodicCallback(self._db.commit, 2000)
+        self._commit_callback = pc = ioloop.PeriodicCallback(self._commit, 2000)
         pc.start()
 
+    def _commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def _execute(self, query, args=()):
+        with self._lock:
+            return self._db.execute(query, args).rowcount
+
+    def _fetchall(self, query, args=()):
+        with self._lock:
+            return self._db.execute(query, args).fetchall()
+
     def close(self):
         self._commit_callback.stop()
-        self._db.commit()
-        self._db.close()
+        with self._lock:
+            self._db.commit()
+            self._db.close()
 
     def _defaults(self, keys=None):
         """create an empty record"""
@@ -268,6 +287,8 @@ class SQLiteDB(BaseDB):
             detect_types=sqlite3.PARSE_DECLTYPES,
             # isolation_level = None)#,
             cached_statements=64,
+            # access is serialized by self._lock
+            check_same_thread=False,
         )
         # print dir(self._db)
         first_table = previous_table = self.table
@@ -374,23 +395,64 @@ class SQLiteDB(BaseDB):
         d = self._defaults()
         d.update(rec)
         d['msg_id'] = msg_id
+        self._parse_dates(d)
         line = self._dict_to_list(d)
         tups = '({})'.format(','.join(['?'] * len(line)))
-        self._db.execute(f"INSERT INTO '{self.table}' VALUES {tups}", line)
+        self._execute(f"INSERT INTO '{self.table}' VALUES {tups}", line)
         # self._db.commit()
 
+    def merge_record(self, msg_id, rec, append_keys=(), warn_conflicts=False):
+        """Merge data into a record, creating it if it doesn't exist.
+
+        Uses a single INSERT ... ON CONFLICT statement (requires sqlite >= 3.24).
+        With `warn_conflicts`, existing records are compared before they are updated.
+        """
+        if sqlite3.sqlite_version_info < (3, 24):
+            return super().merge_record(msg_id, rec, append_keys, warn_conflicts)
+        d = self._defaults()
+        d.update(rec)
+        d['msg_id'] = msg_id
+        self._parse_dates(d)
+        line = self._dict_to_list(d)
+        tups = '({})'.format(','.join(['?'] * len(line)))
+        if warn_conflicts:
+            inserted = self._execute(
+                f"INSERT INTO '{self.table}' VALUES {tups} ON CONFLICT(msg_id) DO NOTHING",
+                line,
+            )
+            if not inserted:
+                super().merge_record(msg_id, rec, append_keys, warn_conflicts)
+            return
+        sets = []
+        for key in sorted(rec.keys()):
+            if key == 'msg_id':
+                continue
+            if key in append_keys:
+                sets.append(f"{key} = COALESCE({key}, '') || excluded.{key}")
+            elif rec[key]:
+                # only non-empty values overwrite existing data
+                sets.append(f"{key} = excluded.{key}")
+        if sets:
+            on_conflict = "DO UPDATE SET " + ", ".join(sets)
+        else:
+            on_conflict = "DO NOTHING"
+        self._execute(
+            f"INSERT INTO '{self.table}' VALUES {tups} ON CONFLICT(msg_id) {on_conflict}",
+            line,
+        )
+
     def get_record(self, msg_id):
         """Get a specific Task Record, by msg_id."""
-        cursor = self._db.execute(
+        lines = self._fetchall(
             f"""SELECT * FROM '{self.table}' WHERE msg_id==?""", (msg_id,)
         )
-        line = cursor.fetchone()
-        if line is None:
+        if not lines:
             raise KeyError(f"No such msg: {msg_id!r}")
-        return self._list_to_dict(line)
+        return self._list_to_dict(lines[0])
 
     def update_record(self, msg_id, rec):
         """Update the data in an existing record."""
+        self._parse_dates(rec)
         query = f"UPDATE '{self.table}' SET "
         sets = []
         keys = sorted(rec.keys())
@@ -401,19 +463,19 @@ class SQLiteDB(BaseDB):
         query += ', '.join(sets)
         query += ' WHERE msg_id == ?'
         values.append(msg_id)
-        self._db.execute(query, values)
+        self._execute(query, values)
         # self._db.commit()
 
     def drop_record(self, msg_id):
         """Remove a record from the DB."""
-        self._db.execute(f"""DELETE FROM '{self.table}' WHERE msg_id==?""", (msg_id,))
+        self._execute(f"""DELETE FROM '{self.table}' WHERE msg_id==?""", (msg_id,))
         # self._db.commit()
 
     def drop_matching_records(self, check):
         """Remove a record from the DB."""
         expr, args = self._render_expression(check)
         query = f"DELETE FROM '{self.table}' WHERE {expr}"
-        self._db.execute(query, args)
+        self._execute(query, args)
         # self._db.commit()
 
     def find_records(self, check, keys=None):
@@ -444,8 +506,7 @@ class SQLiteDB(BaseDB):
             req = '*'
         expr, args = self._render_expression(check)
         query = f"""SELECT {req} FROM '{self.table}' WHERE {expr}"""
-        cursor = self._db.execute(query, args)
-        matches = cursor.fetchall()
+        matches = self._fetchall(query, args)
         records = []
         for line in matches:
             rec = self._list_to_dict(line, keys)
@@ -455,9 +516,8 @@ class SQLiteDB(BaseDB):
     def get_history(self):
         """get all msg_ids, ordered by time submitted."""
         query = f"""SELECT msg_id FROM '{self.table}' ORDER by submitted ASC"""
-        cursor = self._db.execute(query)
         # will be a list of length 1 tuples
-        return [tup[0] for tup in cursor.fetchall()]
+        return [tup[0] for tup in self._fetchall(query)]
 
 
 __all__ = ['SQLiteDB']
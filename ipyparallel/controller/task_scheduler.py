@@ -4,7 +4,7 @@ from random import randint, random
 from types import FunctionType
 
 import zmq
-from traitlets import Dict, Enum, Instance, Integer, List, observe
+from traitlets import Dict, Enum, Float, Instance, Integer, List, Set, observe
 
 from ipyparallel import Dependency, error, util
 from ipyparallel.controller.scheduler import Scheduler
@@ -81,6 +81,17 @@ def leastload(loads):
     return loads.index(min(loads))
 
 
+def resourceaware(loads):
+    """Choose the lowest load, including the resource use of each engine.
+
+    The task scheduler adds each engine's resource pressure
+    (from the resource samples attached to its replies)
+    to its load before calling this,
+    so engines on busy hosts, or hosts running out of memory, are avoided.
+    """
+    return leastload(loads)
+
+
 # ---------------------------------------------------------------------
 # Classes
 # ---------------------------------------------------------------------
@@ -153,15 +164,41 @@ class TaskScheduler(Scheduler):
         once.  Any positive value greater than one is a compromise between the
         two.
 
+        The limit is per task slot for engines that run several tasks at once
+        (see IPEngine.task_slots).
         """,
     )
 
     scheme_name = Enum(
-        ('leastload', 'pure', 'lru', 'plainrandom', 'weighted', 'twobin'),
+        (
+            'leastload',
+            'pure',
+            'lru',
+            'plainrandom',
+            'weighted',
+            'twobin',
+            'resourceaware',
+        ),
         'leastload',
         config=True,
         help="""select the task scheduler scheme  [default: Python LRU]
-            Options are: 'pure', 'lru', 'plainrandom', 'weighted', 'twobin','leastload'""",
+            Options are: 'pure', 'lru', 'plainrandom', 'weighted', 'twobin','leastload',
+            'resourceaware'
+
+            .. versionchanged:: 9.1
+                Added 'resourceaware'
+            """,
+    )
+
+    memory_pressure_threshold = Float(
+        0.9,
+        config=True,
+        help="""Fraction of a host's memory in use above which
+        the 'resourceaware' scheme avoids its engines,
+        unless no other engine is available.
+
+        .. versionadded:: 9.1
+        """,
     )
 
     # input arguments:
@@ -197,6 +234,10 @@ class TaskScheduler(Scheduler):
     clients = Dict()  # dict by msg_id for who submitted the task
     targets = List()  # list of target IDENTs
     loads = List()  # list of engine loads
+    slots = Dict()  # dict by engine_uuid of task slots
+    resources = Dict()  # dict by engine_uuid of latest resource samples
+    draining = Set()  # set of engine_uuids to recycle once their tasks are done
+    _multi_slot = False  # whether any engine has more than one task slot
     # full = Set() # set of IDENTs that have HWM outstanding tasks
 
     def start(self):
@@ -204,8 +245,15 @@ class TaskScheduler(Scheduler):
         self.query_stream.on_recv(self.dispatch_query_reply)
         self.session.send(self.query_stream, "connection_request", {})
         self._notification_handlers = dict(
-            registration_notification=self._register_engine,
-            unregistration_notification=self._unregister_engine,
+            registration_notification=lambda content: self._register_engines(
+                # batched registrations list engines,
+                # single registrations describe the engine at the top level
+                (engine['uuid'].encode("utf8"), engine.get('slots', 1))
+                for engine in content.get('engines', [content])
+            ),
+            unregistration_notification=lambda content: self._unregister_engine(
+                content['uuid'].encode("utf8")
+            ),
         )
         self.log.info(f"Task scheduler started [{self.scheme_name}]")
         self.notifier_stream.on_recv(self.dispatch_notification)
@@ -228,8 +276,11 @@ class TaskScheduler(Scheduler):
             return
 
         content = msg['content']
-        for uuid in content.get('engines', {}).values():
-            self._register_engine(uuid.encode("utf8"))
+        slots = content.get('engine_slots', {})
+        self._register_engines(
+            (uuid.encode("utf8"), slots.get(uuid, 1))
+            for uuid in content.get('engines', {}).values()
+        )
 
     @util.log_errors
     def dispatch_notification(self, msg):
@@ -252,22 +303,29 @@ class TaskScheduler(Scheduler):
             self.log.error(f"Unhandled message type: {msg_type!r}")
         else:
             try:
-                handler(msg['content']['uuid'].encode("utf8"))
+                handler(msg['content'])
             except Exception:
                 self.log.error("task::Invalid notification msg: %r", msg, exc_info=True)
 
-    def _register_engine(self, uid):
-        """New engine with ident `uid` became available."""
-        # head of the line:
-        self.targets.insert(0, uid)
-        self.loads.insert(0, 0)
-
-        # initialize sets
-        self.completed[uid] = set()
-        self.failed[uid] = set()
-        self.pending[uid] = {}
-
-        # rescan the graph:
+    def _register_engine(self, uid, slots=1):
+        """New engine with ident `uid` and `slots` task slots became available."""
+        self._register_engines([(uid, slots)])
+
+    def _register_engines(self, engines):
+        """New engines became available, given as (uid, slots) pairs."""
+        for uid, slots in engines:
+            # head of the line:
+            self.targets.insert(0, uid)
+            self.loads.insert(0, 0)
+            self.slots[uid] = slots
+            self._multi_slot = self._multi_slot or slots > 1
+
+            # initialize sets
+            self.completed[uid] = set()
+            self.failed[uid] = set()
+            self.pending[uid] = {}
+
+        # rescan the graph once for the batch:
         self.update_graph(None)
 
     def _unregister_engine(self, uid):
@@ -283,10 +341,11 @@ class TaskScheduler(Scheduler):
         # map(self.destinations.pop, self.completed.pop(uid))
         # map(self.destinations.pop, self.failed.pop(uid))
 
-        # prevent this engine from receiving work
-        idx = self.targets.index(uid)
-        self.targets.pop(idx)
-        self.loads.pop(idx)
+        if uid in self.draining:
+            # already receiving no work
+            self.draining.remove(uid)
+        else:
+            self._stop_assigning(uid)
 
         # wait 5 seconds before cleaning up pending jobs, since the results might
         # still be incoming
@@ -298,6 +357,30 @@ class TaskScheduler(Scheduler):
             self.completed.pop(uid)
             self.failed.pop(uid)
 
+    def _stop_assigning(self, uid):
+        """Prevent engine `uid` from receiving more work"""
+        idx = self.targets.index(uid)
+        self.targets.pop(idx)
+        self.loads.pop(idx)
+        self.slots.pop(uid, None)
+        self.resources.pop(uid, None)
+        self._multi_slot = any(slots > 1 for slots in self.slots.values())
+
+    def drain_engine(self, uid):
+        """Stop assigning tasks to engine `uid`, which wants to be recycled
+
+        The engine is sent a recycle_request once its assigned tasks are done.
+        """
+        self.log.info("task::draining engine %r for recycling", uid)
+        self._stop_assigning(uid)
+        self.draining.add(uid)
+
+    def maybe_recycle(self, uid):
+        """Send a draining engine its recycle_request, if it has no tasks left"""
+        if uid in self.draining and not self.pending[uid]:
+            self.log.info("task::recycling engine %r", uid)
+            self.session.send(self.engine_stream, 'recycle_request', {}, ident=[uid])
+
     def handle_stranded_tasks(self, engine):
         """Deal with jobs resident in an engine that died."""
         lost = self.pending[engine]
@@ -348,7 +431,7 @@ class TaskScheduler(Scheduler):
             return
 
         # send to monitor
-        self.mon_stream.send_multipart([b'intask'] + raw_msg, copy=False)
+        self.send_monitor(b'intask', raw_msg, msg)
 
         header = msg['header']
         md = msg['metadata']
@@ -483,7 +566,10 @@ class TaskScheduler(Scheduler):
             parent=job.header,
             ident=job.idents,
         )
-        self.session.send(self.mon_stream, msg, ident=[b'outtask'] + job.idents)
+        if self.lightweight_monitoring:
+            self.send_monitor(b'outtask', None, msg)
+        else:
+            self.session.send(self.mon_stream, msg, ident=[b'outtask'] + job.idents)
 
         self.update_graph(msg_id, success=False)
 
@@ -493,10 +579,14 @@ class TaskScheduler(Scheduler):
             return list(range(len(self.targets)))
         available = []
         for idx in range(len(self.targets)):
-            if self.loads[idx] < self.hwm:
+            if self.loads[idx] < self.capacity(idx):
                 available.append(idx)
         return available
 
+    def capacity(self, idx):
+        """The number of tasks that may be outstanding on self.targets[idx]"""
+        return self.hwm * self.slots.get(self.targets[idx], 1)
+
     def maybe_run(self, job):
         """check location dependencies, and run if they are met."""
         msg_id = job.msg_id
@@ -510,7 +600,7 @@ class TaskScheduler(Scheduler):
             # we need a can_run filter
             def can_run(idx):
                 # check hwm
-                if self.hwm and self.loads[idx] == self.hwm:
+                if self.hwm and self.loads[idx] >= self.capacity(idx):
                     return False
                 target = self.targets[idx]
                 # check blacklist
@@ -579,6 +669,15 @@ class TaskScheduler(Scheduler):
             loads = [self.loads[i] for i in indices]
         else:
             loads = self.loads
+        if self._multi_slot:
+            # compare loads relative to capacity, with several task slots per engine
+            slots = [self.slots[self.targets[i]] for i in indices or range(len(loads))]
+            loads = [load / n for load, n in zip(loads, slots)]
+        if self.scheme is resourceaware:
+            loads = [
+                load + self.resource_pressure(self.targets[i])
+                for load, i in zip(loads, indices or range(len(loads)))
+            ]
         idx = self.scheme(loads)
         if indices:
             idx = indices[idx]
@@ -591,13 +690,38 @@ class TaskScheduler(Scheduler):
         self.add_job(idx)
         self.pending[target][job.msg_id] = job
         # notify Hub
-        content = dict(msg_id=job.msg_id, engine_id=target.decode('ascii'))
-        self.session.send(
-            self.mon_stream,
-            'task_destination',
-            content=content,
-            ident=[b'tracktask', self.ident],
-        )
+        if self.lightweight_monitoring:
+            self.queue_summary(
+                dict(
+                    topic='tracktask',
+                    msg_id=job.msg_id,
+                    engine_uuid=target.decode('ascii'),
+                )
+            )
+        else:
+            content = dict(msg_id=job.msg_id, engine_id=target.decode('ascii'))
+            self.session.send(
+                self.mon_stream,
+                'task_destination',
+                content=content,
+                ident=[b'tracktask', self.ident],
+            )
+
+    def resource_pressure(self, uid):
+        """Extra load for engine `uid`, from its latest resource sample
+
+        The load average of the engine's host (per cpu) counts as load,
+        and hosts above `memory_pressure_threshold` memory use are only chosen
+        when all engines are.
+        """
+        resources = self.resources.get(uid)
+        if not resources:
+            return 0
+        pressure = resources.get('load', 0)
+        if resources.get('mem', 0) >= self.memory_pressure_threshold:
+            # more than any task count, so only chosen if all engines are
+            pressure += 1e6
+        return pressure
 
     # -----------------------------------------------------------------------
     # Result Handling
@@ -610,17 +734,26 @@ class TaskScheduler(Scheduler):
             idents, msg = self.session.feed_identities(raw_msg, copy=False)
             msg = self.session.deserialize(msg, content=False, copy=False)
             engine = idents[0]
+            if msg['header']['msg_type'] == 'apply_reply_chunk':
+                # part of a large result, relay it to the client
+                raw_msg[:2] = [idents[1], engine]
+                self.client_stream.send_multipart(raw_msg, copy=False)
+                return
             try:
                 idx = self.targets.index(engine)
             except ValueError:
                 pass  # skip load-update for dead engines
             else:
                 self.finish_job(idx)
+            md = msg['metadata']
+            if 'resources' in md and engine in self.slots:
+                self.resources[engine] = md['resources']
+            if md.get('recycle') and engine in self.targets:
+                self.drain_engine(engine)
         except Exception:
             self.log.error("task::Invalid result: %r", raw_msg, exc_info=True)
             return
 
-        md = msg['metadata']
         parent = msg['parent_header']
         if md.get('dependencies_met', True):
             success = md['status'] == 'ok'
@@ -635,9 +768,10 @@ class TaskScheduler(Scheduler):
                 # relay to client and update graph
                 self.handle_result(idents, parent, raw_msg, success)
                 # send to Hub monitor
-                self.mon_stream.send_multipart([b'outtask'] + raw_msg, copy=False)
+                self.send_monitor(b'outtask', raw_msg, msg)
         else:
             self.handle_unmet_dependency(idents, parent)
+        self.maybe_recycle(engine)
 
     def handle_result(self, idents, parent, raw_msg, success=True):
         """handle a real task result, either success or failure"""
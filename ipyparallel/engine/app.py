@@ -50,6 +50,7 @@ from ipyparallel.apps.baseapp import (
 from ipyparallel.controller.heartmonitor import Heart
 from ipyparallel.util import disambiguate_ip_address, disambiguate_url
 
+from .dataserver import DataServer
 from .kernel import IPythonParallelKernel as Kernel
 from .log import EnginePUBHandler
 from .nanny import start_nanny
@@ -130,6 +131,67 @@ class IPEngine(BaseParallelApplication):
     """,
     )
 
+    task_slots = Integer(
+        1,
+        config=True,
+        help="""The number of tasks this engine runs at the same time.
+
+        With more than one slot, coroutine functions are awaited concurrently
+        on the engine's event loop, and other functions run in a pool of threads,
+        one per slot.
+        This keeps an engine busy while tasks wait for I/O,
+        without starting more engines.
+        The task scheduler assigns each engine up to one task per slot.
+
+        Concurrent tasks share the engine's namespace,
+        and only their stdout/stderr is reliably associated with the right task.
+
+        .. versionadded:: 9.1
+        """,
+    )
+
+    max_tasks = Integer(
+        0,
+        config=True,
+        help="""Recycle the engine after it has run this many tasks.
+
+        Like `maxtasksperchild` in multiprocessing,
+        this bounds the memory an engine can accumulate
+        (e.g. from leaky extension modules) over a long run.
+        A recycled engine is drained: the task scheduler stops assigning it tasks,
+        and once its assigned tasks have finished,
+        the engine process is replaced by a fresh one with the same engine id.
+
+        Recycling is coordinated by the task scheduler,
+        so it applies to load-balanced tasks
+        (and requires a scheme other than 'pure').
+        Only load-balanced tasks are drained:
+        DirectView requests still queued on the engine when it is replaced,
+        and results it holds for clients to fetch directly
+        (see `IPythonParallelKernel.direct_data_threshold`),
+        fail with an EngineError, as they would if the engine died.
+        It is not available with MPI.
+
+        0 (default) means no limit.
+
+        .. versionadded:: 9.1
+        """,
+    )
+
+    max_memory = Integer(
+        0,
+        config=True,
+        help="""Recycle the engine once its memory use exceeds this many bytes.
+
+        Memory use (resident set size) is checked after each task.
+        See `max_tasks` for how engines are recycled.
+
+        0 (default) means no limit.
+
+        .. versionadded:: 9.1
+        """,
+    )
+
     startup_script = Unicode(
         '', config=True, help='specify a script to be run at startup'
     )
@@ -199,6 +261,14 @@ class IPEngine(BaseParallelApplication):
         used for disambiguating URLs, to determine whether
         loopback should be used to connect or the public address.""",
     )
+    data_ip = Unicode(
+        config=True,
+        help="""The IP address on which to serve result data directly to clients.
+
+        Only used if IPythonParallelKernel.direct_data_threshold is set.
+        Defaults to localhost if the controller is on localhost,
+        and all interfaces otherwise.""",
+    )
     timeout = Float(
         5.0,
         config=True,
@@ -242,14 +312,19 @@ class IPEngine(BaseParallelApplication):
         help="""Code to execute in the user namespace when initializing MPI""",
     )
     mpi_registration_delay = Float(
-        0.02,
+        0,
         config=True,
         help="""Per-engine delay for mpiexec-launched engines
 
         avoids flooding the controller with registrations,
         which can stall under heavy load.
 
-        Default: .02 (50 engines/sec, or 3000 engines/minute)
+        The controller handles registrations in batches,
+        so there is no delay by default.
+        Older controllers may need e.g. .02 (50 engines/sec, or 3000 engines/minute).
+
+        .. versionchanged:: 9.1
+            Default changed from .02 to 0.
         """,
     )
 
@@ -545,7 +620,7 @@ class IPEngine(BaseParallelApplication):
         reg.IDENTITY = self.bident
         connect(reg, self.registration_url)
 
-        content = dict(uuid=self.ident)
+        content = dict(uuid=self.ident, slots=self.task_slots)
         if self.id is not None:
             self.log.info("Requesting id: %i", self.id)
             content['id'] = self.id
@@ -736,6 +811,10 @@ class IPEngine(BaseParallelApplication):
                 parent=self,
                 engine_id=self.id,
                 ident=self.ident,
+                task_slots=self.task_slots,
+                max_tasks=self.max_tasks,
+                max_memory=self.max_memory,
+                restart_engine=None if self.use_mpi else self.recycle,
                 session=self.session,
                 iopub_socket=iopub_socket,
                 user_ns=self.user_ns,
@@ -746,6 +825,8 @@ class IPEngine(BaseParallelApplication):
             self.kernel.shell.display_pub.topic = f"engine.{self.id}.displaypub".encode(
                 "ascii"
             )
+            if self.kernel.direct_data_threshold:
+                self.kernel.data_server = self.start_data_server()
 
             # FIXME: This is a hack until IPKernelApp and IPEngineApp can be fully merged
             app = self.kernel_app = IPKernelApp(
@@ -773,14 +854,47 @@ class IPEngine(BaseParallelApplication):
             self.log.fatal(f"Registration Failed: {msg}")
             raise Exception(f"Registration Failed: {msg}")
 
+        hb_ping_url, hb_pong_url = url('hb_ping'), url('hb_pong')
+        if info.get('hb_aggregator_ping'):
+            # spread engines across heart aggregators, like broadcast leaves
+            hb_index = self.id % len(info['hb_aggregator_ping'])
+            hb_ping_url = urls('hb_aggregator_ping')[hb_index]
+            hb_pong_url = urls('hb_aggregator_pong')[hb_index]
         self.start_heartbeat(
-            maybe_tunnel(url('hb_ping')),
-            maybe_tunnel(url('hb_pong')),
+            maybe_tunnel(hb_ping_url),
+            maybe_tunnel(hb_pong_url),
             content['hb_period'],
             identity,
         )
         self.log.info("Completed registration with id %i", self.id)
 
+    def start_data_server(self):
+        """Start serving large results directly to clients"""
+        if self.curve_serverkey:
+            self.log.warning("Direct result data does not support CURVE security")
+            return None
+        ip = self.data_ip
+        if not ip:
+            proto, controller_ip = self.connection_info['interface'].split('://')
+            ip = localhost() if controller_ip == localhost() else '*'
+        if not self.session.key and ip != localhost():
+            self.log.warning(
+                "Not serving result data on %s without a Session key to sign requests",
+                ip,
+            )
+            return None
+        data_server = DataServer(
+            self.context,
+            ip,
+            self.session,
+            ttl=self.kernel.direct_data_ttl,
+            max_bytes=self.kernel.direct_data_limit,
+            log=self.log,
+        )
+        data_server.start()
+        self.log.info("Serving result data on %s", data_server.url)
+        return data_server
+
     def start_nanny(self, control_url):
         self.log.info("Starting nanny")
         config = Config()
@@ -796,6 +910,49 @@ class IPEngine(BaseParallelApplication):
             config=config,
         )
 
+    def recycle(self):
+        """Replace this engine with a fresh process, keeping the engine id
+
+        The new process is started with :func:`os.execv`,
+        so it keeps the pid (and output) that launchers are watching.
+        """
+        if getattr(self, "nanny_pipe", None) is not None:
+            # stop the nanny without notifying the Hub
+            self.nanny_pipe.terminate()
+            self.nanny_pipe.wait()
+        if self.kernel.data_server is not None:
+            # clients still fetching held results will see the engine unregister
+            self.kernel.data_server.clear()
+        # unregister first, so the id is free for the new process
+        self.session.send(
+            self.registrar, "unregistration_request", content=dict(id=self.id)
+        )
+        self.wait_for_unregistration()
+        self.restore_output()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("--IPEngine.id=")]
+        argv = [sys.executable, "-m", "ipyparallel.engine", *args]
+        argv.append(f"--IPEngine.id={self.id}")
+        self.log.info("Starting fresh engine: %s", argv)
+        os.execv(sys.executable, argv)
+
+    def wait_for_unregistration(self):
+        """Wait for the Hub to acknowledge an unregistration_request"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.registrar.poll(int(remaining * 1000)):
+                self.log.warning(
+                    "No unregistration_reply after %is, re-registering anyway",
+                    self.timeout,
+                )
+                return
+            idents, msg = self.session.feed_identities(self.registrar.recv_multipart())
+            msg = self.session.deserialize(msg)
+            if msg['header']['msg_type'] == 'unregistration_reply':
+                return
+
     def start_heartbeat(self, hb_ping, hb_pong, hb_period, identity):
         """Start our heart beating"""
 
@@ -0,0 +1,127 @@
+"""Serving large results directly from engines to clients
+
+Result buffers larger than ``IPythonParallelKernel.direct_data_threshold``
+are held by the engine's DataServer,
+and the apply_reply only says where to fetch them.
+The client then fetches the buffers directly from the engine,
+so bulk data does not pass through the controller.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import socket
+import time
+from collections import OrderedDict
+from threading import Lock, Thread
+
+import zmq
+
+
+class DataServer(Thread):
+    """Thread serving held result buffers on a ROUTER socket
+
+    Clients send a signed ``data_request`` message with the msg_id,
+    and receive a ``data_reply`` with the held buffers,
+    or an 'error' status if no buffers are held for it.
+    Requests that fail the session's signature check are dropped.
+
+    Buffers are served once, and released as soon as they are sent.
+    Buffers that are not fetched within `ttl` seconds are released as well,
+    and no more than `max_bytes` are held at a time.
+    """
+
+    def __init__(self, context, ip, session, ttl=600, max_bytes=0, log=None):
+        super().__init__(daemon=True)
+        self.log = log
+        # separate digest history from the engine's session, used in another thread
+        self.session = session.clone()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.buffers = OrderedDict()
+        self._lock = Lock()
+        self.socket = context.socket(zmq.ROUTER)
+        self.socket.linger = 0
+        port = self.socket.bind_to_random_port(f"tcp://{ip}")
+        self.url = f"tcp://{ip}:{port}"
+        # for clients to disambiguate a url on all interfaces
+        self.location = socket.gethostname()
+
+    def hold(self, key, buffers):
+        """Hold `buffers` until a client asks for `key`
+
+        Returns False if holding them would exceed `max_bytes`,
+        in which case the buffers should be sent some other way.
+        """
+        nbytes = sum(memoryview(buf).nbytes for buf in buffers)
+        with self._lock:
+            if self.max_bytes and self.nbytes + nbytes > self.max_bytes:
+                return False
+            self.buffers[key] = (time.monotonic() + self.ttl, nbytes, buffers)
+            self.nbytes += nbytes
+        return True
+
+    def release(self, key):
+        """Stop holding the buffers for `key`, and return them"""
+        with self._lock:
+            entry = self.buffers.pop(key, None)
+            if entry is None:
+                return []
+            self.nbytes -= entry[1]
+            return entry[2]
+
+    def clear(self):
+        """Release all held buffers"""
+        with self._lock:
+            self.buffers.clear()
+            self.nbytes = 0
+
+    def expire(self):
+        """Release buffers that have been held for longer than `ttl`"""
+        now = time.monotonic()
+        with self._lock:
+            # entries are held in order of expiry
+            while self.buffers:
+                key, (deadline, nbytes, _) = next(iter(self.buffers.items()))
+                if deadline > now:
+                    break
+                self.buffers.popitem(last=False)
+                self.nbytes -= nbytes
+                if self.log:
+                    self.log.warning("Result data for %s expired unfetched", key)
+
+    def run(self):
+        poll_ms = int(1000 * min(self.ttl, 60))
+        while True:
+            try:
+                if not self.socket.poll(poll_ms):
+                    self.expire()
+                    continue
+                frames = self.socket.recv_multipart(copy=False)
+            except zmq.ContextTerminated:
+                self.socket.close()
+                return
+            self.expire()
+            try:
+                idents, msg = self.session.feed_identities(frames, copy=False)
+                msg = self.session.deserialize(msg, content=True, copy=False)
+                key = msg['content']['msg_id']
+            except Exception:
+                if self.log:
+                    self.log.error("Invalid request for result data", exc_info=True)
+                continue
+            buffers = self.release(key)
+            if buffers:
+                content = {'status': 'ok', 'msg_id': key}
+            else:
+                if self.log:
+                    self.log.warning("No result data held for %s", key)
+                content = {'status': 'error', 'msg_id': key}
+            self.session.send(
+                self.socket,
+                'data_reply',
+                content,
+                parent=msg,
+                ident=idents,
+                buffers=buffers,
+            )
@@ -1,11 +1,16 @@
 """IPython kernel for parallel computing"""
 
 import asyncio
+import contextvars
 import inspect
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
+import psutil
 from ipykernel.ipkernel import IPythonKernel
-from traitlets import Integer, Set, Type
+from traitlets import Bool, Callable, Float, Instance, Integer, Set, Type
 
 from ipyparallel.serialize import serialize_object, unpack_apply_message
 from ipyparallel.util import utcnow
@@ -24,7 +29,10 @@ class IPythonParallelKernel(IPythonKernel):
     def int_id(self):
         return self.engine_id
 
-    msg_types = getattr(IPythonKernel, 'msg_types', []) + ['apply_request']
+    msg_types = getattr(IPythonKernel, 'msg_types', []) + [
+        'apply_request',
+        'recycle_request',
+    ]
     control_msg_types = getattr(IPythonKernel, 'control_msg_types', []) + [
         'abort_request',
         'clear_request',
@@ -32,6 +40,95 @@ class IPythonParallelKernel(IPythonKernel):
     _execute_sleep = 0
     data_pub_class = Type(ZMQDataPublisher)
 
+    result_chunk_size = Integer(
+        0,
+        config=True,
+        help="""Maximum size (in bytes) of a result buffer sent in one message.
+
+        Larger result buffers are sent as a sequence of `apply_reply_chunk` messages
+        ahead of the apply_reply, so that the schedulers and the client
+        never have to hold a whole result in a single message.
+        The client reassembles the chunks into one buffer as they arrive.
+
+        Chunked results are not stored in the Hub's database.
+        0 (default) sends every result in a single message.
+        """,
+    )
+
+    direct_data_threshold = Integer(
+        0,
+        config=True,
+        help="""Size (in bytes) above which result buffers are served directly.
+
+        Larger result buffers are held by the engine,
+        and the client fetches them directly from the engine,
+        instead of them being relayed through the controller with the apply_reply.
+        The engine listens for these requests on `IPEngine.data_ip`.
+
+        Results served directly are not stored in the Hub's database.
+        0 (default) relays every result through the controller.
+        """,
+    )
+    direct_data_ttl = Float(
+        600,
+        config=True,
+        help="""Time (in seconds) to hold result buffers for clients to fetch directly.
+
+        Held buffers that no client has fetched in this time are released,
+        e.g. because the client has gone away.
+        """,
+    )
+    direct_data_limit = Integer(
+        1 << 30,
+        config=True,
+        help="""Maximum total size (in bytes) of result buffers held for clients to fetch.
+
+        Results that would exceed this limit are relayed through the controller instead.
+        0 means no limit.
+        """,
+    )
+    resource_sample_interval = Float(
+        1,
+        config=True,
+        help="""Minimum time (in seconds) between samples of the engine's resource use.
+
+        A sample of the engine's memory and cpu use,
+        and of the load and memory use of its host,
+        is attached to reply metadata as `resources`,
+        where the Hub and the 'resourceaware' task scheduler can use it.
+        Replies sent within this interval share the same sample.
+        0 disables resource samples.
+
+        .. versionadded:: 9.1
+        """,
+    )
+    _resource_sample = None
+    _resource_sample_time = 0
+    _process = None
+
+    data_server = Instance("ipyparallel.engine.dataserver.DataServer", allow_none=True)
+
+    task_slots = Integer(
+        1,
+        help="""Number of apply requests to run at the same time (set by IPEngine)""",
+    )
+    _free_slots = None
+    _slot_pool = None
+
+    max_tasks = Integer(
+        0, help="""Number of apply requests to run before recycling (set by IPEngine)"""
+    )
+    max_memory = Integer(
+        0, help="""Memory use (in bytes) at which to recycle (set by IPEngine)"""
+    )
+    restart_engine = Callable(
+        None,
+        allow_none=True,
+        help="""Replaces the engine process with a fresh one (set by IPEngine)""",
+    )
+    tasks_run = Integer(0)
+    draining = Bool(False)
+
     def _topic(self, topic):
         """prefixed topic for IOPub messages"""
         return f"engine.{self.engine_id}.{topic}".encode()
@@ -40,12 +137,14 @@ class IPythonParallelKernel(IPythonKernel):
         super().__init__(**kwargs)
         # add apply_request, in anticipation of upstream deprecation
         self.shell_handlers['apply_request'] = self.apply_request
+        self.shell_handlers['recycle_request'] = self.recycle_request
         # set up data pub
         data_pub = self.shell.data_pub = self.data_pub_class(parent=self)
         self.shell.configurables.append(data_pub)
         data_pub.session = self.session
         data_pub.pub_socket = self.iopub_socket
         self.aborted = set()
+        self._slot_tasks = set()
 
     def should_handle(self, stream, msg, idents):
         """Check whether a shell-channel message should be handled
@@ -63,6 +162,12 @@ class IPythonParallelKernel(IPythonKernel):
             if inspect.isawaitable(f):
                 asyncio.ensure_future(f)
             return False
+        if msg_type == 'apply_request' and self.task_slots > 1:
+            # handled here rather than by a shell handler,
+            # after which idle would be published while the request is still running
+            self.log.info(f"Handling {msg_type} in a task slot: {msg_id}")
+            self.start_in_slot(stream, idents, msg)
+            return False
         self.log.info(f"Handling {msg_type}: {msg_id}")
         return True
 
@@ -88,9 +193,38 @@ class IPythonParallelKernel(IPythonKernel):
             if reply_content['ename'] == 'UnmetDependency':
                 metadata['dependencies_met'] = False
             metadata['engine_info'] = self.get_engine_info()
+        if self.resource_sample_interval:
+            metadata['resources'] = self.sample_resources()
 
         return metadata
 
+    def sample_resources(self):
+        """Return a compact sample of this engine's resource use
+
+        Samples are cached for `resource_sample_interval` seconds.
+
+        - rss: resident memory of the engine (bytes)
+        - cpu: cpu use of the engine since the previous sample (percent)
+        - load: 1-minute load average of the host, per cpu
+        - mem: fraction of the host's memory in use
+        """
+        now = time.monotonic()
+        if (
+            self._resource_sample is not None
+            and now - self._resource_sample_time < self.resource_sample_interval
+        ):
+            return self._resource_sample
+        if self._process is None:
+            self._process = psutil.Process()
+        self._resource_sample = {
+            'rss': self._process.memory_info().rss,
+            'cpu': round(self._process.cpu_percent(), 1),
+            'load': round(psutil.getloadavg()[0] / (psutil.cpu_count() or 1), 3),
+            'mem': round(psutil.virtual_memory().percent / 100, 3),
+        }
+        self._resource_sample_time = now
+        return self._resource_sample
+
     def get_engine_info(self, method=None):
         """Return engine_info dict"""
         engine_info = dict(
@@ -117,6 +251,74 @@ class IPythonParallelKernel(IPythonKernel):
         finally:
             self.shell_is_blocking = False
 
+        self.send_apply_reply(stream, ident, parent, reply_content, result_buf, md)
+
+    def start_in_slot(self, stream, ident, parent):
+        """Run an apply request in a task slot, once one is free
+
+        Requests wait for a free slot in the order they arrived.
+        busy is published when the request arrives, idle when it finishes.
+        """
+        task = asyncio.ensure_future(self._run_in_slot(stream, ident, parent))
+        self._slot_tasks.add(task)
+        task.add_done_callback(self._slot_tasks.discard)
+
+    async def _run_in_slot(self, stream, ident, parent):
+        if self._free_slots is None:
+            self._free_slots = asyncio.Semaphore(self.task_slots)
+        try:
+            async with self._free_slots:
+                msg_id = parent['header']['msg_id']
+                if msg_id in self.aborted:
+                    # aborted while waiting for a slot
+                    self.aborted.remove(msg_id)
+                    f = self._send_abort_reply(stream, parent, ident)
+                    if inspect.isawaitable(f):
+                        await f
+                    return
+                md = self.init_metadata(parent)
+                reply_content, result_buf = await self.do_apply_async(
+                    parent['buffers'], parent
+                )
+                self.send_apply_reply(
+                    stream, ident, parent, reply_content, result_buf, md
+                )
+        except Exception:
+            self.log.error("Error handling apply_request: %s", parent, exc_info=True)
+        finally:
+            self.session.send(
+                self.iopub_socket,
+                "status",
+                {"execution_state": "idle"},
+                parent=parent,
+                ident=self._topic("status"),
+            )
+
+    def send_apply_reply(self, stream, ident, parent, reply_content, result_buf, md):
+        """Send the apply_reply for a finished request"""
+        msg_id = parent['header']['msg_id']
+        if not md['is_coalescing']:
+            # clients that can't reach my data_server say so in the request
+            direct = parent['metadata'].get('direct_data', True)
+            if self.data_server is not None and direct:
+                result_buf = self.hold_result_buffers(msg_id, result_buf, md)
+            if self.result_chunk_size:
+                result_buf = self.send_result_chunks(
+                    stream, ident, parent, result_buf, md
+                )
+
+        self.tasks_run += 1
+        if not self.draining and self.should_recycle():
+            self.log.info(
+                "Engine %i will be recycled after %i tasks",
+                self.engine_id,
+                self.tasks_run,
+            )
+            self.draining = True
+        if self.draining:
+            # tell the task scheduler to stop assigning me tasks
+            md['recycle'] = True
+
         # put 'ok'/'error' status in header, for scheduler introspection:
         md = self.finish_metadata(parent, md, reply_content)
 
@@ -134,77 +336,219 @@ class IPythonParallelKernel(IPythonKernel):
             metadata=md,
         )
 
+    def should_recycle(self):
+        """Whether this engine has reached max_tasks or max_memory"""
+        if self.restart_engine is None:
+            return False
+        if self.max_tasks and self.tasks_run >= self.max_tasks:
+            return True
+        if self.max_memory and psutil.Process().memory_info().rss >= self.max_memory:
+            return True
+        return False
+
+    async def recycle_request(self, stream, ident, parent):
+        """Replace the engine once the task scheduler has no more tasks for it
+
+        Sent by the task scheduler when all tasks it assigned to a draining engine
+        have finished.
+        """
+        if not self.draining:
+            self.log.warning("Ignoring recycle_request, engine is not draining")
+            return
+        if self._slot_tasks:
+            # let requests still running in task slots finish
+            await asyncio.wait(list(self._slot_tasks))
+        self.log.info("Recycling engine %i", self.engine_id)
+        self.restart_engine()
+
+    def hold_result_buffers(self, msg_id, buffers, metadata):
+        """Hold result buffers larger than direct_data_threshold in my data_server
+
+        Held buffers are replaced by empty placeholders in the apply_reply,
+        and metadata['direct_buffers'] tells the client where to fetch them.
+        If the data_server is full, the buffers are sent with the apply_reply.
+
+        Returns the buffers to send with the apply_reply.
+        """
+        threshold = self.direct_data_threshold
+        reply_buffers = []
+        held = {}
+        for index, buf in enumerate(buffers):
+            if memoryview(buf).nbytes > threshold:
+                held[index] = buf
+                reply_buffers.append(b'')
+            else:
+                reply_buffers.append(buf)
+        if held:
+            if not self.data_server.hold(msg_id, list(held.values())):
+                return buffers
+            metadata['direct_buffers'] = {
+                'url': self.data_server.url,
+                'location': self.data_server.location,
+                'indices': list(held),
+            }
+        return reply_buffers
+
+    def send_result_chunks(self, stream, ident, parent, buffers, metadata):
+        """Send result buffers larger than result_chunk_size in chunks
+
+        Each chunk is sent as an `apply_reply_chunk` message,
+        and the buffer is replaced by an empty placeholder in the apply_reply.
+        The indices of chunked buffers are recorded in metadata['chunked_buffers'].
+
+        Returns the buffers to send with the apply_reply.
+        """
+        chunk_size = self.result_chunk_size
+        reply_buffers = []
+        chunked = []
+        for index, buf in enumerate(buffers):
+            view = memoryview(buf)
+            if view.nbytes <= chunk_size or not view.c_contiguous:
+                reply_buffers.append(buf)
+                continue
+            view = view.cast('B')
+            for offset in range(0, view.nbytes, chunk_size):
+                self.session.send(
+                    stream,
+                    'apply_reply_chunk',
+                    {'buffer': index, 'offset': offset, 'nbytes': view.nbytes},
+                    parent=parent,
+                    ident=ident,
+                    buffers=[view[offset : offset + chunk_size]],
+                    metadata=metadata,
+                )
+            chunked.append(index)
+            reply_buffers.append(b'')
+        if chunked:
+            metadata['chunked_buffers'] = chunked
+        return reply_buffers
+
     def do_apply(self, content, bufs, msg_id, reply_metadata):
-        shell = self.shell
         try:
-            working = shell.user_ns
-
-            prefix = f"_{str(msg_id).replace('-', '_')}_"
-
-            f, args, kwargs = unpack_apply_message(bufs, working, copy=False)
-
-            fname = prefix + "f"
-            argname = prefix + "args"
-            kwargname = prefix + "kwargs"
-            resultname = prefix + "result"
-
-            ns = {fname: f, argname: args, kwargname: kwargs, resultname: None}
-            # print ns
-            working.update(ns)
-            code = f"{resultname} = {fname}(*{argname}, **{kwargname})"
-            try:
-                exec(code, shell.user_global_ns, shell.user_ns)
-                result = working.get(resultname)
-            finally:
-                for key in ns:
-                    try:
-                        working.pop(key)
-                    except KeyError:
-                        self.log.warning(
-                            f"Failed to undefine temporary apply variable {key}, already undefined"
-                        )
-
-            result_buf = serialize_object(
-                result,
-                buffer_threshold=self.session.buffer_threshold,
-                item_threshold=self.session.item_threshold,
-            )
-
+            # functions are unpacked with the user namespace as globals
+            # where they need it (e.g. `interactive` functions),
+            # so they can be called directly
+            f, args, kwargs = unpack_apply_message(bufs, self.shell.user_ns, copy=False)
+            result = f(*args, **kwargs)
+            result_buf = self.serialize_result(result)
         except BaseException as e:
-            # invoke IPython traceback formatting
-            # this sends the 'error' message
-            try:
-                shell.showtraceback()
-            except Exception as tb_error:
-                self.log.error(f"Failed to show traceback for {e}: {tb_error}")
-
-            try:
-                str_evalue = str(e)
-            except Exception as str_error:
-                str_evalue = f"Failed to cast exception to string: {str_error}"
-            reply_content = {
-                'traceback': [],
-                'ename': str(type(e).__name__),
-                'evalue': str_evalue,
-            }
-            # get formatted traceback, which ipykernel recorded
-            if hasattr(shell, '_last_traceback'):
-                # ipykernel 4.4
-                reply_content['traceback'] = shell._last_traceback or []
+            return self.apply_error_reply(e), []
+        else:
+            return {'status': 'ok'}, result_buf
+
+    async def do_apply_async(self, bufs, parent):
+        """Run an apply request in a task slot
+
+        Coroutine functions are awaited on the kernel's event loop,
+        other functions run in a thread from a pool with one thread per slot.
+        Both run in a copy of the request's context,
+        so their output is associated with the right request.
+        """
+        try:
+            f, args, kwargs = unpack_apply_message(bufs, self.shell.user_ns, copy=False)
+            if inspect.iscoroutinefunction(f):
+                result = await f(*args, **kwargs)
             else:
-                self.log.warning("Didn't find a traceback where I expected to")
-            shell._last_traceback = None
-            reply_content["engine_info"] = self.get_engine_info(method="apply")
+                if self._slot_pool is None:
+                    self._slot_pool = ThreadPoolExecutor(
+                        self.task_slots, thread_name_prefix="ipp-task-slot"
+                    )
+                context = contextvars.copy_context()
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self._slot_pool, partial(context.run, f, *args, **kwargs)
+                )
+            result_buf = self.serialize_result(result)
+        except BaseException as e:
+            return self.apply_error_reply(e, parent), []
+        else:
+            return {'status': 'ok'}, result_buf
+
+    def serialize_result(self, result):
+        """Serialize the result of an apply request into buffers"""
+        return serialize_object(
+            result,
+            buffer_threshold=self.session.buffer_threshold,
+            item_threshold=self.session.item_threshold,
+        )
 
-            self.log.info(
-                "Exception in apply request:\n%s", '\n'.join(reply_content['traceback'])
+    def apply_error_reply(self, e, parent=None):
+        """Build the reply content for an apply request that raised `e`
+
+        Also publishes the formatted traceback as an 'error' message.
+
+        Without `parent`, `e` is being handled by the shell's own request
+        and goes through `shell.showtraceback`,
+        so custom exception handlers, `%debug` and `%pdb` work as for execute requests.
+        Requests running in task slots pass their `parent`,
+        and the traceback is formatted from `e` itself,
+        because the shell's exception state is shared by all slots.
+        """
+        try:
+            str_evalue = str(e)
+        except Exception as str_error:
+            str_evalue = f"Failed to cast exception to string: {str_error}"
+        reply_content = {
+            'traceback': [],
+            'ename': str(type(e).__name__),
+            'evalue': str_evalue,
+        }
+        if parent is None:
+            reply_content['traceback'] = self._show_traceback(e)
+        else:
+            reply_content['traceback'] = self._format_traceback(e)
+            # try to preserve ordering of tracebacks and print statements
+            sys.stdout.flush()
+            sys.stderr.flush()
+            self.session.send(
+                self.iopub_socket,
+                "error",
+                dict(reply_content),
+                parent=parent,
+                ident=self._topic("error"),
             )
-            result_buf = []
-            reply_content['status'] = 'error'
+        reply_content["engine_info"] = self.get_engine_info(method="apply")
+
+        self.log.info(
+            "Exception in apply request:\n%s", '\n'.join(reply_content['traceback'])
+        )
+        reply_content['status'] = 'error'
+        return reply_content
+
+    def _show_traceback(self, e):
+        """Show the traceback of the exception being handled via the shell
+
+        Returns the formatted traceback.
+        """
+        shell = self.shell
+        # invoke IPython traceback formatting
+        # this sends the 'error' message
+        try:
+            if isinstance(e, shell.custom_exceptions):
+                # handlers registered with shell.set_custom_exc, as in run_code
+                shell.CustomTB(type(e), e, e.__traceback__)
+            else:
+                shell.showtraceback()
+        except Exception as tb_error:
+            self.log.error(f"Failed to show traceback for {e}: {tb_error}")
+        # get formatted traceback, which ipykernel recorded
+        if hasattr(shell, '_last_traceback'):
+            # ipykernel 4.4
+            traceback = shell._last_traceback or []
         else:
-            reply_content = {'status': 'ok'}
+            self.log.warning("Didn't find a traceback where I expected to")
+            traceback = []
+        shell._last_traceback = None
+        return traceback
 
-        return reply_content, result_buf
+    def _format_traceback(self, e):
+        """Format the traceback of `e`, without touching the shell's state"""
+        try:
+            return self.shell.InteractiveTB.structured_traceback(
+                type(e), e, e.__traceback__
+            )
+        except Exception as tb_error:
+            self.log.error(f"Failed to format traceback for {e}: {tb_error}")
+            return []
 
     async def do_execute(self, *args, **kwargs):
         super_execute = super().do_execute(*args, **kwargs)
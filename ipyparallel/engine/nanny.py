@@ -258,6 +258,86 @@ class KernelNanny:
             self.log.debug("exiting")
 
 
+class ForkedNanny:
+    """Popen-like handle on a nanny process forked ahead of time
+
+    Used by engines started from a fork server,
+    so that starting the nanny doesn't import everything again
+    in a fresh Python process.
+    The forked process waits for its arguments on stdin, like `python -m nanny`.
+    """
+
+    def __init__(self):
+        child_stdin, stdin = os.pipe()
+        stdout, child_stdout = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.pid = os.fork()
+        if self.pid == 0:
+            os.setsid()  # don't inherit signals
+            os.close(stdin)
+            os.close(stdout)
+            os.dup2(child_stdin, 0)
+            os.dup2(child_stdout, 1)
+            # the nanny url is written to stdout, like PYTHONUNBUFFERED
+            sys.stdout.reconfigure(line_buffering=True)
+            exit_code = 0
+            try:
+                main()
+            except EOFError:
+                # engine exited without starting its nanny
+                pass
+            except BaseException:
+                exit_code = 1
+                raise
+            finally:
+                os._exit(exit_code)
+        os.close(child_stdin)
+        os.close(child_stdout)
+        self.stdin = os.fdopen(stdin, "wb")
+        self.stdout = os.fdopen(stdout, "rb")
+        self.returncode = None
+
+    def _set_returncode(self, status):
+        if os.WIFSIGNALED(status):
+            self.returncode = -os.WTERMSIG(status)
+        else:
+            self.returncode = os.WEXITSTATUS(status)
+
+    def poll(self):
+        if self.returncode is None:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+            if pid:
+                self._set_returncode(status)
+        return self.returncode
+
+    def wait(self):
+        if self.returncode is None:
+            pid, status = os.waitpid(self.pid, 0)
+            self._set_returncode(status)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.poll() is None:
+            os.kill(self.pid, sig)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+
+_forked_nanny = None
+
+
+def fork_nanny():
+    """Fork the nanny process for this engine ahead of time
+
+    The next call to :func:`start_nanny` will use it,
+    instead of starting a new Python process.
+    """
+    global _forked_nanny
+    _forked_nanny = ForkedNanny()
+
+
 def start_nanny(**kwargs):
     """Start a nanny subprocess
 
@@ -268,18 +348,23 @@ def start_nanny(**kwargs):
       The proxied URL the engine's control socket should connect to,
       instead of connecting directly to the control Scheduler.
     """
+    global _forked_nanny
 
     kwargs['pid'] = os.getpid()
 
-    env = os.environ.copy()
-    env['PYTHONUNBUFFERED'] = '1'
-    p = Popen(
-        [sys.executable, '-m', __name__],
-        stdin=PIPE,
-        stdout=PIPE,
-        env=env,
-        start_new_session=True,  # don't inherit signals
-    )
+    if _forked_nanny is not None:
+        p = _forked_nanny
+        _forked_nanny = None
+    else:
+        env = os.environ.copy()
+        env['PYTHONUNBUFFERED'] = '1'
+        p = Popen(
+            [sys.executable, '-m', __name__],
+            stdin=PIPE,
+            stdout=PIPE,
+            env=env,
+            start_new_session=True,  # don't inherit signals
+        )
     p.stdin.write(pickle.dumps(kwargs))
     p.stdin.close()
     out = p.stdout.readline()
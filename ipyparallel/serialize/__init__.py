@@ -15,6 +15,7 @@ from .serialize import (
     serialize_object,
     unpack_apply_message,
 )
+from .sharedmem import use_shared_memory
 
 __all__ = (
     'Reference',
@@ -26,6 +27,7 @@ __all__ = (
     'use_dill',
     'use_cloudpickle',
     'use_pickle',
+    'use_shared_memory',
     'serialize_object',
     'deserialize_object',
     'pack_apply_message',
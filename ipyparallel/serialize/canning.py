@@ -11,7 +11,10 @@ from types import FunctionType
 from traitlets import import_item
 from traitlets.log import get_logger
 
-from . import codeutil  # noqa This registers a hook when it's imported
+from . import (
+    codeutil,  # noqa This registers a hook when it's imported
+    sharedmem,
+)
 
 
 def _get_cell_type(a=None):
@@ -341,11 +344,18 @@ class CannedArray(CannedObject):
             # ensure contiguous
             obj = ascontiguousarray(obj, dtype=None)
             self.buffers = [memoryview(obj)]
+            # large arrays may be passed in shared memory, sending only a handle
+            self.shared_memory = sharedmem.share(self.buffers[0])
+            if self.shared_memory:
+                self.buffers = []
 
     def get_object(self, g=None):
         from numpy import frombuffer
 
-        data = self.buffers[0]
+        if getattr(self, 'shared_memory', None):
+            data = sharedmem.attach(self.shared_memory)
+        else:
+            data = self.buffers[0]
         if self.pickled:
             from . import serialize
 
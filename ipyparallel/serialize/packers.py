@@ -0,0 +1,115 @@
+"""Message packers for Session
+
+Headers, metadata and content of every message are packed by the Session.
+A binary packer (msgpack) or a fast JSON implementation (orjson)
+takes a fraction of the CPU time of the standard library json module.
+
+The packer is chosen when the controller starts (``ipcontroller --packer=msgpack``)
+and written to the connection files as an import string,
+so engines and clients use the same packer.
+
+Timestamps are packed as ISO8601 strings by all packers,
+as with json, so date handling is the same for every packer.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+from jupyter_client.jsonutil import json_default
+from jupyter_client.session import json_packer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def msgpack_packer(obj):
+    """Pack a message with msgpack"""
+    return msgpack.packb(obj, default=json_default)
+
+
+def msgpack_unpacker(buf):
+    """Unpack a message packed with msgpack
+
+    Allows non-str keys, such as int engine ids.
+    """
+    return msgpack.unpackb(buf, strict_map_key=False)
+
+
+if orjson is not None:
+    _orjson_options = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+else:
+    _orjson_options = 0
+
+
+def orjson_packer(obj):
+    """Pack a message with orjson, falling back on json for unsupported values"""
+    try:
+        return orjson.dumps(obj, default=json_default, option=_orjson_options)
+    except (TypeError, ValueError):
+        return json_packer(obj)
+
+
+def orjson_unpacker(buf):
+    """Unpack a JSON message with orjson"""
+    return orjson.loads(buf)
+
+
+# name: (module attribute required, packer, unpacker)
+_packers = {
+    'json': (None, 'json', 'json'),
+    'orjson': (
+        orjson,
+        f'{__name__}.orjson_packer',
+        f'{__name__}.orjson_unpacker',
+    ),
+    'msgpack': (
+        msgpack,
+        f'{__name__}.msgpack_packer',
+        f'{__name__}.msgpack_unpacker',
+    ),
+}
+
+
+def available_packers():
+    """Return the names of the packers that can be used"""
+    return [
+        name
+        for name, (module, packer, unpacker) in _packers.items()
+        if name == 'json' or module is not None
+    ]
+
+
+def resolve_packer(name):
+    """Resolve a packer name to Session (packer, unpacker) import names
+
+    `name` may be 'json', 'orjson', 'msgpack',
+    or 'auto' to pick the fastest available of msgpack, orjson and json.
+    """
+    if name == 'auto':
+        for name in ('msgpack', 'orjson', 'json'):
+            if name in available_packers():
+                break
+    if name not in _packers:
+        raise ValueError(
+            f"Unknown packer {name!r}, expected one of {', '.join(_packers)}, or auto"
+        )
+    if name not in available_packers():
+        raise ValueError(f"packer {name!r} requires the {name} package")
+    module, packer, unpacker = _packers[name]
+    return packer, unpacker
+
+
+__all__ = [
+    'available_packers',
+    'msgpack_packer',
+    'msgpack_unpacker',
+    'orjson_packer',
+    'orjson_unpacker',
+    'resolve_packer',
+]
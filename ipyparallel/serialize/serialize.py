@@ -14,6 +14,7 @@ from itertools import chain
 
 from jupyter_client.session import MAX_BYTES, MAX_ITEMS
 
+from . import sharedmem
 from .canning import (
     CannedObject,
     can,
@@ -37,7 +38,9 @@ class PrePickled:
     """
 
     def __init__(self, obj):
-        self.buffers = serialize_object(obj)
+        # shared memory segments are owned by whoever sends the buffers
+        with sharedmem.collect() as self.shared_memory:
+            self.buffers = serialize_object(obj)
 
 
 def _nbytes(buf):
@@ -94,6 +97,7 @@ def serialize_object(obj, buffer_threshold=MAX_BYTES, item_threshold=MAX_ITEMS):
     [bufs] : list of buffers representing the serialized object.
     """
     if isinstance(obj, PrePickled):
+        sharedmem.collected(obj.shared_memory)
         return obj.buffers[:]
     buffers = []
     if istype(obj, sequence_types) and len(obj) < item_threshold:
@@ -0,0 +1,276 @@
+"""Passing large arrays between processes on the same host through shared memory
+
+When enabled with :func:`use_shared_memory`,
+arrays of at least `threshold` bytes are copied into a POSIX shared memory segment
+when they are canned, and only a handle to the segment is sent in the message.
+The receiver maps the segment, and the array it gets is a read-only view
+of the shared memory, without copying the data again.
+
+Each segment is unlinked by one process:
+
+- segments created while serializing a request in the client (inside :func:`collect`)
+  are reference-counted by the client, one reference for each message carrying them,
+  and unlinked once the replies to all of those messages have arrived
+- other segments (e.g. results) have a single receiver,
+  which unlinks them as soon as it has mapped them.
+  Their creator keeps them registered with its resource tracker
+  until it sees they have been unlinked,
+  and unlinks them itself if they are not received within `ttl` seconds
+  (e.g. because the receiver has gone away),
+  or when it exits.
+
+Mapped segments stay valid after they are unlinked,
+and are unmapped when the last array using them is released.
+
+Shared memory only works if all processes involved are on the same host.
+Records in the Hub's database contain only the handles,
+so messages cannot be resubmitted once their segments have been unlinked.
+"""
+
+# Copyright (c) IPython Development Team.
+# Distributed under the terms of the Modified BSD License.
+import atexit
+import os
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+# arrays of at least this many bytes are passed in shared memory (0: disabled)
+_threshold = 0
+# seconds to wait for a single receiver to unlink a segment
+_ttl = 600
+
+_local = threading.local()
+_lock = threading.Lock()
+# name: [SharedMemory, references] for segments unlinked by this process
+_segments = {}
+# segments mapped by attach, closed once nothing uses them
+_attached = []
+# name: (SharedMemory, deadline) for segments handed off to a single receiver
+_handoffs = {}
+_last_expire = 0
+
+
+def use_shared_memory(threshold=1_000_000, ttl=600):
+    """Pass arrays of at least `threshold` bytes through shared memory
+
+    Only use this if the processes exchanging arrays are on the same host.
+    0 disables shared memory.
+    Segments handed off to a single receiver (e.g. results)
+    are unlinked by their creator if not received within `ttl` seconds.
+
+    Not available on Windows.
+    """
+    if threshold and os.name == "nt":
+        raise NotImplementedError("Shared memory arrays are not available on Windows")
+    global _threshold, _ttl
+    _threshold = threshold
+    _ttl = ttl
+
+
+class _SharedMemory(SharedMemory):
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            # still used by arrays at exit
+            pass
+
+
+def _shared_memory(name=None, size=0, track=True):
+    """Create or open a SharedMemory segment
+
+    Untracked segments are not unlinked by the resource tracker at exit,
+    because another process is responsible for them.
+    """
+    try:
+        return _SharedMemory(name, create=name is None, size=size, track=track)
+    except TypeError:
+        # Python < 3.13, always tracked
+        shm = _SharedMemory(name, create=name is None, size=size)
+        if not track:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class collect:
+    """Context manager collecting the names of segments created in this thread
+
+    Segments created inside `collect` are unlinked by their creator
+    (see :func:`retain` and :func:`release`) instead of by their receiver.
+    """
+
+    def __enter__(self):
+        self.names = []
+        _collectors().append(self.names)
+        return self.names
+
+    def __exit__(self, *exc_info):
+        _collectors().pop()
+
+
+def _collectors():
+    if not hasattr(_local, "collectors"):
+        _local.collectors = []
+    return _local.collectors
+
+
+def collected(names):
+    """Add segments created earlier (e.g. by a PrePickled object) to the collection"""
+    collectors = _collectors()
+    if collectors:
+        collectors[-1].extend(names)
+
+
+def share(buf):
+    """Copy `buf` into a new shared memory segment
+
+    Returns the handle to send in its place, or None if `buf` is too small.
+    """
+    nbytes = buf.nbytes
+    if not _threshold or nbytes < _threshold:
+        return None
+    collectors = _collectors()
+    owned = bool(collectors)
+    expire_handoffs()
+    shm = _shared_memory(size=nbytes)
+    shm.buf[:nbytes] = buf.cast("B")
+    shm.close()
+    with _lock:
+        if owned:
+            _segments[shm.name] = [shm, 0]
+        else:
+            _handoffs[shm.name] = (shm, time.monotonic() + _ttl)
+    if owned:
+        collectors[-1].append(shm.name)
+    return {"name": shm.name, "nbytes": nbytes, "unlink": not owned}
+
+
+def _exists(shm):
+    """Whether the segment `shm` has not been unlinked yet
+
+    Checked without SharedMemory, which would register it with the resource tracker.
+    """
+    import _posixshmem
+
+    try:
+        fd = _posixshmem.shm_open(shm._name, os.O_RDONLY, mode=0o600)
+    except FileNotFoundError:
+        return False
+    os.close(fd)
+    return True
+
+
+def expire_handoffs(force=False):
+    """Clean up segments handed off to a single receiver
+
+    Segments their receiver has unlinked are no longer tracked,
+    and segments not received in time (or all of them, if `force`) are unlinked.
+    Called when a segment is handed off (at most once per second), and at exit.
+    """
+    global _last_expire
+    now = time.monotonic()
+    with _lock:
+        if not force and now - _last_expire < 1:
+            return
+        _last_expire = now
+        handoffs = list(_handoffs.items())
+    for name, (shm, deadline) in handoffs:
+        if not _exists(shm):
+            # received: the receiver has unlinked it
+            resource_tracker.unregister(shm._name, "shared_memory")
+        elif force or deadline <= now:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                resource_tracker.unregister(shm._name, "shared_memory")
+        else:
+            continue
+        with _lock:
+            _handoffs.pop(name, None)
+
+
+def attach(handle):
+    """Map the segment described by `handle`
+
+    Returns a read-only memoryview of its data.
+    The segment is unmapped when the memoryview (and everything using it) is released.
+    """
+    name = handle["name"]
+    unlink = handle["unlink"]
+    with _lock:
+        # segments created by this process are already tracked by it,
+        # and untracked when they are unlinked
+        created = name in _segments or name in _handoffs
+        if unlink:
+            # handed off within this process, unlinked (and untracked) right here
+            _handoffs.pop(name, None)
+    try:
+        shm = _shared_memory(name, track=unlink or created)
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"Shared memory segment {name} is no longer available"
+        ) from None
+    if unlink:
+        shm.unlink()
+    view = shm.buf[: handle["nbytes"]].toreadonly()
+    with _lock:
+        _close_unused()
+        _attached.append(shm)
+    return view
+
+
+def _close_unused():
+    """Unmap attached segments no longer used by any array"""
+    in_use = []
+    for shm in _attached:
+        try:
+            shm.close()
+        except BufferError:
+            # still used
+            in_use.append(shm)
+    _attached[:] = in_use
+
+
+def retain(names):
+    """Add a reference to segments created by this process, e.g. for a sent message"""
+    with _lock:
+        for name in names:
+            if name in _segments:
+                _segments[name][1] += 1
+
+
+def release(names):
+    """Remove a reference to segments, unlinking those with no references left"""
+    with _lock:
+        unlink = []
+        for name in names:
+            segment = _segments.get(name)
+            if segment is None:
+                continue
+            segment[1] -= 1
+            if segment[1] <= 0:
+                unlink.append(_segments.pop(name)[0])
+    for shm in unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+@atexit.register
+def _unlink_all():
+    """Unlink segments still waiting for their references to be released
+
+    and segments never received by their receiver.
+    """
+    with _lock:
+        segments = list(_segments.values())
+        _segments.clear()
+    for shm, _ in segments:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+    expire_handoffs(force=True)
@@ -0,0 +1,97 @@
+"""Tests for AsyncClient"""
+
+import asyncio
+import os
+
+import pytest
+
+import ipyparallel as ipp
+from ipyparallel import AsyncClient
+
+from .clienttest import raises_remote
+
+_timeout = 30
+
+
+def getpid():
+    import os
+
+    return os.getpid()
+
+
+def test_requires_running_loop():
+    with pytest.raises(RuntimeError):
+        AsyncClient(profile='iptest')
+
+
+async def test_async_client(Cluster):
+    async with Cluster(n=2) as rc:
+        cluster = rc.cluster
+        client = AsyncClient(
+            profile_dir=cluster.profile_dir, cluster_id=cluster.cluster_id
+        )
+        try:
+            assert client._io_thread is None
+            await asyncio.wait_for(client.wait_for_engines(2), _timeout)
+
+            # awaitable apply and map
+            assert await client.apply(os.getpid) not in {None, os.getpid()}
+            assert await client.map(lambda x: x * 2, range(10)) == list(range(0, 20, 2))
+            with raises_remote(ZeroDivisionError):
+                await client.apply(lambda: 1 / 0)
+
+            # views never block, and their results are awaitable
+            view = client[:]
+            assert not view.block
+            ar = view.apply_async(getpid)
+            assert await client.wait(ar, timeout=_timeout)
+            pids = await ar
+            assert sorted(pids) == sorted(set(pids))
+            assert await client.wait()
+
+            with pytest.raises(ValueError):
+                client.block = True
+        finally:
+            client.close()
+
+
+async def test_async_client_queries(Cluster):
+    """Hub queries and control requests are awaitable, and don't block the loop"""
+    async with Cluster(n=1) as rc:
+        cluster = rc.cluster
+        client = AsyncClient(
+            profile_dir=cluster.profile_dir, cluster_id=cluster.cluster_id
+        )
+        try:
+            await asyncio.wait_for(client.wait_for_engines(1), _timeout)
+            ar = client[:].apply_async(getpid)
+            await ar
+            msg_id = ar.msg_ids[0]
+
+            status = await asyncio.wait_for(client.queue_status(), _timeout)
+            assert status['unassigned'] == 0
+            assert 0 in status
+            status = await asyncio.wait_for(client.result_status([msg_id]), _timeout)
+            assert status['completed'] == [msg_id]
+            history = await asyncio.wait_for(client.hub_history(), _timeout)
+            assert msg_id in history
+            records = await asyncio.wait_for(
+                client.db_query({'msg_id': msg_id}, keys=['msg_id']), _timeout
+            )
+            assert [rec['msg_id'] for rec in records] == [msg_id]
+            await asyncio.wait_for(client.abort(ar), _timeout)
+            await asyncio.wait_for(client.purge_results(ar), _timeout)
+            history = await asyncio.wait_for(client.hub_history(), _timeout)
+            assert msg_id not in history
+        finally:
+            client.close()
+
+
+async def test_await_async_result(Cluster):
+    """AsyncResults from a threaded Client are awaitable too"""
+    async with Cluster(n=1) as rc:
+        ar = rc.load_balanced_view().apply_async(lambda x: x + 1, 1)
+        assert await asyncio.wait_for(ar, _timeout) == 2
+        ar = rc[:].map_async(lambda x: x * 2, range(4))
+        assert await asyncio.wait_for(ar, _timeout) == [0, 2, 4, 6]
+        assert isinstance(rc, ipp.Client)
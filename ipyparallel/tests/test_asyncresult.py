@@ -11,6 +11,7 @@ from IPython.utils.io import capture_output
 
 import ipyparallel as ipp
 from ipyparallel import error
+from ipyparallel.client.futures import MessageFuture
 
 from .clienttest import ClusterTestCase, raises_remote
 
@@ -26,6 +27,23 @@ def echo(x):
     return x
 
 
+def test_replace_result():
+    future = MessageFuture("msg")
+    results = []
+    future.add_done_callback(lambda f: results.append(f.result()))
+    with pytest.raises(RuntimeError):
+        future.replace_result(None)
+    future.set_result([1, 2])
+    assert results == [[1, 2]]
+    # callbacks are released once they have run
+    assert not future._callbacks
+    future.replace_result(None)
+    assert future.result() is None
+    # callbacks added later run right away
+    future.add_done_callback(lambda f: results.append(f.result()))
+    assert results == [[1, 2], None]
+
+
 class TestAsyncResult(ClusterTestCase):
     def test_single_result_view(self):
         """various one-target views get the right value for single_result"""
@@ -556,6 +574,32 @@ class TestAsyncResult(ClusterTestCase):
         amr.wait_interactive()
         assert amr.progress == len(amr)
 
+    def test_wait_first_completed(self):
+        self.minimum_engines(2)
+        dv = self.client[:]
+        dv.scatter('rank', range(len(dv)), flatten=True, block=True)
+
+        def sleep_rank(rank):
+            import time
+
+            if rank:
+                time.sleep(2)
+            return rank
+
+        ar = dv.apply_async(sleep_rank, ipp.Reference('rank'))
+        done, pending = ar.wait(timeout=10, return_when=ipp.FIRST_COMPLETED)
+        assert [child.get(timeout=0) for child in done] == [0]
+        assert len(pending) == len(dv) - 1
+        assert ar.progress == 1
+        assert not ar.ready()
+        assert ar.wait(timeout=10)
+        assert ar.progress == len(ar)
+        done2, pending = ar.wait(timeout=0, return_when=ipp.FIRST_COMPLETED)
+        assert len(done2) == len(dv)
+        assert not pending
+        # the same split results are returned by each call
+        assert done < done2
+
     def test_error_engine_info_apply(self):
         dv = self.client[:]
         targets = self.client.ids
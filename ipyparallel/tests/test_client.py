@@ -2,6 +2,7 @@
 
 # Copyright (c) IPython Development Team.
 # Distributed under the terms of the Modified BSD License.
+import json
 import os
 import signal
 import socket
@@ -230,6 +231,20 @@ class TestClient(ClusterTestCase):
             assert isinstance(qs, dict)
             assert sorted(qs.keys()), ['completed', 'queue' == 'tasks']
 
+    def test_queue_status_verbose(self):
+        id0 = self.client.ids[0]
+        ar = self.client[id0].apply_async(lambda: 1)
+        ar.get()
+        for i in range(20):
+            qs = self.client.queue_status(targets=id0, verbose=True)
+            if ar.msg_ids[0] in qs['completed']:
+                break
+            time.sleep(0.1)
+        assert ar.msg_ids[0] in qs['completed']
+        assert ar.msg_ids[0] not in qs['queue']
+        assert isinstance(qs['queue'], list)
+        assert isinstance(qs['tasks'], list)
+
     @pytest.mark.skipif(os.name == 'nt', reason='timing out on Windows')
     def test_shutdown(self):
         ids = self.client.ids
@@ -251,6 +266,31 @@ class TestClient(ClusterTestCase):
         pass
         # to be written
 
+    def test_bounded_result_store(self):
+        c = clientmod.Client(
+            profile='iptest',
+            context=self.context,
+            history_length=3,
+            max_results=2,
+            spill_results=True,
+        )
+        v = c[-1]
+        for i in range(5):
+            v.apply_sync(lambda x: x, i)
+        assert len(c.history) == 5
+        assert len(list(c.history)) == 3
+        assert len(v.history) == 5
+        assert list(v.history) == list(c.history)
+        msg_ids = c.history[-3:]
+        # delivered results are kept in the bounded store
+        assert len(c.results) == 5
+        assert c.results.spilled == 3
+        rdict = c.result_status(msg_ids)
+        assert sorted(rdict['completed']) == sorted(msg_ids)
+        assert [c.results[msg_id] for msg_id in msg_ids] == [2, 3, 4]
+        assert c.get_result(msg_ids[0]).get() == 2
+        c.close()
+
     def test_db_query_dt(self):
         """test db query by date"""
         hub_n_before = len(self.client.hub_history())
@@ -330,6 +370,25 @@ class TestClient(ClusterTestCase):
         ar.get()
         rc2.close()
 
+    def test_db_query_stdout(self):
+        """buffered output is complete in the db when a task is done"""
+        view = self.client[-1]
+
+        def chatty(n):
+            for i in range(n):
+                print(i)
+
+        ar = view.apply_async(chatty, 500)
+        ar.get(timeout=10)
+        # output may arrive after the reply
+        expected = ''.join(f"{i}\n" for i in range(500))
+        for i in range(20):
+            rec = self.client.db_query({'msg_id': ar.msg_ids[0]}, keys=['stdout'])[0]
+            if rec['stdout'] == expected:
+                break
+            time.sleep(0.1)
+        assert rec['stdout'] == expected
+
     def test_db_query_in(self):
         """test db query with '$in','$nin' operators"""
         hist = self.client.hub_history()
@@ -455,6 +514,27 @@ class TestClient(ClusterTestCase):
             else:
                 assert h1[key] == h2[key]
 
+    def test_resubmit_record(self):
+        """the monitor copy of a resubmitted task doesn't clobber its record"""
+        v = self.client.load_balanced_view()
+        ar = v.apply_async(lambda x: x, 'x' * 1024)
+        ar.get()
+        self._wait_for_idle()
+        ahr = self.client.resubmit(ar.msg_ids)
+        ahr.get(1)
+        self._wait_for_idle()
+        keys = ['msg_id', 'submitted', 'client_uuid', 'buffers', 'resubmitted']
+        records = self.client.db_query(
+            {'msg_id': {'$in': ar.msg_ids + ahr.msg_ids}}, keys=keys
+        )
+        by_id = {rec['msg_id']: rec for rec in records}
+        rec1 = by_id[ar.msg_ids[0]]
+        rec2 = by_id[ahr.msg_ids[0]]
+        assert rec1['resubmitted'] == rec2['msg_id']
+        assert rec2['submitted'] > rec1['submitted']
+        assert rec2['client_uuid'] != rec1['client_uuid']
+        assert rec2['buffers'] == rec1['buffers']
+
     def test_resubmit_aborted(self):
         def f():
             import random
@@ -695,3 +775,46 @@ class TestClient(ClusterTestCase):
             # make sure they were all interrupted
             for r in ar.get(return_exceptions=True):
                 assert isinstance(r, error.RemoteError)
+
+
+def test_metadata():
+    md = clientmod.Metadata(msg_id='abc')
+    assert md['msg_id'] == md.msg_id == 'abc'
+    assert md['stdout'] == ''
+    assert md.get('engine_id') is None
+    assert 'outputs' in md
+    assert len(md) == len(list(md))
+    # output containers are created on first access
+    md['outputs'].append('x')
+    md.data['a'] = 5
+    assert md.outputs == ['x']
+    assert md['data'] == {'a': 5}
+    md.update(stdout='hi', engine_id=1)
+    assert dict(md)['stdout'] == 'hi'
+    assert md.engine_id == 1
+    with pytest.raises(KeyError):
+        md['nosuchkey'] = 1
+    with pytest.raises(AttributeError):
+        md.nosuchkey = 1
+    # still a dict
+    assert isinstance(md, dict)
+    md2 = md.copy()
+    assert isinstance(md2, clientmod.Metadata)
+    assert md2 == md
+    assert md2.outputs is not None
+    assert json.loads(json.dumps(clientmod.Metadata()))['outputs'] == []
+    assert json.loads(json.dumps(md))['data'] == {'a': 5}
+
+
+def test_metadata_lazy_dates():
+    md = clientmod.Metadata()
+    assert md.started is None
+    md.started = '2024-01-02T03:04:05.678901Z'
+    # stored raw until accessed
+    assert dict(md)['started'] == '2024-01-02T03:04:05.678901Z'
+    started = md['started']
+    assert isinstance(started, datetime)
+    assert started.tzinfo is not None
+    assert dict(md)['started'] is started
+    del md['started']
+    assert md.started is None
@@ -10,11 +10,13 @@ from pathlib import Path
 from unittest import mock
 
 import pytest
+import zmq
 from traitlets.config import Config
 
 import ipyparallel as ipp
 from ipyparallel import cluster
 from ipyparallel.cluster.launcher import find_launcher_class
+from ipyparallel.serialize import packers
 
 from .clienttest import raises_remote
 
@@ -196,6 +198,388 @@ async def test_async_with(Cluster):
         assert rc[:]['a'] == [5] * 5
 
 
+async def test_lightweight_monitoring(Cluster):
+    async with Cluster(n=2, controller_args=['--ping=250', '--lightweight']) as rc:
+        view = rc.load_balanced_view()
+        ars = [view.apply_async(lambda x: x, i) for i in range(10)]
+        assert [ar.get(timeout=_timeout) for ar in ars] == list(range(10))
+        ar = rc[0].apply_async(lambda: 5)
+        assert ar.get(timeout=_timeout) == 5
+        msg_ids = [ar.msg_ids[0] for ar in ars]
+        # summaries are sent in batches, so the Hub may lag a little
+        deadline = time.monotonic() + _timeout
+        while True:
+            status = rc.result_status(msg_ids + ar.msg_ids)
+            if not status['pending'] or time.monotonic() > deadline:
+                break
+            await asyncio.sleep(0.1)
+        assert sorted(status['completed']) == sorted(msg_ids + ar.msg_ids)
+        records = rc.db_query({'msg_id': {'$in': msg_ids}}, keys=['completed'])
+        assert len(records) == len(msg_ids)
+        assert all(rec['completed'] for rec in records)
+        queue_status = rc.queue_status()
+        assert sum(queue_status[eid]['completed'] for eid in rc.ids) == 11
+        with raises_remote(RuntimeError):
+            rc.result_status(msg_ids, status_only=False)
+
+
+async def test_metrics_only(Cluster):
+    async with Cluster(n=2, controller_args=['--ping=250', '--metrics']) as rc:
+        view = rc.load_balanced_view()
+        ars = [view.apply_async(lambda x: x, i) for i in range(10)]
+        assert [ar.get(timeout=_timeout) for ar in ars] == list(range(10))
+        assert rc[0].apply_sync(lambda: 5) == 5
+        deadline = time.monotonic() + _timeout
+        while True:
+            metrics = rc.hub_metrics()
+            if metrics['latency']['count'] >= 11 or time.monotonic() > deadline:
+                break
+            await asyncio.sleep(0.1)
+        assert metrics['latency']['count'] == 11
+        assert metrics['runtime']['count'] == 11
+        assert metrics['clients'][rc.session.session] == {'submitted': 11, 'ok': 11}
+        assert sum(counts['ok'] for counts in metrics['engines'].values()) == 11
+        assert metrics['unassigned'] == 0
+        queue_status = rc.queue_status()
+        assert sum(queue_status[eid]['completed'] for eid in rc.ids) == 11
+        assert all(queue_status[eid]['queue'] == 0 for eid in rc.ids)
+
+
+@pytest.mark.parametrize("packer", packers.available_packers())
+async def test_packer(Cluster, packer):
+    async with Cluster(n=2, controller_args=['--ping=250', f'--packer={packer}']) as rc:
+        assert rc.session.packer == packers.resolve_packer(packer)[0]
+        view = rc.load_balanced_view()
+        assert view.map_sync(lambda x: x * 2, range(10)) == list(range(0, 20, 2))
+        ar = rc[:].apply_async(lambda: 5)
+        assert ar.get(timeout=_timeout) == [5, 5]
+        assert ar.wall_time > 0
+        queue_status = rc.queue_status()
+        assert sorted(eid for eid in queue_status if eid != 'unassigned') == rc.ids
+        # fetch a record from the Hub
+        ahr = rc.get_result(ar.msg_ids[0], owner=False)
+        assert ahr.get(timeout=_timeout) == 5
+        assert ahr.metadata['completed'] > ahr.metadata['submitted']
+
+
+def _set_result_chunk_size(chunk_size):
+    from IPython import get_ipython
+
+    get_ipython().kernel.result_chunk_size = chunk_size
+
+
+async def test_result_chunks(Cluster):
+    async with Cluster(n=2) as rc:
+        rc[:].apply_sync(_set_result_chunk_size, 100_000)
+        data = os.urandom(1_000_001)
+
+        def echo(x):
+            return x
+
+        msg_ids = []
+        for view in (rc[0], rc.load_balanced_view(), rc.broadcast_view()):
+            ar = view.apply_async(echo, data)
+            result = ar.get(timeout=_timeout)
+            if isinstance(result, list):
+                assert result == [data, data]
+            else:
+                assert result == data
+            msg_ids.extend(ar.msg_ids)
+        assert rc[0].apply_sync(echo, b'small') == b'small'
+        assert rc._result_chunks == {}
+        # partial results are dropped if their engine dies
+        uuid = rc._engines[0]
+        rc.outstanding.add('stranded')
+        rc._outstanding_dict[uuid].add('stranded')
+        rc._result_chunks['stranded'] = {0: bytearray(10)}
+        rc._handle_stranded_msgs(0, uuid)
+        assert rc._result_chunks == {}
+        assert rc.results['stranded'].ename == 'EngineError'
+        # the Hub records completion, but not the chunks
+        status = rc.result_status(msg_ids[:2])
+        assert sorted(status['completed']) == sorted(msg_ids[:2])
+
+
+def _serve_direct_data(threshold):
+    from ipyparallel.engine.app import IPEngine
+
+    app = IPEngine.instance()
+    app.kernel.direct_data_threshold = threshold
+    app.kernel.data_server = app.start_data_server()
+
+
+async def test_direct_data(Cluster):
+    async with Cluster(n=2) as rc:
+        rc[:].apply_sync(_serve_direct_data, 100_000)
+        data = os.urandom(1_000_001)
+
+        def echo(x):
+            return x
+
+        msg_ids = []
+        for view in (rc[0], rc.load_balanced_view(), rc.broadcast_view()):
+            ar = view.apply_async(echo, data)
+            result = ar.get(timeout=_timeout)
+            if isinstance(result, list):
+                assert result == [data, data]
+            else:
+                assert result == data
+            msg_ids.extend(ar.msg_ids)
+        assert rc[0].apply_sync(echo, b'small') == b'small'
+        assert rc._direct_replies == {}
+        # the data did not pass through the controller
+        records = rc.db_query({'msg_id': {'$in': msg_ids[:2]}}, keys=['result_buffers'])
+        assert len(records) == 2
+        for rec in records:
+            assert sum(len(buf) for buf in rec['result_buffers']) < 100_000
+
+
+def _unreachable_direct_data():
+    from ipyparallel.engine.app import IPEngine
+
+    # nothing listens here, data requests are never answered
+    IPEngine.instance().kernel.data_server.url = 'tcp://127.0.0.1:1'
+
+
+async def test_direct_data_unavailable(Cluster):
+    async with Cluster(n=1) as rc:
+        rc[:].apply_sync(_serve_direct_data, 100_000)
+        data = os.urandom(1_000_001)
+
+        def echo(x):
+            return x
+
+        view = rc[0]
+        # clients connected through ssh tunnels have results relayed
+        rc._ssh = True
+        try:
+            ar = view.apply_async(echo, data)
+            assert ar.get(timeout=_timeout) == data
+        finally:
+            rc._ssh = False
+        records = rc.db_query({'msg_id': ar.msg_ids[0]}, keys=['result_buffers'])
+        assert sum(len(buf) for buf in records[0]['result_buffers']) > 1_000_000
+
+        # a client that can't reach the engine gives up waiting
+        rc[:].apply_sync(_unreachable_direct_data)
+        rc.direct_data_timeout = 1
+        ar = view.apply_async(echo, data)
+        with pytest.raises(ipp.error.RemoteError) as exc_info:
+            ar.get(timeout=_timeout)
+        assert exc_info.value.ename == 'EngineError'
+        assert rc._direct_replies == {}
+        # the engine is still usable
+        assert view.apply_sync(echo, b'small') == b'small'
+
+
+def test_data_server():
+    from jupyter_client.session import Session
+
+    from ipyparallel.engine.dataserver import DataServer
+
+    ctx = zmq.Context()
+    session = Session(key=b'secret')
+    server = DataServer(ctx, '127.0.0.1', session, ttl=2, max_bytes=100)
+    server.start()
+    client = ctx.socket(zmq.DEALER)
+    client.linger = 0
+    client.rcvtimeo = 5000
+    client.connect(server.url)
+    try:
+        assert server.hold('a', [b'x' * 60])
+        # over max_bytes
+        assert not server.hold('b', [b'x' * 60])
+        # unsigned requests are dropped
+        Session(key=b'wrong').send(client, 'data_request', {'msg_id': 'a'})
+        assert not client.poll(500)
+        session.send(client, 'data_request', {'msg_id': 'a'})
+        idents, reply = session.recv(client, mode=0)
+        assert reply['content'] == {'status': 'ok', 'msg_id': 'a'}
+        assert [bytes(buf) for buf in reply['buffers']] == [b'x' * 60]
+        # unfetched buffers expire
+        assert server.hold('c', [b'x' * 60])
+        time.sleep(2.5)
+        session.send(client, 'data_request', {'msg_id': 'c'})
+        idents, reply = session.recv(client, mode=0)
+        assert reply['content']['status'] == 'error'
+        assert server.nbytes == 0
+    finally:
+        client.close()
+        ctx.term()
+
+
+def _sleep_in_slot(i):
+    import time
+
+    start = time.monotonic()
+    print(i)
+    time.sleep(0.5)
+    return start, time.monotonic()
+
+
+async def _async_sleep_in_slot(i):
+    import asyncio
+    import time
+
+    start = time.monotonic()
+    print(i)
+    await asyncio.sleep(0.5)
+    return start, time.monotonic()
+
+
+def _fail_in_slot(i):
+    import time
+
+    time.sleep(0.5)
+    raise ValueError(f"task {i}")
+
+
+async def test_task_slots(Cluster):
+    cluster = Cluster(n=1)
+    cluster.config.EngineLauncher.engine_args = [
+        '--log-level=10',
+        '--IPEngine.task_slots=4',
+    ]
+    async with cluster as rc:
+        view = rc.load_balanced_view()
+        for f in (_sleep_in_slot, _async_sleep_in_slot):
+            ars = [view.apply_async(f, i) for i in range(4)]
+            times = [ar.get(timeout=_timeout) for ar in ars]
+            # the scheduler assigned 4 tasks at once, and they ran concurrently
+            assert max(start for start, end in times) < min(end for start, end in times)
+            # output is associated with the right task
+            assert [ar.stdout for ar in ars] == [f"{i}\n" for i in range(4)]
+        # a fifth task waits for a free slot
+        ars = [view.apply_async(_sleep_in_slot, i) for i in range(5)]
+        times = sorted(ar.get(timeout=_timeout) for ar in ars)
+        assert times[-1][0] >= times[0][1]
+        with raises_remote(ZeroDivisionError):
+            view.apply_sync(lambda: 1 / 0)
+        # concurrent failures each get their own traceback and error output
+        ars = [view.apply_async(_fail_in_slot, i) for i in range(4)]
+        for i, ar in enumerate(ars):
+            with pytest.raises(ipp.error.RemoteError) as exc_info:
+                ar.get(timeout=_timeout)
+            assert exc_info.value.evalue == f"task {i}"
+            assert f"task {i}" in exc_info.value.traceback
+            assert ar.wait_for_output(timeout=_timeout)
+            assert ar.metadata['error'].evalue == f"task {i}"
+
+
+def _engine_uuid():
+    from ipyparallel.engine.app import IPEngine
+
+    return IPEngine.instance().ident
+
+
+async def test_recycle_engines(Cluster):
+    cluster = Cluster(n=1)
+    cluster.config.EngineLauncher.engine_args = [
+        '--log-level=10',
+        '--IPEngine.max_tasks=3',
+    ]
+    async with cluster as rc:
+        view = rc.load_balanced_view()
+        ars = [view.apply_async(_engine_uuid) for i in range(7)]
+        uuids = [ar.get(timeout=_timeout) for ar in ars]
+        # every task ran, on a fresh engine with the same id every 3 tasks
+        assert [ar.engine_id for ar in ars] == [0] * 7
+        assert len(set(uuids)) == 3
+        assert uuids[:3] == [uuids[0]] * 3
+        assert uuids[3:6] == [uuids[3]] * 3
+        rc.wait_for_engines(1, timeout=_timeout)
+        assert rc.ids == [0]
+
+
+def _report_memory_pressure():
+    from IPython import get_ipython
+
+    # report the host nearly out of memory from now on
+    kernel = get_ipython().kernel
+    sample = dict(kernel.sample_resources(), mem=0.99)
+    kernel.sample_resources = lambda: sample
+
+
+async def test_resource_aware_scheme(Cluster):
+    cluster = Cluster(
+        n=2, controller_args=['--TaskScheduler.scheme_name=resourceaware']
+    )
+    async with cluster as rc:
+        view = rc.load_balanced_view()
+        assert view.map_sync(lambda x: x * 2, range(8)) == list(range(0, 16, 2))
+        qs = rc.queue_status()
+        for eid in rc.ids:
+            assert set(qs[eid]['resources']) == {'rss', 'cpu', 'load', 'mem'}
+        # engine 0 reports memory pressure, so tasks go elsewhere while they can
+        rc.load_balanced_view(targets=[0]).apply_sync(_report_memory_pressure)
+        engine_ids = []
+        for i in range(4):
+            ar = view.apply_async(os.getpid)
+            ar.get(timeout=_timeout)
+            engine_ids.append(ar.engine_id)
+        assert engine_ids == [1] * 4
+        assert rc.queue_status(0)['resources']['mem'] == 0.99
+
+
+async def test_batched_registration(Cluster):
+    # a long batch interval, so engines starting together register together
+    cluster = Cluster(controller_args=["--Hub.registration_batch_interval=5"])
+    await cluster.start_controller()
+    with await cluster.connect_client() as rc:
+        notifications = []
+        handle_registration = rc._notification_handlers['registration_notification']
+
+        def record_registration(msg):
+            notifications.append(msg['content'])
+            handle_registration(msg)
+
+        rc._notification_handlers['registration_notification'] = record_registration
+        n = 3
+        await cluster.start_engines(n)
+        rc.wait_for_engines(n, timeout=_timeout)
+        assert rc.ids == list(range(n))
+        batches = [content['engines'] for content in notifications]
+        assert sorted(engine['id'] for batch in batches for engine in batch) == rc.ids
+        assert max(len(batch) for batch in batches) > 1
+        # the last engine of each batch is described at the top level, as before
+        for content in notifications:
+            last = content['engines'][-1]
+            assert {key: content[key] for key in last} == last
+    await cluster.stop_cluster()
+
+
+async def test_heart_aggregators(Cluster):
+    import psutil
+
+    n = 2
+    cluster = Cluster(
+        n=n, controller_args=['--ping=250', '--IPController.heart_aggregators=2']
+    )
+    async with cluster as rc:
+        assert rc.ids == list(range(n))
+        rc[:].apply_sync(os.getpid)
+        with open(cluster.controller.connection_files['engine']) as f:
+            engine_info = json.load(f)
+        ping_ports = engine_info['hb_aggregator_ping']
+        assert len(ping_ports) == 2
+        # find the aggregator for engine 0 by its listening port
+        controller = psutil.Process(cluster.controller.pid)
+        for child in controller.children():
+            ports = {c.laddr.port for c in child.net_connections('tcp')}
+            if ping_ports[0] in ports:
+                aggregator = child
+                break
+        else:
+            pytest.fail("No heart aggregator process found")
+        # when the aggregator stops, the engines it monitors are unregistered
+        aggregator.kill()
+        tic = time.monotonic()
+        while 0 in rc.ids and time.monotonic() < tic + _timeout:
+            await asyncio.sleep(0.1)
+        assert rc.ids == [1]
+        rc[:].apply_sync(os.getpid)
+
+
 def test_sync_with(Cluster):
     with Cluster(log_level=10, n=5) as rc:
         assert sorted(rc.ids) == list(range(5))
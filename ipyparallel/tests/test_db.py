@@ -13,8 +13,15 @@ import pytest
 from jupyter_client.session import Session
 
 from ipyparallel import util
-from ipyparallel.controller.dictdb import DictDB
-from ipyparallel.controller.hub import init_record
+from ipyparallel.controller.asyncdb import AsyncDB
+from ipyparallel.controller.dictdb import DictDB, NoDB
+from ipyparallel.controller.hub import (
+    CompletedHistory,
+    Hub,
+    OutputBuffer,
+    empty_record,
+    init_record,
+)
 from ipyparallel.controller.sqlitedb import SQLiteDB
 from ipyparallel.util import utc
 
@@ -151,6 +158,19 @@ class TaskDBTest:
         rec = self.db.get_record(msg_id)
         assert isinstance(rec['completed'], datetime)
 
+    def test_iso8601_strings(self):
+        """timestamps stored as ISO8601 strings are parsed when read"""
+        msg_id = self.db.get_history()[-1]
+        completed = util.utcnow()
+        self.db.update_record(
+            msg_id, dict(completed=completed.isoformat().replace('+00:00', 'Z'))
+        )
+        rec = self.db.get_record(msg_id)
+        assert rec['completed'] == completed
+        found = self.db.find_records({'completed': {'$ne': None, '$gte': completed}})
+        assert [r['msg_id'] for r in found] == [msg_id]
+        assert found[0]['completed'] == completed
+
     def test_drop_matching(self):
         msg_ids = self.load_records(10)
         query = {'msg_id': {'$in': msg_ids}}
@@ -170,6 +190,57 @@ class TaskDBTest:
         recs = self.db.find_records(query)
         assert len(recs) >= 10
 
+    def test_merge_record_new(self):
+        """merging into a missing record creates it"""
+        msg = self.session.msg('apply_request', content=dict(a=5))
+        msg['buffers'] = []
+        rec = init_record(msg)
+        msg_id = rec['msg_id']
+        self.db.merge_record(msg_id, rec)
+        rec2 = self.db.get_record(msg_id)
+        assert rec2['msg_id'] == msg_id
+        assert rec2['header']['msg_id'] == msg_id
+
+    def test_merge_record_existing(self):
+        """empty values don't clobber existing data"""
+        msg_id = self.db.get_history()[-1]
+        self.db.update_record(msg_id, {'stdout': 'hello', 'engine_uuid': 'abc'})
+        self.db.merge_record(msg_id, {'stdout': '', 'engine_uuid': 'def'})
+        rec = self.db.get_record(msg_id)
+        assert rec['stdout'] == 'hello'
+        assert rec['engine_uuid'] == 'def'
+
+    def test_merge_record_append(self):
+        """append_keys are concatenated, iopub may arrive before the request"""
+        msg = self.session.msg('apply_request', content=dict(a=5))
+        msg['buffers'] = []
+        msg_id = msg['header']['msg_id']
+        rec = empty_record()
+        rec['msg_id'] = msg_id
+        rec['stdout'] = 'hello '
+        self.db.merge_record(msg_id, rec, append_keys=('stdout',))
+        self.db.merge_record(msg_id, {'stdout': 'world'}, append_keys=('stdout',))
+        self.db.merge_record(msg_id, init_record(msg))
+        rec = self.db.get_record(msg_id)
+        assert rec['stdout'] == 'hello world'
+        assert rec['header']['msg_id'] == msg_id
+
+    def test_merge_record_conflict(self):
+        """warn_conflicts logs values that differ from the existing record"""
+        msg_id = self.db.get_history()[-1]
+        rec = self.db.get_record(msg_id)
+        self.db.update_record(msg_id, {'engine_uuid': 'abc'})
+        update = {
+            'engine_uuid': 'def',
+            'buffers': [b'different'],
+            'submitted': rec['submitted'],
+        }
+        with self.assertLogs(self.db.log, logging.WARNING) as captured:
+            self.db.merge_record(msg_id, update, warn_conflicts=True)
+        assert len(captured.records) == 1
+        assert "'engine_uuid'" in captured.output[0]
+        assert self.db.get_record(msg_id)['engine_uuid'] == 'def'
+
     def test_pop_safe_get(self):
         """editing query results shouldn't affect record [get]"""
         msg_id = self.db.get_history()[-1]
@@ -291,3 +362,90 @@ class TestSQLiteBackend(TaskDBTest, TestCase):
             os.remove(self.temp_db)
         except Exception:
             pass
+
+
+@pytest.mark.parametrize("db_class", [DictDB, NoDB, SQLiteDB])
+async def test_async_db(db_class, tmpdir):
+    util._disable_session_extract_dates()
+    session = Session()
+    if db_class is SQLiteDB:
+        db = SQLiteDB(location=str(tmpdir))
+    else:
+        db = db_class()
+    async_db = AsyncDB(db=db)
+    assert (async_db.executor is not None) == db.blocking
+    msg = session.msg('apply_request', content=dict(a=5))
+    msg['buffers'] = []
+    msg_id = msg['header']['msg_id']
+    # queue writes without waiting, as the Hub does
+    async_db.submit('merge_record', msg_id, init_record(msg))
+    async_db.submit('update_record', msg_id, {'stdout': 'hi'})
+    if db_class is NoDB:
+        with pytest.raises(KeyError):
+            await async_db.get_record(msg_id)
+    else:
+        rec = await async_db.get_record(msg_id)
+        assert rec['stdout'] == 'hi'
+        recs = await async_db.find_records({'msg_id': msg_id}, keys=['stdout'])
+        assert recs == [{'msg_id': msg_id, 'stdout': 'hi'}]
+    async_db.close()
+
+
+def test_output_buffer():
+    buf = OutputBuffer()
+    assert not buf
+    buf.add_stream('stdout', 'a')
+    buf.add_stream('stderr', 'b')
+    buf.add_stream('stdout', 'c')
+    buf.fields['error'] = {'ename': 'ValueError'}
+    assert buf.size == 3
+    rec, append_keys = buf.pop_record('abc')
+    assert rec['msg_id'] == 'abc'
+    assert rec['stdout'] == 'ac'
+    assert rec['stderr'] == 'b'
+    assert rec['error'] == {'ename': 'ValueError'}
+    assert sorted(append_keys) == ['stderr', 'stdout']
+    assert not buf
+    assert buf.size == 0
+    assert buf.stored == 3
+
+
+def test_output_buffer_limit():
+    buf = OutputBuffer()
+    buf.add_stream('stdout', 'x' * 8, limit=10)
+    buf.add_stream('stdout', 'y' * 8, limit=10)
+    assert buf.truncated
+    buf.add_stream('stdout', 'z', limit=10)
+    rec, append_keys = buf.pop_record('abc')
+    assert rec['stdout'].startswith('x' * 8 + 'yy\n')
+    assert 'truncated' in rec['stdout']
+    assert 'z' not in rec['stdout']
+
+
+def test_unbuffered_output_limit():
+    # without periodic flushes, each message is written as it arrives,
+    # but max_output_size still applies to the whole task
+    hub = Hub.__new__(Hub)
+    hub.iopub_flush_interval = 0
+    hub.max_output_size = 10
+    writes = []
+    hub._db_write = lambda *args, **kwargs: writes.append(args[3])
+    msg = {
+        'parent_header': {'msg_id': 'abc'},
+        'header': {'msg_type': 'stream'},
+        'content': {'name': 'stdout', 'text': 'xxxx'},
+    }
+    for i in range(5):
+        hub.save_iopub_message([], msg)
+    assert [rec['stdout'][:4] for rec in writes] == ['xxxx', 'xxxx', 'xx\n[']
+    assert 'truncated' in writes[-1]['stdout']
+    hub.finish_output('abc')
+    assert hub.output_buffers == {}
+
+
+def test_completed_history():
+    history = CompletedHistory(maxlen=3)
+    for i in range(5):
+        history.append(str(i))
+    assert len(history) == 5
+    assert list(history) == ['2', '3', '4']
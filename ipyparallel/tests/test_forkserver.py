@@ -0,0 +1,62 @@
+import asyncio
+import os
+
+import pytest
+
+from .test_cluster import (
+    test_get_output,  # noqa: F401
+    test_recycle_engines,  # noqa: F401
+    test_restart_engines,  # noqa: F401
+    test_signal_engines,  # noqa: F401
+    test_start_stop_cluster,  # noqa: F401
+    test_start_stop_engines,  # noqa: F401
+    test_to_from_dict,  # noqa: F401
+)
+
+# import tests that use engine_launcher_class fixture
+
+_timeout = 30
+
+
+# override engine_launcher_class
+@pytest.fixture
+def engine_launcher_class():
+    if not hasattr(os, "fork"):
+        pytest.skip("Requires os.fork")
+    return 'forkserver'
+
+
+def _preloaded():
+    import sys
+
+    return 'wave' in sys.modules
+
+
+async def test_preload_modules(Cluster):
+    cluster = Cluster(n=2)
+    cluster.config.ForkServerEngineSetLauncher.preload_modules = ['wave']
+    async with cluster as rc:
+        assert rc[:].apply_sync(_preloaded) == [True, True]
+        engine_set = next(iter(cluster.engines.values()))
+        pids = {launcher.pid for launcher in engine_set.launchers.values()}
+        assert set(rc[:].apply_sync(os.getpid)) == pids
+    # the fork server is stopped with its engines
+    assert engine_set.fork_server is None
+
+
+async def test_engine_exit_code(Cluster):
+    async with Cluster(n=2) as rc:
+        cluster = rc.cluster
+        engine_set = next(iter(cluster.engines.values()))
+        pid = rc[0].apply_sync(os.getpid)
+        identifier = next(
+            i for i, launcher in engine_set.launchers.items() if launcher.pid == pid
+        )
+        rc[0].apply_async(os._exit, 3)
+        engines = engine_set.stop_data.setdefault("engines", {})
+        for _ in range(_timeout * 10):
+            if identifier in engines:
+                break
+            await asyncio.sleep(0.1)
+        # the fork server reports the exit code of its engines
+        assert engines[identifier]["exit_code"] == 3
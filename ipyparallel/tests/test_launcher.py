@@ -4,16 +4,21 @@ Doesn't actually start any subprocesses, but goes through the motions of constru
 objects, which should test basic config.
 """
 
+import asyncio
 import logging
 import os
+import signal
 import sys
+import threading
 import time
+from functools import partial
 from subprocess import Popen
 
 import pytest
 from traitlets.config import Config
 
 from ipyparallel.cluster import launcher as launcher_mod
+from ipyparallel.cluster.sshagent import SSHAgent
 from ipyparallel.traitlets import entry_points
 
 # -------------------------------------------------------------------------------
@@ -153,6 +158,77 @@ def test_ssh_waitpid(capsys):
     assert _wait_one(timeout=5) == {"process_running": "0", "exit_code": "-1"}
 
 
+async def test_local_process_watcher(build_launcher):
+    code = 'import time; time.sleep(1); exit({})'
+    launchers = []
+    for i in range(5):
+        launcher = build_launcher(
+            launcher_mod.LocalProcessLauncher,
+            cmd_and_args=[sys.executable, '-c', code.format(i)],
+            identifier=str(i),
+        )
+        launcher.start()
+        launchers.append(launcher)
+    # one thread watches all processes
+    watchers = [t for t in threading.enumerate() if t.name == "ProcessWatcher"]
+    assert len(watchers) == 1
+    for launcher in launchers:
+        await launcher.join(timeout=10)
+    # let notify_stop callbacks run
+    await asyncio.sleep(0.1)
+    assert [launcher.stop_data['exit_code'] for launcher in launchers] == list(range(5))
+
+
+def test_ssh_agent(tmpdir):
+    # run the agent locally, instead of over ssh
+    agent = SSHAgent([sys.executable, '-m', 'ipyparallel.cluster.sshagent'])
+    agent.start()
+    code = 'import os, time; print(os.environ["IPP_TEST"]); time.sleep({}); exit({})'
+    processes = [
+        dict(
+            cmd=[sys.executable, '-c', code.format(0.5, i)],
+            env={"IPP_TEST": str(i)},
+            output_file=str(tmpdir.join(f"{i}.out")),
+        )
+        for i in range(3)
+    ]
+    # a long-running process, to be signaled
+    processes.append(dict(processes[0], cmd=[sys.executable, '-c', code.format(60, 0)]))
+    try:
+        pids = agent.start_processes(processes)
+        assert len(set(pids)) == 4
+        exit_codes = {}
+        done = threading.Event()
+
+        def exited(pid, exit_code):
+            exit_codes[pid] = exit_code
+            if len(exit_codes) == len(pids):
+                done.set()
+
+        for pid in pids:
+            agent.watch(pid, partial(exited, pid))
+        agent.signal(pids[-1], signal.SIGTERM)
+        assert done.wait(timeout=10)
+        assert [exit_codes[pid] for pid in pids] == [0, 1, 2, -signal.SIGTERM]
+        assert tmpdir.join("2.out").read().strip() == "2"
+        with pytest.raises(RuntimeError, match="ProcessLookupError"):
+            agent.signal(pids[0], signal.SIGTERM)
+    finally:
+        agent.stop()
+
+
+def test_ssh_agent_timeout():
+    # an 'agent' that never replies
+    agent = SSHAgent([sys.executable, '-c', 'import time; time.sleep(60)'], timeout=0.5)
+    agent.start()
+    try:
+        with pytest.raises(TimeoutError):
+            agent.signal(1, signal.SIGTERM)
+        assert agent._replies == {}
+    finally:
+        agent.stop(timeout=1)
+
+
 @pytest.mark.parametrize("kind", ("controller", "engine"))
 def test_entrypoints(kind):
     group_name = f"ipyparallel.{kind}_launchers"
@@ -38,6 +38,50 @@ class TestLoadBalancedView(ClusterTestCase):
         r = ar.get()
         assert r == list(map(f, data))
 
+    def test_apply_many(self):
+        def f(x, y=1):
+            return x * y
+
+        args_list = [(i,) for i in range(20)]
+        ar = self.view.apply_many(f, args_list, kwargs={'y': 2})
+        assert len(ar) == len(args_list)
+        assert len(ar.msg_ids) == len(args_list)
+        assert ar.get(timeout=10) == [2 * i for i in range(20)]
+        assert list(ar) == [2 * i for i in range(20)]
+        # caches are purged as each message is done
+        # (when their output is done too, in the IO thread)
+        for i in range(50):
+            cached = set(self.client._futures).union(self.client.outstanding)
+            if not cached.intersection(ar.msg_ids):
+                break
+            time.sleep(0.1)
+        for msg_id in ar.msg_ids:
+            assert msg_id not in self.client._futures
+            assert msg_id not in self.client.outstanding
+        assert self.view.apply_many(f, [(1, 3)], block=True) == [3]
+        with pytest.raises(ValueError):
+            self.view.apply_many(f, [])
+
+    def test_apply_many_purge(self):
+        self.minimum_engines(2)
+
+        def sleep(t):
+            import time
+
+            time.sleep(t)
+            return t
+
+        ar = self.view.apply_many(sleep, [(0,), (3,)])
+        first, last = ar.msg_ids
+        # each message is purged when it is done, not when the whole batch is
+        for i in range(20):
+            if first not in self.client._futures:
+                break
+            time.sleep(0.1)
+        assert first not in self.client._futures
+        assert last in self.client._futures
+        assert ar.get(timeout=10) == [0, 3]
+
     def test_map_generator(self):
         def f(x):
             return x**2
@@ -123,6 +167,20 @@ class TestLoadBalancedView(ClusterTestCase):
         assert astheycame == reference
         assert amr.get() == reference
 
+    def test_map_consume(self):
+        def slow_f(x):
+            import time
+
+            time.sleep(0.05 * x)
+            return x**2
+
+        data = list(range(8, 0, -1))
+        amr = self.view.map_async(slow_f, data)
+        assert list(amr.consume()) == [x**2 for x in data]
+        assert all(child.result() is None for child in amr._children)
+        with pytest.raises(RuntimeError):
+            amr.get(timeout=10)
+
     def test_map_iterable(self):
         """test map on iterables (balanced)"""
         view = self.view
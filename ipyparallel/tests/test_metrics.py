@@ -0,0 +1,61 @@
+"""Tests for Hub task metrics"""
+
+from datetime import datetime, timedelta
+
+from ipyparallel.controller.metrics import Histogram, TaskMetrics
+from ipyparallel.util import utc
+
+
+def test_histogram():
+    h = Histogram()
+    for seconds in (0.0005, 0.001, 0.003, 0.003, 1):
+        h.add(seconds)
+    d = h.to_dict()
+    assert d['count'] == 5
+    assert abs(d['total'] - 1.0075) < 1e-9
+    # <1ms, [1, 2)ms, [2, 4)ms, ..., [512, 1024)ms
+    assert d['buckets'][:3] == [1, 1, 2]
+    assert d['buckets'][10] == 1
+    assert len(d['buckets']) == 11
+    assert Histogram().to_dict()['buckets'] == []
+
+
+def test_task_metrics():
+    m = TaskMetrics()
+    now = datetime.now(utc)
+    # one direct request on engine 0
+    m.submitted('client-a', 0)
+    # two tasks, one assigned to engine 1
+    m.submitted('client-b')
+    m.submitted('client-b')
+    m.assigned(1)
+    assert m.unassigned == 1
+    assert m.queue_status(0) == {'queue': 1, 'tasks': 0, 'completed': 0}
+    assert m.queue_status(1) == {'queue': 0, 'tasks': 1, 'completed': 0}
+
+    m.finished(
+        'client-a',
+        0,
+        'ok',
+        task=False,
+        submitted=now,
+        started=now + timedelta(seconds=1),
+        completed=now + timedelta(seconds=2),
+    )
+    m.finished('client-b', 1, 'error', task=True)
+    # unmet dependency, never assigned
+    m.finished('client-b', None, 'error', task=True)
+    assert m.unassigned == 0
+    assert m.queue_status(0) == {'queue': 0, 'tasks': 0, 'completed': 1}
+    assert m.queue_status(1) == {'queue': 0, 'tasks': 0, 'completed': 1}
+
+    d = m.to_dict()
+    assert d['clients']['client-a'] == {'submitted': 1, 'ok': 1}
+    assert d['clients']['client-b'] == {'submitted': 2, 'error': 2}
+    assert d['latency']['count'] == 1
+    assert d['latency']['total'] == 2
+    assert d['runtime']['total'] == 1
+
+    # unregistered engines are forgotten
+    m.unregistered(1)
+    assert list(m.to_dict()['engines']) == [0]
@@ -0,0 +1,36 @@
+"""Tests for Session message packers"""
+
+import pytest
+from jupyter_client.session import Session
+
+from ipyparallel import util
+from ipyparallel.serialize import packers
+
+
+def test_resolve_packer():
+    assert packers.resolve_packer('json') == ('json', 'json')
+    assert packers.resolve_packer('auto')[0] in {
+        packers.resolve_packer(name)[0] for name in packers.available_packers()
+    }
+    with pytest.raises(ValueError):
+        packers.resolve_packer('nosuchpacker')
+
+
+@pytest.mark.parametrize("name", packers.available_packers())
+def test_packer_roundtrip(name):
+    packer, unpacker = packers.resolve_packer(name)
+    session = Session(packer=packer, unpacker=unpacker)
+    msg = session.msg(
+        'apply_request',
+        content={},
+        metadata={'after': ['a', 'b'], 'timeout': None, 'targets': []},
+    )
+    msg_list = session.serialize(msg)
+    idents, msg_list = session.feed_identities(msg_list)
+    msg2 = session.deserialize(msg_list)
+    assert msg2['header']['msg_id'] == msg['header']['msg_id']
+    assert msg2['metadata'] == msg['metadata']
+    # dates are always packed as strings, and parsed on request
+    assert util._parse_date(msg2['header']['date']) == msg['header']['date']
+    # non-str keys, as used for engine ids
+    assert session.unpack(session.pack({0: 'a'})) in ({0: 'a'}, {'0': 'a'})
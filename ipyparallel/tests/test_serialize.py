@@ -3,6 +3,8 @@
 # Copyright (c) IPython Development Team.
 # Distributed under the terms of the Modified BSD License.
 import pickle
+import subprocess
+import sys
 from collections import namedtuple
 
 import pytest
@@ -238,3 +240,107 @@ def test_pickle_threshold():
     assert len(bufs) == 2
     B, _ = deserialize_object(bufs)
     assert_array_equal(A, B)
+
+
+@pytest.fixture
+def shared_memory():
+    from ipyparallel.serialize import use_shared_memory
+
+    use_shared_memory(1024)
+    try:
+        yield
+    finally:
+        use_shared_memory(0)
+
+
+def test_shared_memory(shared_memory):
+    numpy = pytest.importorskip('numpy')
+    from multiprocessing.shared_memory import SharedMemory
+
+    from numpy.testing import assert_array_equal
+
+    A = numpy.ones((512, 512))
+    bufs = serialize_object(A)
+    # only the handle is sent
+    assert len(bufs) == 1
+    name = pickle.loads(bufs[0]).shared_memory['name']
+    B, _ = deserialize_object(bufs)
+    assert_array_equal(A, B)
+    assert not B.flags.writeable
+    # the receiver unlinked the segment
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name)
+
+    # small arrays are sent as usual
+    A = numpy.ones((5, 5))
+    bufs = serialize_object(A)
+    assert pickle.loads(bufs[0]).shared_memory is None
+
+
+def test_shared_memory_collected(shared_memory):
+    numpy = pytest.importorskip('numpy')
+    from numpy.testing import assert_array_equal
+
+    from ipyparallel.serialize import PrePickled, sharedmem
+
+    A = numpy.ones((512, 512))
+    pre = PrePickled(A)
+    assert len(pre.shared_memory) == 1
+    with sharedmem.collect() as names:
+        bufs = serialize_object(pre)
+    assert names == pre.shared_memory
+    # one reference for each of two messages
+    sharedmem.retain(names)
+    sharedmem.retain(names)
+    for i in range(2):
+        B, _ = deserialize_object(bufs)
+        assert_array_equal(A, B)
+    sharedmem.release(names)
+    # still available to the second receiver
+    B, _ = deserialize_object(bufs)
+    sharedmem.release(names)
+    with pytest.raises(FileNotFoundError):
+        deserialize_object(bufs)
+    # mapped arrays stay valid after unlinking
+    assert_array_equal(A, B)
+
+
+def test_shared_memory_collected_exit():
+    """segments received by their creator are untracked once, so exit is clean"""
+    pytest.importorskip('numpy')
+    code = """
+import numpy
+from ipyparallel.serialize import PrePickled, deserialize_object, serialize_object
+from ipyparallel.serialize import sharedmem, use_shared_memory
+
+use_shared_memory(1024)
+pre = PrePickled(numpy.ones((512, 512)))
+with sharedmem.collect() as names:
+    bufs = serialize_object(pre)
+sharedmem.retain(names)
+B, _ = deserialize_object(bufs)
+sharedmem.release(names)
+"""
+    # the resource tracker reports errors on stderr when the process exits
+    p = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, timeout=60
+    )
+    assert p.returncode == 0, p.stderr
+    assert "Traceback" not in p.stderr
+
+
+def test_shared_memory_expired(shared_memory):
+    numpy = pytest.importorskip('numpy')
+    from multiprocessing.shared_memory import SharedMemory
+
+    from ipyparallel.serialize import sharedmem
+
+    A = numpy.ones((512, 512))
+    bufs = serialize_object(A)
+    name = pickle.loads(bufs[0]).shared_memory['name']
+    assert name in sharedmem._handoffs
+    # never received: unlinked by the creator
+    sharedmem.expire_handoffs(force=True)
+    assert name not in sharedmem._handoffs
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name)
@@ -0,0 +1,106 @@
+"""Tests for the Client's history and result store"""
+
+import os
+from threading import Thread
+
+import numpy as np
+import pytest
+
+from ipyparallel.client.store import MsgHistory, ResultStore
+
+
+def test_history():
+    history = MsgHistory(maxlen=3)
+    history.extend(['a', 'b', 'c', 'd', 'e'])
+    assert len(history) == 5
+    assert list(history) == ['c', 'd', 'e']
+    assert 'e' in history
+    assert 'a' not in history
+    assert history[-1] == 'e'
+    assert history[2] == 'c'
+    assert history[-3:] == ['c', 'd', 'e']
+    # dropped entries are skipped in slices
+    assert history[:] == ['c', 'd', 'e']
+    with pytest.raises(IndexError):
+        history[0]
+    with pytest.raises(IndexError):
+        history[5]
+    history.clear()
+    assert len(history) == 0
+    assert 'e' not in history
+
+
+def test_history_unbounded():
+    history = MsgHistory(['a', 'b'])
+    history.append('c')
+    assert history[0] == 'a'
+    assert history[-2:] == ['b', 'c']
+    assert len(history) == 3
+
+
+def test_result_store_lru():
+    results = ResultStore(maxsize=2)
+    results['a'] = 1
+    results['b'] = 2
+    # touch a, so b is evicted
+    assert results['a'] == 1
+    results['c'] = 3
+    assert 'b' not in results
+    assert sorted(results) == ['a', 'c']
+    assert results.get('b') is None
+    assert results.pop('a') == 1
+    assert results.pop('a', None) is None
+    assert len(results) == 1
+
+
+def test_result_store_spill(tmp_path):
+    results = ResultStore(maxsize=2, spill=True, spill_dir=str(tmp_path))
+    arrays = {f"m{i}": np.arange(i, i + 10) for i in range(5)}
+    for msg_id, a in arrays.items():
+        results[msg_id] = a
+    assert len(results) == 5
+    assert results.spilled == 3
+    assert len(os.listdir(tmp_path)) == 1
+    # loading a spilled result moves it back into memory
+    np.testing.assert_array_equal(results['m0'], arrays['m0'])
+    assert results.spilled == 3
+    for msg_id, a in arrays.items():
+        np.testing.assert_array_equal(results.pop(msg_id), a)
+    assert len(results) == 0
+    results['x'] = 'x'
+    results.clear()
+    assert len(results) == 0
+    results.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_result_store_compact(tmp_path):
+    results = ResultStore(maxsize=1, spill=True, spill_dir=str(tmp_path))
+    results['keep'] = b'k' * 1000
+    results['x'] = b'x'
+    results._spill.compact_size = 10_000
+    for i in range(100):
+        results[f"m{i}"] = b'm' * 1000
+        # each access spills one result and loads another
+        assert results['keep'] == b'k' * 1000
+        assert results.pop(f"m{i}") == b'm' * 1000
+    # the file doesn't grow with every result spilled and loaded
+    assert results._spill._size < 20_000
+    assert results['keep'] == b'k' * 1000
+    assert len(os.listdir(tmp_path)) == 1
+    results.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_result_store_threads():
+    results = ResultStore(maxsize=10)
+
+    def fill(prefix):
+        for i in range(1000):
+            results[f"{prefix}{i}"] = i
+            results.get(f"{prefix}{i // 2}")
+
+    threads = [Thread(target=fill, args=(prefix,)) for prefix in "abcd"]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert len(results) == 10
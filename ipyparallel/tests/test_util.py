@@ -18,3 +18,29 @@ def test_disambiguate_ip():
     if public_ips():
         public_ip = public_ips()[0]
         assert util.disambiguate_ip_address('0.0.0.0', public_ip) == localhost()
+
+
+@pytest.mark.parametrize(
+    "s",
+    [
+        "2024-05-01T12:30:00.123456Z",
+        "2024-05-01T12:30:00.123Z",
+        "2024-05-01T12:30:00+02:00",
+        "2024-05-01T12:30:00.5-0500",
+    ],
+)
+def test_parse_date(s):
+    from dateutil.parser import parse
+
+    dt = util._parse_date(s)
+    assert dt == parse(s)
+    assert dt.tzinfo is not None
+    # already-parsed dates are passed through
+    assert util._parse_date(dt) is dt
+
+
+def test_extract_dates():
+    now = util.utcnow()
+    obj = {'a': [now.isoformat(), 'not a date'], 'b': now, 'c': 5}
+    extracted = util.extract_dates(obj)
+    assert extracted == {'a': [now, 'not a date'], 'b': now, 'c': 5}
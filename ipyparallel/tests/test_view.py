@@ -175,6 +175,15 @@ class TestView(ClusterTestCase):
         kwargs = v.apply_async(echo_kwargs, f=5).get(timeout=30)
         assert kwargs == dict(f=5)
 
+    def test_apply_many(self):
+        self.minimum_engines(2)
+        v = self.client[-2:]
+
+        ar = v.apply_many(lambda x: x * 2, [(i,) for i in range(6)])
+        assert ar.get(timeout=10) == [2 * i for i in range(6)]
+        # assigned round-robin
+        assert ar.engine_id == v.targets * 3
+
     def test_apply_tracked(self):
         """test tracking for apply"""
         # self.add_engines(1)
@@ -373,6 +382,36 @@ class TestView(ClusterTestCase):
         r = ar.get()
         assert_array_equal(r, arr)
 
+    @skip_without('numpy')
+    def test_map_out(self):
+        """test writing map results into an array"""
+        import numpy
+        from numpy.testing import assert_array_equal
+
+        view = self.client[:]
+        out = numpy.zeros(101)
+        r = view.map_sync(lambda x: x * 0.5, range(101), out=out)
+        assert r is out
+        assert_array_equal(out, numpy.arange(101) * 0.5)
+
+        # output of each task is written into place as it arrives
+        @view.parallel(block=True, out=True)
+        def double(a):
+            return a * 2
+
+        arr = numpy.arange(101, dtype=numpy.int32)
+        r = double(arr)
+        assert r.dtype == numpy.int32
+        assert_array_equal(r, arr * 2)
+
+        # chunks that don't fit are an error
+        @view.parallel(block=False, out=True)
+        def first(a):
+            return a[:1]
+
+        with pytest.raises(ValueError):
+            first(arr).get(timeout=10)
+
     def test_scatter_gather_nonblocking(self):
         data = list(range(16))
         view = self.client[:]
@@ -449,6 +488,27 @@ class TestView(ClusterTestCase):
 
         assert view.apply_sync(findall, r'\w+', 'hello world') == 'hello world'.split()
 
+    def test_apply_interactive_globals(self):
+        view = self.client[-1]
+        view.block = True
+        view['apply_global'] = 1
+
+        @interactive
+        def increment():
+            global apply_global
+            apply_global += 1
+            return sorted(key for key in globals() if key.endswith('_f'))
+
+        assert view.apply(increment) == []
+        assert view['apply_global'] == 2
+        # the remote traceback starts in the function
+        with pytest.raises(error.RemoteError) as excinfo:
+            view.apply(lambda: 1 / 0)
+        lines = excinfo.value.traceback.splitlines()
+        frames = [line for line in lines if line.startswith('File ')]
+        assert len(frames) == 1
+        assert frames[0].endswith('<lambda>()')
+
     def test_unicode_execute(self):
         """test executing unicode strings"""
         v = self.client[-1]
@@ -524,6 +584,44 @@ class TestView(ClusterTestCase):
         with raises_remote(NameError):
             v.apply_sync(echo, r)
 
+    def test_apply_error_shell_state(self):
+        """apply errors go through the shell, like execute errors"""
+        v = self.client[self.client.ids[0]]
+
+        def set_custom_exc():
+            ip = get_ipython()  # noqa: F821
+
+            def handler(shell, etype, evalue, tb, tb_offset=None):
+                shell.user_ns['custom_exc_seen'] = str(evalue)
+                return shell.InteractiveTB.structured_traceback(
+                    etype, evalue, tb, tb_offset=tb_offset
+                )
+
+            ip.set_custom_exc((KeyError,), handler)
+
+        def unset_custom_exc():
+            get_ipython().set_custom_exc((), None)  # noqa: F821
+
+        def fail():
+            raise KeyError('custom')
+
+        def last_type():
+            import sys
+
+            return sys.last_type.__name__
+
+        v.apply_sync(set_custom_exc)
+        try:
+            with raises_remote(KeyError):
+                v.apply_sync(fail)
+            assert v['custom_exc_seen'] == repr('custom')
+        finally:
+            v.apply_sync(unset_custom_exc)
+        with raises_remote(KeyError):
+            v.apply_sync(fail)
+        # sys.last_type etc. are set, for %debug
+        assert v.apply_sync(last_type) == 'KeyError'
+
     def test_single_engine_map(self):
         e0 = self.client[self.client.ids[0]]
         r = list(range(5))
@@ -927,6 +1025,28 @@ class TestView(ClusterTestCase):
         ar = view.pull("key")
         assert ar.get(timeout=10) == ["pushed"] * len(view)
 
+    @skip_without('numpy')
+    def test_use_shared_memory(self):
+        import numpy
+        from numpy.testing import assert_array_equal
+
+        from ipyparallel.serialize import sharedmem
+
+        view = self.client[:]
+        view.use_shared_memory(1024).get(timeout=10)
+        try:
+            A = numpy.arange(100_000)
+            view.push({"A": A}, block=True)
+            view.execute("total = int(A.sum())", block=True)
+            assert view["total"] == [int(A.sum())] * len(view)
+            for B in view.pull("A", block=True):
+                assert_array_equal(A, B)
+            # every segment sent with the requests has been released
+            assert not self.client._shared_memory
+            assert not sharedmem._segments
+        finally:
+            view.use_shared_memory(0).get(timeout=10)
+
     @skip_without('cloudpickle')
     @pytest.mark.xfail(reason="@require doesn't work with cloudpickle")
     def test_cloudpickle_require(self):
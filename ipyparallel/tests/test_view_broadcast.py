@@ -38,6 +38,11 @@ class TestBroadcastView(test_view.TestView):
     def test_scatter_tracked(self):
         pass
 
+    def test_apply_many(self):
+        # not supported by broadcast views
+        with pytest.raises(NotImplementedError):
+            self.client.broadcast_view().apply_many(lambda x: x, [(1,)])
+
 
 class TestBroadcastViewCoalescing(TestBroadcastView):
     is_coalescing = True
@@ -566,18 +566,37 @@ def _parse_date(s):
     If it is None or not a valid ISO8601 timestamp,
     it will be returned unmodified.
     Otherwise, it will return a datetime object.
+
+    datetime objects (e.g. from a packer that preserves them)
+    are returned with tzinfo ensured.
     """
     if s is None:
         return s
+    if isinstance(s, datetime):
+        return _ensure_tzinfo(s)
+    if not isinstance(s, str):
+        return s
     m = ISO8601_PAT.match(s)
     if m:
-        dt = dateutil_parse(s)
+        # fromisoformat is much faster than dateutil,
+        # but only accepts 'Z' and short fractions on Python >= 3.11
+        try:
+            if s.endswith('Z'):
+                dt = datetime.fromisoformat(s[:-1] + '+00:00')
+            else:
+                dt = datetime.fromisoformat(s)
+        except ValueError:
+            dt = dateutil_parse(s)
         return _ensure_tzinfo(dt)
     return s
 
 
 def extract_dates(obj):
-    """extract ISO8601 dates from unpacked JSON"""
+    """extract ISO8601 dates from unpacked messages
+
+    Timestamps may be ISO8601 strings or datetime objects,
+    depending on the Session packer.
+    """
     if isinstance(obj, dict):
         new_obj = {}  # don't clobber
         for k, v in obj.items():